@@ -0,0 +1,27 @@
+#!/bin/bash
+#
+# 在Docker容器内启动ROS1 -> ROS2话题转发（Python，不需要编译ros1_bridge）
+#
+# 使用方法:
+#   ./start_topic_forwarder.sh                                  # 转发全部可转发的话题
+#   ./start_topic_forwarder.sh --topics /livox/imu /usb_cam/image_raw
+#   ./start_topic_forwarder.sh --list                           # 列出话题及是否可转发
+#
+
+ROS_DOMAIN_ID=${ROS_DOMAIN_ID:-66}  # 与宿主机ROS2一致
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+source /opt/ros/noetic/setup.bash
+
+if ! rostopic list &>/dev/null; then
+    echo "错误: ROS1 Master (roscore) 未运行!"
+    exit 1
+fi
+
+# 先source ROS1, 再source ROS2，同一进程中同时使用rospy和rclpy
+source /opt/ros/foxy/setup.bash
+export ROS_DOMAIN_ID=$ROS_DOMAIN_ID
+export ROS_MASTER_URI=${ROS_MASTER_URI:-http://localhost:11311}
+
+echo "ROS1 Master: $ROS_MASTER_URI, ROS_DOMAIN_ID: $ROS_DOMAIN_ID"
+exec python3 "${SCRIPT_DIR}/../python/simple_topic_forwarder.py" "$@"
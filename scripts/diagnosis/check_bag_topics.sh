@@ -6,6 +6,13 @@ ROS_SETUP="source /opt/ros/noetic/setup.bash"
 
 echo "🔍 检查bag文件内容..."
 
+# 方法0: 在宿主机上只读bag索引统计频率/抖动/缺口（不需要ROS，大bag也只需几秒）
+if [ -n "${1:-}" ]; then
+    SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+    python3 "${SCRIPT_DIR}/../python/check_bag.py" "$1"
+    exit $?
+fi
+
 # 方法1: 使用rosbag info (可能很慢)
 echo "📋 尝试获取bag信息..."
 timeout 30s docker exec "${CONTAINER}" bash -c "${ROS_SETUP} && rosbag info /host/temp_processing.bag" 2>/dev/null | grep -E "topics:|messages:|duration:" || echo "rosbag info 超时"
@@ -12,6 +12,13 @@ in_container() {
 echo "⏰ 多传感器时间戳同步检查"
 echo "=================================="
 
+# 给出bag路径时做离线分析（整个录制的延迟/偏移/漂移/丢帧，不需要传感器运行）
+if [ -n "${1:-}" ]; then
+    SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+    python3 "${SCRIPT_DIR}/../python/sync_analysis.py" "$@"
+    exit $?
+fi
+
 # 创建时间戳同步检查脚本
 in_container "cat > /tmp/timestamp_sync_checker.py << 'EOF'
 #!/usr/bin/env python3
@@ -64,6 +64,7 @@ if in_container "${ROS_SETUP}; rostopic list | grep -q usb_cam"; then
 else
     echo "❌ 传感器未启动，跳过时间戳检查"
 fi
+echo "ℹ️  完整录制的同步分析: ./check_timestamp_sync.sh <bag文件>"
 
 echo ""
 echo "2. 📷 相机标定检查"
@@ -4,24 +4,29 @@
 参考: evo工具的对齐方法
 """
 
+import argparse
 import numpy as np
-import matplotlib.pyplot as plt
 import sys
 import os
 
+from scipy.spatial.transform import Rotation
+
+from evaluation_plots import (decimate, plot_error_figure, plot_uwb_figure, plot_xy_figure,
+                              plot_xz_figure, render_figures)
+from live_evaluation import ABORT_EXIT_CODE, add_follow_arguments, follow
+from robust_alignment import robust_umeyama
+from trajectory_association import associate_poses, DEFAULT_MAX_DT
+from trajectory_io import load_trajectory
+from trajectory_drift import compute_segment_drift, format_drift
+from trajectory_rpe import compute_rpe, format_rpe, path_length
+from umeyama import UmeyamaAccumulator
+
+# 流式对齐每块的点数
+ALIGN_CHUNK_SIZE = 65536
+
 def load_tum(filename):
-    """加载TUM格式轨迹"""
-    data = []
-    with open(filename, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line and not line.startswith('#'):
-                parts = line.split()
-                if len(parts) >= 8:
-                    t = float(parts[0])
-                    x, y, z = float(parts[1]), float(parts[2]), float(parts[3])
-                    data.append([t, x, y, z])
-    return np.array(data)
+    """加载TUM格式轨迹 (N, 8): [t, x, y, z, qx, qy, qz, qw]"""
+    return load_trajectory(filename, fmt='tum')
 
 def umeyama_alignment(x, y, with_scale=False):
     """
@@ -33,56 +38,49 @@ def umeyama_alignment(x, y, with_scale=False):
     使得 y ≈ s * R @ x + t
     """
     assert x.shape == y.shape
-    n, m = x.shape
-
-    # 计算质心
-    mx = x.mean(0)
-    my = y.mean(0)
-
-    # 中心化
-    xc = x - mx
-    yc = y - my
-
-    # 计算尺度
-    sx = np.mean(np.sum(xc**2, 1))
-    sy = np.mean(np.sum(yc**2, 1))
-
-    # 协方差矩阵
-    Sxy = np.dot(yc.T, xc) / n
-
-    # SVD分解
-    U, D, Vt = np.linalg.svd(Sxy)
-    
-    # 计算旋转矩阵
-    r = np.linalg.matrix_rank(Sxy)
-    S = np.eye(m)
-    if r < m:
-        # 防止反射
-        if np.linalg.det(Sxy) < 0:
-            S[m-1, m-1] = -1
-    elif np.linalg.det(U) * np.linalg.det(Vt) < 0:
-        S[m-1, m-1] = -1
-    
-    R = U @ S @ Vt
-
-    # 计算尺度
-    if with_scale:
-        s = np.trace(np.diag(D) @ S) / sx
-    else:
-        s = 1.0
+    acc = UmeyamaAccumulator()
+    acc.update(x, y)
+    return acc.solve(with_scale)
 
-    # 计算平移
-    t = my - s * R @ mx
+def quat_left_multiply(q0, q):
+    """单个四元数左乘一组四元数 q0 ⊗ q，[qx, qy, qz, qw] 顺序"""
+    x0, y0, z0, w0 = q0
+    x, y, z, w = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+    return np.column_stack([
+        w0 * x + x0 * w + y0 * z - z0 * y,
+        w0 * y - x0 * z + y0 * w + z0 * x,
+        w0 * z + x0 * y - y0 * x + z0 * w,
+        w0 * w - x0 * x - y0 * y - z0 * z,
+    ])
 
-    return s, R, t
+def apply_alignment(traj, s, R, t):
+    """应用相似变换到整条轨迹（不改变行序），有姿态列时同时旋转姿态"""
+    aligned = np.array(traj, dtype=float)
+    aligned[:, 1:4] = (s * (R @ traj[:, 1:4].T).T + t)
+    if traj.shape[1] >= 8 and len(traj):
+        aligned[:, 4:8] = quat_left_multiply(Rotation.from_matrix(R).as_quat(), traj[:, 4:8])
+    return aligned
 
-def align_trajectory_umeyama(traj, gt, sample_rate=10):
+def align_trajectory_umeyama(traj, gt, sample_rate=10, assoc=None, with_scale=False,
+                             chunk_size=ALIGN_CHUNK_SIZE):
     """
     使用Umeyama算法对齐轨迹到Ground Truth
-    sample_rate: 采样率，避免使用所有点（太慢）
+    assoc: 时间戳关联结果。给定时使用全部关联位姿分块累加统计量（精确、内存恒定）；
+           否则按时间重叠区间均匀采样至多1000个点（旧行为）
+    sample_rate: 保留参数，兼容旧调用
     """
     if len(traj) == 0 or len(gt) == 0:
         return traj, None, None, None
+
+    if assoc is not None:
+        if len(assoc) == 0:
+            return traj, None, None, None
+        acc = UmeyamaAccumulator()
+        for start in range(0, len(assoc), chunk_size):
+            part = assoc.chunk(start, start + chunk_size)
+            acc.update(part.est_positions(traj), part.ref_positions(gt))
+        s, R, t = acc.solve(with_scale)
+        return apply_alignment(traj, s, R, t), s, R, t
     
     # 时间对齐：找到重叠的时间段
     t_start = max(traj[0, 0], gt[0, 0])
@@ -105,261 +103,147 @@ def align_trajectory_umeyama(traj, gt, sample_rate=10):
     traj_points = traj_segment[traj_indices, 1:4]
     
     # 执行Umeyama对齐
-    s, R, t = umeyama_alignment(traj_points, gt_points, with_scale=False)
+    s, R, t = umeyama_alignment(traj_points, gt_points, with_scale=with_scale)
     
     # 应用变换到整个轨迹
-    aligned = traj.copy()
-    aligned[:, 1:4] = (s * (R @ traj[:, 1:4].T).T + t)
-    
-    return aligned, s, R, t
+    return apply_alignment(traj, s, R, t), s, R, t
 
-def plot_comparison(eval_dir, dataset):
-    """生成对比图 - 只保留对齐后的可视化"""
+def align_with_assoc(traj, gt, assoc, robust=None):
+    """
+    按关联结果对齐，robust为None时使用流式Umeyama，否则使用鲁棒对齐
+    返回 (aligned, s, R, t, inlier_ratio)，非鲁棒模式 inlier_ratio 为 None
+    """
+    if robust is None:
+        aligned, s, R, t = align_trajectory_umeyama(traj, gt, assoc=assoc)
+        return aligned, s, R, t, None
+    x = assoc.est_positions(traj)
+    y = assoc.ref_positions(gt)
+    s, R, t, inliers = robust_umeyama(x, y, loss=robust)
+    return apply_alignment(traj, s, R, t), s, R, t, float(np.mean(inliers))
+
+def plot_comparison(eval_dir, dataset, max_dt=DEFAULT_MAX_DT, interpolation='nearest',
+                    render_workers=None, robust=None, suffix=''):
+    """
+    生成对比图 - 只保留对齐后的可视化，返回各估计器的指标字典
+    render_workers: 并行出图的进程数，None为自动，1为串行
+    robust: None / 'huber' / 'cauchy'，鲁棒对齐的损失函数
+    suffix: 图和指标文件名后缀（如 '_MH_01'），同一目录下有多个数据集时避免互相覆盖
+    """
     gt = load_tum(f"{eval_dir}/trajectories/gt_{dataset}.txt")
     vio = load_tum(f"{eval_dir}/trajectories/vio_{dataset}.txt")
     vir = load_tum(f"{eval_dir}/trajectories/vir_{dataset}.txt")
     
-    print("🔧 使用Umeyama算法对齐轨迹...")
-    vio_aligned, s_vio, R_vio, t_vio = align_trajectory_umeyama(vio, gt)
-    vir_aligned, s_vir, R_vir, t_vir = align_trajectory_umeyama(vir, gt)
+    # 按时间戳关联（对齐不改变行序，关联结果可复用于对齐、所有图表和指标）
+    vio_assoc = associate_poses(gt, vio, max_dt=max_dt, interpolation=interpolation)
+    vir_assoc = associate_poses(gt, vir, max_dt=max_dt, interpolation=interpolation)
+    print(f"🔗 时间戳关联: VIO {len(vio_assoc)}/{len(vio)}, VIR {len(vir_assoc)}/{len(vir)}")
+    if len(vio_assoc) == 0 or len(vir_assoc) == 0:
+        print(f"❌ 时间戳无法关联 (max_dt={max_dt}s)，请检查轨迹时间戳")
+        return None
+
+    if robust:
+        print(f"🔧 使用鲁棒Umeyama算法对齐轨迹（{robust}权重）...")
+    else:
+        print("🔧 使用Umeyama算法对齐轨迹（全部关联位姿）...")
+    vio_aligned, s_vio, R_vio, t_vio, vio_inliers = align_with_assoc(vio, gt, vio_assoc, robust)
+    vir_aligned, s_vir, R_vir, t_vir, vir_inliers = align_with_assoc(vir, gt, vir_assoc, robust)
     
     print(f"\nVIO对齐参数:")
     print(f"  尺度: {s_vio:.6f}")
     print(f"  旋转矩阵:\n{R_vio}")
     print(f"  平移: {t_vio}")
+    if vio_inliers is not None:
+        print(f"  内点比例: {vio_inliers * 100:.2f}%")
     
     print(f"\nVIR对齐参数:")
     print(f"  尺度: {s_vir:.6f}")
     print(f"  旋转矩阵:\n{R_vir}")
     print(f"  平移: {t_vir}")
+    if vir_inliers is not None:
+        print(f"  内点比例: {vir_inliers * 100:.2f}%")
     
     # 保存对齐后的轨迹
     np.savetxt(f"{eval_dir}/trajectories/vio_{dataset}_aligned.txt", vio_aligned, 
-               fmt='%.9f %.9f %.9f %.9f')
+               fmt='%.9f')
     np.savetxt(f"{eval_dir}/trajectories/vir_{dataset}_aligned.txt", vir_aligned, 
-               fmt='%.9f %.9f %.9f %.9f')
+               fmt='%.9f')
     print(f"\n✅ 对齐后的轨迹已保存")
     
-    # 图1: XY平面对齐轨迹对比
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 7))
-    
-    # 左图：全轨迹
-    ax1.plot(gt[:, 1], gt[:, 2], 'g-', linewidth=2.5, alpha=0.6, label='Ground Truth', zorder=1)
-    ax1.plot(vio_aligned[:, 1], vio_aligned[:, 2], 'b-', linewidth=1.8, alpha=0.7, label='VIO (VINS-Mono)', zorder=2)
-    ax1.plot(vir_aligned[:, 1], vir_aligned[:, 2], 'r-', linewidth=1.8, alpha=0.7, label='VIR-SLAM', zorder=3)
-    ax1.scatter(gt[0, 1], gt[0, 2], c='green', s=200, marker='o', edgecolors='black', linewidths=2, label='Start', zorder=5)
-    ax1.scatter(gt[-1, 1], gt[-1, 2], c='red', s=200, marker='X', edgecolors='black', linewidths=2, label='End', zorder=5)
-    ax1.set_xlabel('X (m)', fontsize=13, fontweight='bold')
-    ax1.set_ylabel('Y (m)', fontsize=13, fontweight='bold')
-    ax1.set_title('XY Trajectory (Aligned)', fontsize=14, fontweight='bold')
-    ax1.legend(fontsize=11, loc='best')
-    ax1.grid(True, alpha=0.3)
-    ax1.axis('equal')
-    
-    # 右图：局部放大
-    mid_idx = len(gt) // 2
-    window = len(gt) // 10
-    start_idx = max(0, mid_idx - window)
-    end_idx = min(len(gt), mid_idx + window)
-    
-    ax2.plot(gt[start_idx:end_idx, 1], gt[start_idx:end_idx, 2], 
-             'g-', linewidth=2.5, alpha=0.6, label='Ground Truth')
-    
-    t_start, t_end = gt[start_idx, 0], gt[end_idx, 0]
-    vio_mask = (vio_aligned[:, 0] >= t_start) & (vio_aligned[:, 0] <= t_end)
-    vir_mask = (vir_aligned[:, 0] >= t_start) & (vir_aligned[:, 0] <= t_end)
-    
-    if vio_mask.any():
-        ax2.plot(vio_aligned[vio_mask, 1], vio_aligned[vio_mask, 2], 
-                'b-', linewidth=2, alpha=0.7, label='VIO')
-    if vir_mask.any():
-        ax2.plot(vir_aligned[vir_mask, 1], vir_aligned[vir_mask, 2], 
-                'r-', linewidth=2, alpha=0.7, label='VIR-SLAM')
-    
-    ax2.set_xlabel('X (m)', fontsize=13, fontweight='bold')
-    ax2.set_ylabel('Y (m)', fontsize=13, fontweight='bold')
-    ax2.set_title('Local Detail', fontsize=14, fontweight='bold')
-    ax2.legend(fontsize=11, loc='best')
-    ax2.grid(True, alpha=0.3)
-    ax2.axis('equal')
-    
-    plt.suptitle(f'Trajectory Comparison: {dataset}', fontsize=16, fontweight='bold')
-    plt.tight_layout()
-    plt.savefig(f"{eval_dir}/visualizations/xy_trajectory.png", dpi=150, bbox_inches='tight')
-    print(f"✅ 保存: xy_trajectory.png")
-    plt.close()
-    
-    # 图2: 误差随时间变化
-    print("📊 生成误差分析图...")
-    
-    min_len = min(len(gt), len(vio_aligned), len(vir_aligned))
-    vio_errors = []
-    vir_errors = []
-    timestamps = []
-    
-    for i in range(0, min_len, max(1, min_len // 500)):
-        gt_idx = min(i * len(gt) // min_len, len(gt)-1)
-        vio_idx = min(i * len(vio_aligned) // min_len, len(vio_aligned)-1)
-        vir_idx = min(i * len(vir_aligned) // min_len, len(vir_aligned)-1)
-        
-        vio_err = np.linalg.norm(gt[gt_idx, 1:4] - vio_aligned[vio_idx, 1:4])
-        vir_err = np.linalg.norm(gt[gt_idx, 1:4] - vir_aligned[vir_idx, 1:4])
-        
-        vio_errors.append(vio_err)
-        vir_errors.append(vir_err)
-        timestamps.append(i)
-    
-    fig, ax = plt.subplots(figsize=(14, 6))
-    
-    ax.plot(timestamps, vio_errors, 'b-', linewidth=2, alpha=0.7, label='VIO Error')
-    ax.plot(timestamps, vir_errors, 'r-', linewidth=2, alpha=0.7, label='VIR-SLAM Error')
-    ax.fill_between(timestamps, vio_errors, alpha=0.3, color='blue')
-    ax.fill_between(timestamps, vir_errors, alpha=0.3, color='red')
-    
-    vio_mean = np.mean(vio_errors)
-    vir_mean = np.mean(vir_errors)
-    
-    ax.axhline(vio_mean, color='blue', linestyle='--', linewidth=1.5, alpha=0.5, label=f'VIO Mean: {vio_mean:.3f}m')
-    ax.axhline(vir_mean, color='red', linestyle='--', linewidth=1.5, alpha=0.5, label=f'VIR Mean: {vir_mean:.3f}m')
-    
-    ax.set_xlabel('Trajectory Progress', fontsize=13, fontweight='bold')
-    ax.set_ylabel('Position Error (m)', fontsize=13, fontweight='bold')
-    ax.set_title(f'Position Error vs Ground Truth: {dataset}', fontsize=15, fontweight='bold')
-    ax.legend(fontsize=11, loc='best')
-    ax.grid(True, alpha=0.3)
-    
-    improve = (vio_mean - vir_mean) / vio_mean * 100
-    stats_text = f'Improvement: {improve:+.2f}%\n'
-    stats_text += f'VIO Max: {max(vio_errors):.3f}m\n'
-    stats_text += f'VIR Max: {max(vir_errors):.3f}m'
-    
-    ax.text(0.02, 0.98, stats_text, transform=ax.transAxes,
-           fontsize=12, verticalalignment='top',
-           bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
-    
-    plt.tight_layout()
-    plt.savefig(f"{eval_dir}/visualizations/error_analysis.png", dpi=150, bbox_inches='tight')
-    print(f"✅ 保存: error_analysis.png")
-    plt.close()
-    
-    # 图3: XZ平面轨迹
-    print("📊 生成XZ平面轨迹图...")
-    fig, ax = plt.subplots(figsize=(14, 7))
-    
-    ax.plot(gt[:, 1], gt[:, 3], 'g-', linewidth=2.5, alpha=0.6, label='Ground Truth', zorder=1)
-    ax.plot(vio_aligned[:, 1], vio_aligned[:, 3], 'b-', linewidth=1.8, alpha=0.7, label='VIO (VINS-Mono)', zorder=2)
-    ax.plot(vir_aligned[:, 1], vir_aligned[:, 3], 'r-', linewidth=1.8, alpha=0.7, label='VIR-SLAM', zorder=3)
-    ax.scatter(gt[0, 1], gt[0, 3], c='green', s=200, marker='o', edgecolors='black', linewidths=2, label='Start', zorder=5)
-    ax.scatter(gt[-1, 1], gt[-1, 3], c='red', s=200, marker='X', edgecolors='black', linewidths=2, label='End', zorder=5)
-    
-    ax.set_xlabel('X (m)', fontsize=13, fontweight='bold')
-    ax.set_ylabel('Z (m)', fontsize=13, fontweight='bold')
-    ax.set_title(f'XZ Plane Trajectory (Aligned): {dataset}', fontsize=15, fontweight='bold')
-    ax.legend(fontsize=11, loc='best')
-    ax.grid(True, alpha=0.3)
-    ax.axis('equal')
-    
-    plt.tight_layout()
-    plt.savefig(f"{eval_dir}/visualizations/xz_trajectory.png", dpi=150, bbox_inches='tight')
-    print(f"✅ 保存: xz_trajectory.png")
-    plt.close()
-    
-    # 图4: 与UWB锚点的距离对比
-    print("📊 生成UWB锚点距离对比图...")
-    
+    # 全分辨率误差（复用时间戳关联结果）
+    t0 = gt[0, 0]
+    vio_times = vio_assoc.timestamps(vio_aligned) - t0
+    vir_times = vir_assoc.timestamps(vir_aligned) - t0
+    vio_errors = vio_assoc.position_errors(gt, vio_aligned)
+    vir_errors = vir_assoc.position_errors(gt, vir_aligned)
+
+    # 累计弧长索引（关联位姿上的GT行驶距离），误差图、RPE和分段漂移共用
+    vio_arc = path_length(vio_assoc.ref_positions(gt))
+    vir_arc = path_length(vir_assoc.ref_positions(gt))
+
     # UWB锚点位置 (假设在原点或GT起始点)
     uwb_anchor = gt[0, 1:4]  # 使用GT起始点作为UWB锚点
-    
+
     # 计算每个时刻到UWB锚点的距离
     gt_dist_uwb = np.linalg.norm(gt[:, 1:4] - uwb_anchor, axis=1)
     vio_dist_uwb = np.linalg.norm(vio_aligned[:, 1:4] - uwb_anchor, axis=1)
     vir_dist_uwb = np.linalg.norm(vir_aligned[:, 1:4] - uwb_anchor, axis=1)
-    
-    # 计算采样索引
-    gt_indices = np.linspace(0, len(gt)-1, min(len(gt), 1000), dtype=int)
-    vio_indices = np.linspace(0, len(vio_aligned)-1, min(len(vio_aligned), 1000), dtype=int)
-    vir_indices = np.linspace(0, len(vir_aligned)-1, min(len(vir_aligned), 1000), dtype=int)
-    
-    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10))
-    
-    # 子图1: 距离随时间变化
-    ax1.plot(gt_indices, gt_dist_uwb[gt_indices], 'g-', linewidth=2, alpha=0.6, label='Ground Truth', zorder=1)
-    ax1.plot(vio_indices, vio_dist_uwb[vio_indices], 'b-', linewidth=1.5, alpha=0.7, label='VIO', zorder=2)
-    ax1.plot(vir_indices, vir_dist_uwb[vir_indices], 'r-', linewidth=1.5, alpha=0.7, label='VIR-SLAM', zorder=3)
-    
-    ax1.set_xlabel('Trajectory Progress', fontsize=12, fontweight='bold')
-    ax1.set_ylabel('Distance to UWB Anchor (m)', fontsize=12, fontweight='bold')
-    ax1.set_title('Distance to UWB Anchor Over Time', fontsize=14, fontweight='bold')
-    ax1.legend(fontsize=11, loc='best')
-    ax1.grid(True, alpha=0.3)
-    
-    # 子图2: 与GT的距离差异
-    min_len = min(len(gt_dist_uwb), len(vio_dist_uwb), len(vir_dist_uwb))
-    
-    vio_dist_diff = []
-    vir_dist_diff = []
-    progress = []
-    
-    for i in range(0, min_len, max(1, min_len // 500)):
-        gt_idx = min(i * len(gt_dist_uwb) // min_len, len(gt_dist_uwb)-1)
-        vio_idx = min(i * len(vio_dist_uwb) // min_len, len(vio_dist_uwb)-1)
-        vir_idx = min(i * len(vir_dist_uwb) // min_len, len(vir_dist_uwb)-1)
-        
-        vio_diff = abs(vio_dist_uwb[vio_idx] - gt_dist_uwb[gt_idx])
-        vir_diff = abs(vir_dist_uwb[vir_idx] - gt_dist_uwb[gt_idx])
-        
-        vio_dist_diff.append(vio_diff)
-        vir_dist_diff.append(vir_diff)
-        progress.append(i)
-    
-    ax2.plot(progress, vio_dist_diff, 'b-', linewidth=2, alpha=0.7, label='VIO Distance Error')
-    ax2.plot(progress, vir_dist_diff, 'r-', linewidth=2, alpha=0.7, label='VIR-SLAM Distance Error')
-    ax2.fill_between(progress, vio_dist_diff, alpha=0.3, color='blue')
-    ax2.fill_between(progress, vir_dist_diff, alpha=0.3, color='red')
-    
-    vio_mean_diff = np.mean(vio_dist_diff)
-    vir_mean_diff = np.mean(vir_dist_diff)
-    
-    ax2.axhline(vio_mean_diff, color='blue', linestyle='--', linewidth=1.5, alpha=0.5, 
-                label=f'VIO Mean: {vio_mean_diff:.3f}m')
-    ax2.axhline(vir_mean_diff, color='red', linestyle='--', linewidth=1.5, alpha=0.5, 
-                label=f'VIR Mean: {vir_mean_diff:.3f}m')
-    
-    ax2.set_xlabel('Trajectory Progress', fontsize=12, fontweight='bold')
-    ax2.set_ylabel('Distance Error (m)', fontsize=12, fontweight='bold')
-    ax2.set_title('Position Difference vs Ground Truth', fontsize=14, fontweight='bold')
-    ax2.legend(fontsize=11, loc='best')
-    ax2.grid(True, alpha=0.3)
-    
-    # 添加统计信息
-    dist_improve = (vio_mean_diff - vir_mean_diff) / vio_mean_diff * 100
-    stats_text = f'Distance Error Improvement: {dist_improve:+.2f}%\n'
-    stats_text += f'VIO Max Diff: {max(vio_dist_diff):.3f}m\n'
-    stats_text += f'VIR Max Diff: {max(vir_dist_diff):.3f}m'
-    
-    ax2.text(0.02, 0.98, stats_text, transform=ax2.transAxes,
-            fontsize=11, verticalalignment='top',
-            bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
-    
-    plt.suptitle(f'UWB Anchor Distance Analysis: {dataset}', fontsize=16, fontweight='bold')
-    plt.tight_layout()
-    plt.savefig(f"{eval_dir}/visualizations/uwb_distance.png", dpi=150, bbox_inches='tight')
-    print(f"✅ 保存: uwb_distance.png")
-    plt.close()
+    vio_dist_diff = np.abs(vio_dist_uwb[vio_assoc.est_idx] -
+                           np.linalg.norm(vio_assoc.ref_positions(gt) - uwb_anchor, axis=1))
+    vir_dist_diff = np.abs(vir_dist_uwb[vir_assoc.est_idx] -
+                           np.linalg.norm(vir_assoc.ref_positions(gt) - uwb_anchor, axis=1))
+
+    # 局部放大窗口
+    mid_idx = len(gt) // 2
+    window = len(gt) // 10
+    start_idx = max(0, mid_idx - window)
+    end_idx = min(len(gt) - 1, mid_idx + window)
+    t_start, t_end = gt[start_idx, 0], gt[end_idx, 0]
+    vio_mask = (vio_aligned[:, 0] >= t_start) & (vio_aligned[:, 0] <= t_end)
+    vir_mask = (vir_aligned[:, 0] >= t_start) & (vir_aligned[:, 0] <= t_end)
+
+    # 每条曲线降采样（LTTB保形），统计量使用全分辨率数据
+    print("📊 生成可视化图...")
+    vis = f"{eval_dir}/visualizations"
+    jobs = [
+        (plot_xy_figure, dict(
+            path=f"{vis}/xy_trajectory{suffix}.png", dataset=dataset,
+            gt=decimate(gt[:, 1], gt[:, 2]),
+            vio=decimate(vio_aligned[:, 1], vio_aligned[:, 2]),
+            vir=decimate(vir_aligned[:, 1], vir_aligned[:, 2]),
+            gt_detail=decimate(gt[start_idx:end_idx, 1], gt[start_idx:end_idx, 2]),
+            vio_detail=decimate(vio_aligned[vio_mask, 1], vio_aligned[vio_mask, 2]),
+            vir_detail=decimate(vir_aligned[vir_mask, 1], vir_aligned[vir_mask, 2]))),
+        (plot_error_figure, dict(
+            path=f"{vis}/error_analysis{suffix}.png", dataset=dataset,
+            vio=decimate(vio_arc, vio_errors),
+            vir=decimate(vir_arc, vir_errors),
+            xlabel='Distance Travelled (m)',
+            stats=dict(vio_mean=np.mean(vio_errors), vir_mean=np.mean(vir_errors),
+                       vio_max=np.max(vio_errors), vir_max=np.max(vir_errors)))),
+        (plot_xz_figure, dict(
+            path=f"{vis}/xz_trajectory{suffix}.png", dataset=dataset,
+            gt=decimate(gt[:, 1], gt[:, 3]),
+            vio=decimate(vio_aligned[:, 1], vio_aligned[:, 3]),
+            vir=decimate(vir_aligned[:, 1], vir_aligned[:, 3]))),
+        (plot_uwb_figure, dict(
+            path=f"{vis}/uwb_distance{suffix}.png", dataset=dataset,
+            gt_dist=decimate(gt[:, 0] - t0, gt_dist_uwb),
+            vio_dist=decimate(vio_aligned[:, 0] - t0, vio_dist_uwb),
+            vir_dist=decimate(vir_aligned[:, 0] - t0, vir_dist_uwb),
+            vio_diff=decimate(vio_times, vio_dist_diff),
+            vir_diff=decimate(vir_times, vir_dist_diff),
+            stats=dict(vio_mean=np.mean(vio_dist_diff), vir_mean=np.mean(vir_dist_diff),
+                       vio_max=np.max(vio_dist_diff), vir_max=np.max(vir_dist_diff)))),
+    ]
+    for path in render_figures(jobs, workers=render_workers):
+        print(f"✅ 保存: {os.path.basename(path)}")
     
     # 计算对齐后的误差
     print("\n📊 计算对齐后的评估指标...")
     
-    def compute_ate(gt, est):
-        """计算ATE"""
-        min_len = min(len(gt), len(est))
-        errors = []
-        for i in range(0, min_len, max(1, min_len // 100)):
-            gt_pos = gt[min(i, len(gt)-1), 1:4]
-            est_pos = est[min(i, len(est)-1), 1:4]
-            error = np.linalg.norm(gt_pos - est_pos)
-            errors.append(error)
-        return np.sqrt(np.mean(np.array(errors)**2))
+    def compute_ate(errors):
+        """计算ATE（全部关联位姿）"""
+        return np.sqrt(np.mean(errors**2))
     
     def compute_loop_error(traj):
         """计算环路闭合误差"""
@@ -367,10 +251,14 @@ def plot_comparison(eval_dir, dataset):
             return None
         return np.linalg.norm(traj[0, 1:4] - traj[-1, 1:4])
     
-    vio_ate = compute_ate(gt, vio_aligned)
-    vir_ate = compute_ate(gt, vir_aligned)
+    vio_ate = compute_ate(vio_errors)
+    vir_ate = compute_ate(vir_errors)
     vio_loop = compute_loop_error(vio_aligned)
     vir_loop = compute_loop_error(vir_aligned)
+    vio_rpe = compute_rpe(gt, vio_aligned, vio_assoc, dist=vio_arc)
+    vir_rpe = compute_rpe(gt, vir_aligned, vir_assoc, dist=vir_arc)
+    vio_drift, vio_drift_avg = compute_segment_drift(gt, vio_aligned, vio_assoc, dist=vio_arc)
+    vir_drift, vir_drift_avg = compute_segment_drift(gt, vir_aligned, vir_assoc, dist=vir_arc)
     
     print(f"\n对齐后的评估结果:")
     print(f"  ATE RMSE:")
@@ -381,12 +269,26 @@ def plot_comparison(eval_dir, dataset):
     print(f"    VIO:  {vio_loop:.4f} m")
     print(f"    VIR:  {vir_loop:.4f} m")
     print(f"    改进: {(vio_loop-vir_loop)/vio_loop*100:+.2f}%")
+    print(f"\n  RPE:")
+    print(f"    VIO:")
+    print(format_rpe(vio_rpe))
+    print(f"    VIR:")
+    print(format_rpe(vir_rpe))
+    print(f"\n  分段漂移 (GT行驶距离 {vio_arc[-1]:.1f} m):")
+    print(f"    VIO:")
+    print(format_drift(vio_drift, vio_drift_avg))
+    print(f"    VIR:")
+    print(format_drift(vir_drift, vir_drift_avg))
     
     # 保存评估结果
-    with open(f"{eval_dir}/evaluations/metrics_aligned.txt", 'w') as f:
+    with open(f"{eval_dir}/evaluations/metrics_aligned{suffix}.txt", 'w') as f:
         f.write(f"VIR-SLAM 评估结果（Umeyama对齐后）: {dataset}\n")
         f.write("="*60 + "\n\n")
-        f.write(f"对齐方法: Umeyama算法 (SE(3)变换)\n\n")
+        if robust:
+            f.write(f"对齐方法: 鲁棒Umeyama算法 (SE(3)变换, {robust}权重IRLS)\n")
+            f.write(f"内点比例: VIO {vio_inliers * 100:.2f}%, VIR {vir_inliers * 100:.2f}%\n\n")
+        else:
+            f.write(f"对齐方法: Umeyama算法 (SE(3)变换)\n\n")
         f.write(f"ATE RMSE (m):\n")
         f.write(f"  VIO:  {vio_ate:.4f}\n")
         f.write(f"  VIR:  {vir_ate:.4f}\n")
@@ -394,15 +296,86 @@ def plot_comparison(eval_dir, dataset):
         f.write(f"Loop Closure Error (m):\n")
         f.write(f"  VIO:  {vio_loop:.4f}\n")
         f.write(f"  VIR:  {vir_loop:.4f}\n")
-        f.write(f"  改进: {(vio_loop-vir_loop)/vio_loop*100:+.2f}%\n")
+        f.write(f"  改进: {(vio_loop-vir_loop)/vio_loop*100:+.2f}%\n\n")
+        f.write(f"RPE (平移RMSE m / 旋转RMSE deg):\n")
+        f.write(f"  VIO:\n{format_rpe(vio_rpe)}\n")
+        f.write(f"  VIR:\n{format_rpe(vir_rpe)}\n\n")
+        f.write(f"分段漂移 (KITTI风格, 平移% / 旋转deg/m):\n")
+        f.write(f"  VIO:\n{format_drift(vio_drift, vio_drift_avg)}\n")
+        f.write(f"  VIR:\n{format_drift(vir_drift, vir_drift_avg)}\n")
+
+    vio_metrics = summarize_errors(vio_errors, vio_aligned, len(vio), s_vio)
+    vir_metrics = summarize_errors(vir_errors, vir_aligned, len(vir), s_vir)
+    vio_metrics['rpe'] = vio_rpe
+    vir_metrics['rpe'] = vir_rpe
+    add_drift_metrics(vio_metrics, vio_drift, vio_drift_avg, vio_arc)
+    add_drift_metrics(vir_metrics, vir_drift, vir_drift_avg, vir_arc)
+    vio_metrics['inlier_ratio'] = vio_inliers
+    vir_metrics['inlier_ratio'] = vir_inliers
+    return {'vio': vio_metrics, 'vir': vir_metrics}
+
+def summarize_errors(errors, aligned, n_poses, scale):
+    """汇总单个估计器的指标（供批量评估合并成表）"""
+    return {
+        'n_poses': n_poses,
+        'n_matched': len(errors),
+        'ate_rmse': float(np.sqrt(np.mean(errors**2))),
+        'ate_mean': float(np.mean(errors)),
+        'ate_median': float(np.median(errors)),
+        'ate_max': float(np.max(errors)),
+        'loop_error': float(np.linalg.norm(aligned[0, 1:4] - aligned[-1, 1:4])),
+        'scale': float(scale),
+    }
+
+def add_drift_metrics(metrics, rows, overall, arc):
+    """把分段漂移结果并入指标字典"""
+    metrics['path_length'] = float(arc[-1]) if len(arc) else 0.0
+    metrics['segment_drift'] = rows
+    metrics['drift_percent'] = overall['trans_drift_percent'] if overall else None
+    metrics['rot_drift_deg_per_m'] = overall['rot_drift_deg_per_m'] if overall else None
+
+def evaluate_estimator(gt, est, max_dt=DEFAULT_MAX_DT, interpolation='nearest', robust=None):
+    """
+    不绘图，只计算一个估计器的对齐指标
+    返回指标字典，无法关联时返回None
+    """
+    assoc = associate_poses(gt, est, max_dt=max_dt, interpolation=interpolation)
+    if len(assoc) == 0:
+        return None
+    aligned, s, R, t, inlier_ratio = align_with_assoc(est, gt, assoc, robust)
+    errors = assoc.position_errors(gt, aligned)
+    metrics = summarize_errors(errors, aligned, len(est), s)
+    metrics['inlier_ratio'] = inlier_ratio
+    arc = path_length(assoc.ref_positions(gt))
+    if gt.shape[1] >= 8 and est.shape[1] >= 8:
+        metrics['rpe'] = compute_rpe(gt, aligned, assoc, dist=arc)
+    add_drift_metrics(metrics, *compute_segment_drift(gt, aligned, assoc, dist=arc), arc)
+    return metrics
 
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: python3 align_trajectories.py <eval_dir> <dataset>")
-        sys.exit(1)
-    
-    eval_dir = sys.argv[1]
-    dataset = sys.argv[2]
+    parser = argparse.ArgumentParser(description='Umeyama轨迹对齐和评估')
+    parser.add_argument('eval_dir', help='评估目录')
+    parser.add_argument('dataset', help='数据集名称')
+    parser.add_argument('--robust', choices=['huber', 'cauchy'], default=None,
+                        help='鲁棒对齐（抗UWB跳变/VIO重置等离群点）')
+    parser.add_argument('--max-dt', type=float, default=DEFAULT_MAX_DT, help='时间戳关联最大时间差 (s)')
+    parser.add_argument('--interpolation', choices=['nearest', 'linear'], default='nearest',
+                        help='时间戳关联方式')
+    parser.add_argument('--follow', metavar='EST_FILE', default=None,
+                        help='跟随正在写入的估计轨迹（如vins_result_no_loop.csv），增量输出指标')
+    add_follow_arguments(parser)
+    args = parser.parse_args()
+    
+    eval_dir = args.eval_dir
+    dataset = args.dataset
+
+    if args.follow:
+        _, aborted = follow(f"{eval_dir}/trajectories/gt_{dataset}.txt", args.follow,
+                            interval=args.interval, idle_timeout=args.idle_timeout,
+                            max_ate=args.max_ate, snapshot_file=args.snapshot_file,
+                            max_dt=args.max_dt, interpolation=args.interpolation,
+                            segment_length=args.segment_length)
+        sys.exit(ABORT_EXIT_CODE if aborted else 0)
     
     print(f"🎯 使用Umeyama算法对齐轨迹: {dataset}")
     print("")
@@ -410,7 +383,8 @@ def main():
     os.makedirs(f"{eval_dir}/visualizations", exist_ok=True)
     os.makedirs(f"{eval_dir}/evaluations", exist_ok=True)
     
-    plot_comparison(eval_dir, dataset)
+    plot_comparison(eval_dir, dataset, max_dt=args.max_dt, interpolation=args.interpolation,
+                    robust=args.robust)
     
     print("")
     print("✅ 轨迹对齐和评估完成！")
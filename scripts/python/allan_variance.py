@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+IMU Allan方差分析 - 长时间静止数据的重叠Allan标准差，六轴一次完成
+
+对每个簇长 m（对数间隔），由积分量 θ_k = τ0 Σ y 的二阶差分直接得到:
+    σ²(τ) = Σ (θ_{k+2m} - 2θ_{k+m} + θ_k)² / (2 τ² (N - 2m)),  τ = m τ0
+θ 只算一次累加和，每个簇长是一次切片运算，数小时200Hz数据也只需几秒，
+内存为累加和与差分缓冲两份 (6, N) 数组。累加前减去均值，避免长时间积分的数值损失。
+
+由曲线拟合噪声参数:
+    白噪声 N（斜率 -1/2 直线在 τ=1s 处的值）  → 连续噪声密度，对应VINS配置 acc_n / gyr_n
+    零偏不稳定性 B = min σ / 0.664
+    随机游走 K（斜率 +1/2 直线在 τ=3s 处的值） → 对应 acc_w / gyr_w
+
+用法:
+    python3 allan_variance.py static.bag [--topic /livox/imu] [-o allan.csv] [--plot allan.png] [--yaml noise.yaml]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from imu_dead_reckoning import load_imu_bag, load_imu_text
+
+DEFAULT_TOPIC = '/livox/imu'
+N_TAUS = 100
+AXES = ('ax', 'ay', 'az', 'gx', 'gy', 'gz')
+BIAS_INSTABILITY_FACTOR = 0.664   # sqrt(2 ln2 / π)
+
+
+def cluster_sizes(n, n_taus=N_TAUS):
+    """对数间隔的簇长（1 .. (n-1)/2，去重）"""
+    max_m = max(1, (n - 1) // 2)
+    return np.unique(np.logspace(0, np.log10(max_m), n_taus).astype(int))
+
+
+def overlapping_adev(y, tau0, n_taus=N_TAUS):
+    """
+    y: (N, C) 等间隔采样的速率量（加速度或角速度）
+    返回 (taus (M,), adev (M, C))
+    """
+    y = np.asarray(y, dtype=float)
+    if y.ndim == 1:
+        y = y[:, None]
+    n, channels = y.shape
+    # 按通道连续存放，每个簇长的二阶差分只产生一个临时数组
+    theta = np.zeros((channels, n + 1))
+    np.cumsum(((y - y.mean(axis=0)) * tau0).T, axis=1, out=theta[:, 1:])
+
+    ms = cluster_sizes(n + 1, n_taus)
+    taus = ms * tau0
+    avar = np.empty((len(ms), channels))
+    d = np.empty((channels, n + 1))
+    for i, m in enumerate(ms):
+        k = n + 1 - 2 * m
+        dk = d[:, :k]
+        np.multiply(theta[:, m:m + k], -2.0, out=dk)
+        dk += theta[:, 2 * m:]
+        dk += theta[:, :k]
+        avar[i] = np.einsum('ij,ij->i', dk, dk) / (2.0 * taus[i]**2 * k)
+    return taus, np.sqrt(avar)
+
+
+def _line_at(taus, adev, slope, tau_eval):
+    """在 log-log 曲线上找斜率最接近 slope 的点，沿该斜率外推到 tau_eval"""
+    logt = np.log10(taus)
+    loga = np.log10(adev)
+    d = np.diff(loga) / np.diff(logt)
+    i = int(np.argmin(np.abs(d - slope)))
+    b = loga[i] - slope * logt[i]
+    return 10 ** (slope * np.log10(tau_eval) + b)
+
+
+def noise_parameters(taus, adev):
+    """每个通道的 (白噪声N, 零偏不稳定性B, 随机游走K)，adev 为 (M, C)"""
+    out = []
+    for c in range(adev.shape[1]):
+        a = adev[:, c]
+        ok = a > 0
+        t, a = taus[ok], a[ok]
+        if len(t) < 3:
+            out.append((np.nan, np.nan, np.nan))
+            continue
+        out.append((_line_at(t, a, -0.5, 1.0), np.min(a) / BIAS_INSTABILITY_FACTOR, _line_at(t, a, 0.5, 3.0)))
+    return np.array(out)
+
+
+def save_plot(taus, adev, filename):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+    for ax, sl, title, unit in ((axes[0], slice(0, 3), 'Accelerometer', 'm/s²'),
+                                (axes[1], slice(3, 6), 'Gyroscope', 'rad/s')):
+        for c, name in zip(range(sl.start, sl.stop), AXES[sl]):
+            ax.loglog(taus, adev[:, c], label=name)
+        ax.set_xlabel('τ (s)')
+        ax.set_ylabel(f'Allan deviation ({unit})')
+        ax.set_title(title)
+        ax.grid(True, which='both', alpha=0.3)
+        ax.legend()
+    fig.tight_layout()
+    fig.savefig(filename, dpi=150)
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IMU Allan方差分析（重叠Allan标准差）')
+    parser.add_argument('input', help='静止IMU数据: .bag 或 文本/CSV文件')
+    parser.add_argument('--topic', default=DEFAULT_TOPIC, help='bag中的IMU话题')
+    parser.add_argument('--accel-first', action='store_true', help='文本列顺序为 t, a, w')
+    parser.add_argument('--n-taus', type=int, default=N_TAUS, help='τ 点数（对数间隔）')
+    parser.add_argument('-o', '--output', default='allan_deviation.csv', help='输出CSV: tau, 六轴Allan标准差')
+    parser.add_argument('--plot', default=None, help='保存log-log曲线图')
+    parser.add_argument('--yaml', default=None, help='保存噪声参数（VINS配置字段）')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"❌ 文件不存在: {args.input}")
+        sys.exit(1)
+
+    start = time.time()
+    if args.input.endswith('.bag'):
+        t, acc, gyro = load_imu_bag(args.input, args.topic)
+    else:
+        t, acc, gyro = load_imu_text(args.input, args.accel_first)
+    if len(t) < 100:
+        print("❌ 数据不足")
+        sys.exit(1)
+    tau0 = float(np.median(np.diff(t)))
+    print(f"📂 读取 {len(t)} 帧IMU, 时长 {(t[-1] - t[0]) / 3600.0:.2f} h, "
+          f"采样间隔 {tau0 * 1000:.3f} ms ({time.time() - start:.2f}s)")
+
+    start = time.time()
+    taus, adev = overlapping_adev(np.hstack([acc, gyro]), tau0, args.n_taus)
+    print(f"✅ {len(taus)} 个 τ 点, τ = {taus[0]:.4f} .. {taus[-1]:.1f} s ({time.time() - start:.2f}s)")
+
+    np.savetxt(args.output, np.column_stack([taus, adev]), delimiter=',', fmt='%.9e',
+               header='tau,' + ','.join(AXES), comments='')
+    print(f"💾 Allan标准差已保存: {args.output}")
+
+    params = noise_parameters(taus, adev)
+    print(f"\n  {'':<4}{'N (白噪声)':>14}{'B (零偏不稳定)':>16}{'K (随机游走)':>14}")
+    for name, (n, b, k) in zip(AXES, params):
+        print(f"  {name:<4}{n:>14.3e}{b:>16.3e}{k:>14.3e}")
+
+    noise = {
+        'acc_n': float(np.nanmean(params[:3, 0])),
+        'gyr_n': float(np.nanmean(params[3:, 0])),
+        'acc_w': float(np.nanmean(params[:3, 2])),
+        'gyr_w': float(np.nanmean(params[3:, 2])),
+    }
+    print("\n  VINS配置: " + ', '.join(f"{k}: {v:.3e}" for k, v in noise.items()))
+
+    if args.yaml:
+        import yaml
+        with open(args.yaml, 'w') as f:
+            yaml.dump(noise, f)
+        print(f"💾 噪声参数已保存: {args.yaml}")
+    if args.plot:
+        save_plot(taus, adev, args.plot)
+        print(f"📊 曲线图已保存: {args.plot}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+离线bag转换 - 单次读取原始bag，直接写出VIR-SLAM可用的bag
+
+与 VIRSLAMProcessor + rosbag record 的实时流程做同样的转换，但不依赖回放时序，
+不会因为调度丢消息，按CPU速度运行：
+    /usb_cam/image_raw    -> /synced/image_raw     灰度 + CLAHE（线程池并行）
+    /uwb/pose             -> /synced/uwb_range     参考基站距离（PointStamped）
+                             /synced/uwb_ranges    全部基站距离（见 uwb_ranges.py）
+    /livox/imu            -> /synced/imu           原样复制（不反序列化）
+    /livox/lidar          -> /synced/lidar
+    /usb_cam/camera_info  -> /synced/camera_info
+
+流水线按块处理（--chunk 条消息）：块内图像并行处理、UWB位姿一次向量化计算，其余
+话题直接复制序列化数据。输出消息默认沿用原记录时间（与实时 rosbag record 一致）；
+--time header 使用 header.stamp，仅适用于各传感器header时钟同源的录制，话题间
+时钟相差超过重排窗口时会给出警告；--time sync 按 sensor_sync.py 估计的各传感器
+时钟偏移/漂移把硬件时间换算到记录时钟，并改写 header.stamp。消息经过有界重排缓冲
+（--window 秒、最多 --max-buffer 条）后按时间顺序写出；超出窗口的迟到消息按已写出的
+最新时间写入并计数。
+
+用法:
+    python3 bag_converter.py recording.bag -o recording_virslam.bag
+    python3 bag_converter.py recording.bag -o out.bag --anchors uwb_anchors.yaml --remap /livox/imu:=/imu0
+"""
+
+import argparse
+import heapq
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from image_preprocess import CLIP_LIMIT, TILE_GRID, gray_clahe, mono8_message, thread_clahe
+from sensor_sync import ClockOffsetEstimator
+from uwb_ranges import compute_ranges, load_anchors, ranges_message
+
+# 输入话题 -> (处理方式, 输出话题)
+DEFAULT_RULES = {
+    '/usb_cam/image_raw': ('image', '/synced/image_raw'),
+    '/uwb/pose': ('uwb', '/synced/uwb_range'),
+    '/livox/imu': ('copy', '/synced/imu'),
+    '/livox/lidar': ('copy', '/synced/lidar'),
+    '/usb_cam/camera_info': ('copy', '/synced/camera_info'),
+}
+UWB_RANGES_SUFFIX = 's'         # /synced/uwb_range -> /synced/uwb_ranges
+
+DEFAULT_CHUNK = 256
+DEFAULT_WINDOW = 1.0            # s
+DEFAULT_MAX_BUFFER = 20000
+
+
+def parse_remaps(remaps, rules, keep_unmapped_topics=()):
+    """--remap in:=out：改变已有规则的输出话题，或为其它话题新增复制规则"""
+    rules = dict(rules)
+    for topic in keep_unmapped_topics:
+        rules.setdefault(topic, ('copy', topic))
+    for remap in remaps:
+        if ':=' not in remap:
+            raise ValueError(f"重映射格式应为 in:=out: {remap}")
+        src, dst = remap.split(':=', 1)
+        kind = rules.get(src, ('copy', None))[0]
+        rules[src] = (kind, dst)
+    return rules
+
+
+def raw_header_stamp(raw):
+    """序列化消息的 header.stamp（秒）；消息类型没有header时返回 None"""
+    pytype = raw[4]
+    if not getattr(pytype, '_has_header', False):
+        return None
+    secs, nsecs = struct.unpack_from('<II', raw[1], 4)
+    return secs + nsecs * 1e-9
+
+
+def set_raw_header_stamp(raw, t):
+    """改写序列化消息的 header.stamp，返回新的raw元组"""
+    data = bytearray(raw[1])
+    struct.pack_into('<II', data, 4, *divmod(int(round(t * 1e9)), 1000000000))
+    return (raw[0], bytes(data)) + tuple(raw[2:])
+
+
+def set_header_stamp(header, t):
+    header.stamp.secs, header.stamp.nsecs = divmod(int(round(t * 1e9)), 1000000000)
+
+
+def deserialize(raw):
+    msg = raw[4]()
+    msg.deserialize(raw[1])
+    return msg
+
+
+class ReorderBuffer:
+    """按时间排序的有界缓冲：早于 (最新时间 - window) 或超出容量的消息依次交给 write"""
+
+    def __init__(self, write, window=DEFAULT_WINDOW, max_size=DEFAULT_MAX_BUFFER):
+        self.write = write
+        self.window = window
+        self.max_size = max_size
+        self.heap = []
+        self.counter = 0
+        self.newest = -np.inf
+        self.last_written = -np.inf
+        self.late = 0
+        self.peak = 0
+
+    def push(self, t, topic, msg, raw):
+        heapq.heappush(self.heap, (t, self.counter, topic, msg, raw))
+        self.counter += 1
+        if t > self.newest:
+            self.newest = t
+
+    def release(self, flush=False):
+        heap = self.heap
+        if len(heap) > self.peak:
+            self.peak = len(heap)
+        horizon = np.inf if flush else self.newest - self.window
+        while heap and (heap[0][0] <= horizon or len(heap) > self.max_size):
+            t, _, topic, msg, raw = heapq.heappop(heap)
+            if t < self.last_written:
+                self.late += 1
+                t = self.last_written
+            self.last_written = t
+            self.write(topic, msg, t, raw)
+
+
+class BagConverter:
+    """
+    转换核心：process_chunk 接收 [(topic, raw, t)]（rosbag raw模式的消息元组，t为秒），
+    转换结果经 ReorderBuffer 交给 write(topic, msg, t, raw)
+    """
+
+    def __init__(self, write, rules=None, anchors=None, time_mode='record',
+                 window=DEFAULT_WINDOW, max_buffer=DEFAULT_MAX_BUFFER, workers=None,
+                 clip_limit=CLIP_LIMIT, tile_grid=TILE_GRID):
+        self.rules = rules or DEFAULT_RULES
+        self.anchors = load_anchors()[1] if anchors is None else anchors
+        self.time_mode = time_mode
+        self.clocks = {}
+        self.header_offsets = {}    # header模式：各话题首条消息的 header.stamp - 记录时间
+        self.clahe_params = (clip_limit, tile_grid)
+        self.buffer = ReorderBuffer(write, window, max_buffer)
+        self.pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count())
+        self.counts = {}
+        self.skipped = 0
+        self._image_class = None
+        self._point_class = None
+
+    def stamp(self, topic, header_stamp, t):
+        """输出时间：header.stamp、记录时间，或按时钟偏移估计换算后的硬件时间"""
+        if not header_stamp or self.time_mode == 'record':
+            return t
+        if self.time_mode == 'header':
+            if topic not in self.header_offsets:
+                self.header_offsets[topic] = header_stamp - t
+            return header_stamp
+        clock = self.clocks.get(topic)
+        if clock is None:
+            clock = self.clocks[topic] = ClockOffsetEstimator()
+        clock.update(header_stamp, t)
+        return clock.correct(header_stamp, t)
+
+    def emit(self, topic, msg, t, raw=False):
+        self.buffer.push(t, topic, msg, raw)
+        self.counts[topic] = self.counts.get(topic, 0) + 1
+
+    def _image(self, msg):
+        return gray_clahe(msg, thread_clahe(*self.clahe_params))
+
+    def process_chunk(self, items):
+        images, poses = [], []
+        for topic, raw, t in items:
+            rule = self.rules.get(topic)
+            if rule is None:
+                continue
+            kind, out_topic = rule
+            if kind == 'image':
+                images.append((out_topic, deserialize(raw), t))
+            elif kind == 'uwb':
+                poses.append((out_topic, deserialize(raw), t))
+            else:
+                header_stamp = raw_header_stamp(raw)
+                t = self.stamp(out_topic, header_stamp, t)
+                if self.time_mode == 'sync' and header_stamp:
+                    raw = set_raw_header_stamp(raw, t)
+                self.emit(out_topic, raw, t, raw=True)
+
+        if images:
+            self._convert_images(images)
+        if poses:
+            self._convert_poses(poses)
+        self.buffer.release()
+
+    def _convert_images(self, images):
+        if self._image_class is None:
+            from sensor_msgs.msg import Image
+            self._image_class = Image
+        grays = self.pool.map(self._image, [msg for _, msg, _ in images])
+        for (out_topic, msg, t), gray in zip(images, grays):
+            if gray is None:
+                # 与实时处理节点一致：不支持的编码不输出
+                self.skipped += 1
+                continue
+            t = self.stamp(out_topic, msg.header.stamp.to_sec(), t)
+            if self.time_mode == 'sync':
+                set_header_stamp(msg.header, t)
+            self.emit(out_topic, mono8_message(msg.header, gray, self._image_class), t)
+
+    def _convert_poses(self, poses):
+        if self._point_class is None:
+            from geometry_msgs.msg import PointStamped
+            self._point_class = PointStamped
+        positions = np.array([(m.pose.position.x, m.pose.position.y, m.pose.position.z) for _, m, _ in poses])
+        ranges = compute_ranges(positions, self.anchors)
+        for (out_topic, msg, t), row in zip(poses, ranges):
+            stamp = msg.header.stamp.to_sec()
+            t = self.stamp(out_topic, stamp, t)
+            if self.time_mode == 'sync' and stamp:
+                set_header_stamp(msg.header, t)
+                stamp = t
+            point = self._point_class()
+            point.header = msg.header
+            point.point.x = float(row[0])
+            self.emit(out_topic, point, t)
+            self.emit(out_topic + UWB_RANGES_SUFFIX, ranges_message(stamp, row), t)
+
+    def header_clock_spread(self):
+        """header模式下各话题时钟偏移的最大差值（秒），话题不足两个时为0"""
+        if len(self.header_offsets) < 2:
+            return 0.0
+        offsets = self.header_offsets.values()
+        return max(offsets) - min(offsets)
+
+    def finish(self):
+        self.buffer.release(flush=True)
+        self.pool.shutdown()
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def convert_bag(input_bag, output_bag, rules, anchors, args):
+    import rosbag
+    import rospy
+
+    with rosbag.Bag(input_bag) as src, rosbag.Bag(output_bag, 'w', compression=args.compression) as dst:
+        def write(topic, msg, t, raw):
+            dst.write(topic, msg, rospy.Time.from_sec(t), raw=raw)
+
+        converter = BagConverter(write, rules, anchors, time_mode=args.time,
+                                 window=args.window, max_buffer=args.max_buffer, workers=args.workers,
+                                 clip_limit=args.clip_limit, tile_grid=args.tile_grid)
+        topics = [topic for topic in rules if topic in src.get_type_and_topic_info().topics]
+        total = src.get_message_count(topic_filters=topics)
+        duration = src.get_end_time() - src.get_start_time() if total else 0.0
+        print(f"📂 {input_bag}: {total} 条消息, {duration:.1f}s, 话题 {len(topics)} 个")
+
+        messages = ((topic, raw, t.to_sec()) for topic, raw, t in src.read_messages(topics=topics, raw=True))
+        done = 0
+        last_report = time.time()
+        for chunk in chunked(messages, args.chunk):
+            converter.process_chunk(chunk)
+            done += len(chunk)
+            if time.time() - last_report > 5.0:
+                print(f"   {done}/{total} ({100.0 * done / total:.0f}%)")
+                last_report = time.time()
+        converter.finish()
+    return converter, total, duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线bag转换（灰度+CLAHE、UWB距离、话题重映射）')
+    parser.add_argument('input', help='原始bag')
+    parser.add_argument('-o', '--output', default=None, help='输出bag（默认 <input>_virslam.bag）')
+    parser.add_argument('--anchors', default=None, help='UWB基站YAML（默认原点单基站）')
+    parser.add_argument('--remap', action='append', default=[], help='话题重映射 in:=out，可重复')
+    parser.add_argument('--keep', action='append', default=[], help='其它需要原样复制的话题，可重复')
+    parser.add_argument('--time', choices=['record', 'header', 'sync'], default='record',
+                        help='输出消息的记录时间: 原记录时间、header.stamp（要求各传感器时钟同源），'
+                             '或估计时钟偏移后换算的硬件时间')
+    parser.add_argument('--chunk', type=int, default=DEFAULT_CHUNK, help='每块消息数')
+    parser.add_argument('--window', type=float, default=DEFAULT_WINDOW, help='重排窗口（秒）')
+    parser.add_argument('--max-buffer', type=int, default=DEFAULT_MAX_BUFFER, help='重排缓冲最多消息数')
+    parser.add_argument('--workers', type=int, default=None, help='图像处理线程数（默认CPU核数）')
+    parser.add_argument('--clip-limit', type=float, default=CLIP_LIMIT, help='CLAHE clipLimit')
+    parser.add_argument('--tile-grid', type=int, default=TILE_GRID, help='CLAHE tileGridSize')
+    parser.add_argument('--compression', choices=['none', 'bz2', 'lz4'], default='none', help='输出bag压缩')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"❌ 文件不存在: {args.input}")
+        sys.exit(1)
+    output = args.output or os.path.splitext(args.input)[0] + '_virslam.bag'
+
+    rules = parse_remaps(args.remap, DEFAULT_RULES, args.keep)
+    anchor_ids, anchors = load_anchors(args.anchors)
+
+    start = time.time()
+    converter, total, duration = convert_bag(args.input, output, rules, anchors, args)
+    elapsed = time.time() - start
+
+    speed = f", {duration / elapsed:.0f}x 实时" if elapsed > 0 and duration > 0 else ""
+    print(f"✅ {output}: 用时 {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} msg/s{speed})")
+    for topic, count in sorted(converter.counts.items()):
+        print(f"   {topic}: {count}")
+    print(f"   UWB基站 {len(anchor_ids)} 个; 重排缓冲峰值 {converter.buffer.peak} 条, "
+          f"迟到 {converter.buffer.late} 条; 跳过的图像 {converter.skipped} 条")
+    spread = converter.header_clock_spread()
+    if spread > args.window:
+        print(f"⚠️  各话题 header 时钟相差 {spread:.3f}s，超过重排窗口 {args.window}s，"
+              f"时钟较早的话题会被压到已写出的最新时间（见上面的迟到计数）:")
+        for topic, offset in sorted(converter.header_offsets.items()):
+            print(f"   {topic}: header - 记录时间 = {offset:+.3f}s")
+        print("   建议使用 --time record 或 --time sync 重新转换")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+批量轨迹评估 - 自动发现评估根目录下的所有数据集，并行执行对齐、指标计算和绘图
+
+目录约定（与align_trajectories.py一致）:
+    <eval_dir>/trajectories/gt_<dataset>.txt
+    <eval_dir>/trajectories/<estimator>_<dataset>.txt
+
+用法:
+    python3 batch_evaluate.py <eval_root> [-j 进程数] [--no-plots]
+结果汇总写入 <eval_root>/batch_metrics.csv
+"""
+
+import argparse
+import contextlib
+import csv
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+METRIC_FIELDS = ['n_poses', 'n_matched', 'ate_rmse', 'ate_mean', 'ate_median',
+                 'ate_max', 'loop_error', 'scale', 'path_length', 'drift_percent',
+                 'rot_drift_deg_per_m', 'inlier_ratio']
+
+
+def discover_jobs(eval_root):
+    """
+    查找所有数据集
+    返回 [(eval_dir, dataset, [estimator, ...]), ...]
+    一个数据集名是另一个的后缀时（gt_01 与 gt_MH_01），vio_MH_01.txt 只归属最长匹配的 MH_01
+    """
+    jobs = []
+    pattern = os.path.join(eval_root, '**', 'trajectories', 'gt_*.txt')
+    for gt_file in sorted(glob.glob(pattern, recursive=True)):
+        traj_dir = os.path.dirname(gt_file)
+        eval_dir = os.path.dirname(traj_dir)
+        dataset = os.path.basename(gt_file)[len('gt_'):-len('.txt')]
+        longer = [os.path.basename(f)[len('gt_'):-len('.txt')]
+                  for f in glob.glob(os.path.join(traj_dir, 'gt_*.txt'))]
+        longer = tuple(f"_{d}.txt" for d in longer if d.endswith(f"_{dataset}"))
+
+        estimators = []
+        for name in sorted(os.listdir(traj_dir)):
+            suffix = f"_{dataset}.txt"
+            if not name.endswith(suffix) or name.startswith('gt_'):
+                continue
+            if longer and name.endswith(longer):
+                continue
+            estimator = name[:-len(suffix)]
+            if estimator and not estimator.endswith('_aligned'):
+                estimators.append(estimator)
+        if estimators:
+            jobs.append((eval_dir, dataset, estimators))
+    return jobs
+
+
+def _init_worker():
+    """子进程中使用非交互后端（evaluation_plots导入时已设置Agg）"""
+    import evaluation_plots  # noqa: F401
+
+
+def run_job(eval_dir, dataset, estimators, plots=True, robust=None):
+    """
+    评估一个数据集（在子进程中执行）
+    vio/vir都存在且plots=True时生成完整对比图，其余估计器只计算指标。
+    输出重定向到 <eval_dir>/evaluations/batch_<dataset>.log；图和指标文件名带 _<dataset> 后缀，
+    同一目录下的多个数据集并行评估时互不覆盖
+    返回 [(estimator, metrics或None), ...]
+    """
+    from align_trajectories import evaluate_estimator, load_tum, plot_comparison
+
+    os.makedirs(f"{eval_dir}/visualizations", exist_ok=True)
+    os.makedirs(f"{eval_dir}/evaluations", exist_ok=True)
+
+    results = {}
+    with open(f"{eval_dir}/evaluations/batch_{dataset}.log", 'w') as log, \
+            contextlib.redirect_stdout(log):
+        if plots and 'vio' in estimators and 'vir' in estimators:
+            results.update(plot_comparison(eval_dir, dataset, render_workers=1, robust=robust,
+                                           suffix=f"_{dataset}") or {})
+
+        gt = load_tum(f"{eval_dir}/trajectories/gt_{dataset}.txt")
+        for estimator in estimators:
+            if estimator in results:
+                continue
+            est = load_tum(f"{eval_dir}/trajectories/{estimator}_{dataset}.txt")
+            results[estimator] = evaluate_estimator(gt, est, robust=robust)
+
+    return [(estimator, results.get(estimator)) for estimator in estimators]
+
+
+def write_table(rows, filename):
+    """写出合并的指标表"""
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['eval_dir', 'dataset', 'estimator'] + METRIC_FIELDS)
+        for eval_dir, dataset, estimator, metrics in rows:
+            values = [metrics.get(k, '') if metrics else '' for k in METRIC_FIELDS]
+            values = ['' if v is None else v for v in values]
+            writer.writerow([eval_dir, dataset, estimator] + values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量轨迹评估')
+    parser.add_argument('eval_root', help='评估根目录')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='并行进程数')
+    parser.add_argument('--no-plots', action='store_true', help='只计算指标，不生成图')
+    parser.add_argument('--robust', choices=['huber', 'cauchy'], default=None, help='鲁棒对齐')
+    parser.add_argument('-o', '--output', default=None, help='指标表路径（默认 <eval_root>/batch_metrics.csv）')
+    args = parser.parse_args()
+
+    jobs = discover_jobs(args.eval_root)
+    if not jobs:
+        print(f"❌ 未在 {args.eval_root} 下找到 trajectories/gt_*.txt")
+        sys.exit(1)
+
+    print(f"🎯 发现 {len(jobs)} 个数据集，使用 {args.jobs} 个进程")
+    start = time.time()
+
+    rows = []
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker) as pool:
+        futures = {pool.submit(run_job, eval_dir, dataset, estimators, not args.no_plots, args.robust):
+                   (eval_dir, dataset) for eval_dir, dataset, estimators in jobs}
+        for future in as_completed(futures):
+            eval_dir, dataset = futures[future]
+            try:
+                for estimator, metrics in future.result():
+                    rows.append((eval_dir, dataset, estimator, metrics))
+                print(f"✅ {dataset} ({eval_dir})")
+            except Exception as e:
+                failed += 1
+                print(f"❌ {dataset} ({eval_dir}): {e}")
+
+    rows.sort(key=lambda r: (r[0], r[1], r[2]))
+    output = args.output or os.path.join(args.eval_root, 'batch_metrics.csv')
+    write_table(rows, output)
+
+    print("")
+    print(f"{'dataset':<24}{'estimator':<12}{'matched':>10}{'ATE RMSE':>12}{'Loop':>10}")
+    for eval_dir, dataset, estimator, metrics in rows:
+        if metrics:
+            print(f"{dataset:<24}{estimator:<12}{metrics['n_matched']:>10}"
+                  f"{metrics['ate_rmse']:>12.4f}{metrics['loop_error']:>10.4f}")
+        else:
+            print(f"{dataset:<24}{estimator:<12}{'-':>10}{'-':>12}{'-':>10}")
+
+    print("")
+    print(f"✅ 批量评估完成: {len(jobs) - failed}/{len(jobs)} 个数据集, 用时 {time.time() - start:.1f}s")
+    print(f"📄 指标表: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+评估流水线基准测试 - 合成GT/估计轨迹，逐阶段计时、记录峰值内存，并校验对齐参数
+
+对每个规模 N 生成:
+    GT: N个位姿（平滑曲线 + 对应姿态）
+    估计: 在与GT相差 time_offset 的时刻采样同一曲线，加高斯噪声、可选线性漂移，
+          再经已知相似变换 (s, R, t) 变到估计坐标系
+阶段: 写TUM → 解析(冷) → 加载(缓存) → 关联 → 对齐(全量/采样/鲁棒) → ATE → RPE → 分段漂移
+校验: 无漂移时Sim(3)对齐参数与真值一致、ATE与噪声水平一致（验证线性插值关联补偿了时间偏移）；
+      有漂移时对齐参数不再等于真值（尺度会吸收一部分漂移），改为校验对齐后ATE不超过真值变换下的ATE，
+      以及按真值变换计算的分段漂移与注入的漂移率一致。任一规模校验失败时以返回码1退出。
+结果写入JSON，便于对比不同版本的性能。
+
+用法:
+    python3 benchmark_evaluation.py [--sizes 1000 10000 100000 1000000 10000000] [--drift 0.01] [-o result.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from scipy.spatial.transform import Rotation
+
+from align_trajectories import align_trajectory_umeyama, apply_alignment
+from robust_alignment import robust_umeyama
+from trajectory_association import associate_poses
+from trajectory_drift import compute_segment_drift
+from trajectory_io import load_trajectory
+from trajectory_rpe import compute_rpe, path_length
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+# 对齐参数校验容差
+ROT_TOL_DEG = 0.1
+TRANS_TOL = 0.05
+SCALE_TOL = 1e-3
+# ATE与期望值的相对容差
+ATE_TOL = 0.1
+# 分段漂移与注入漂移率的相对容差
+DRIFT_TOL = 0.05
+
+# 真实的 est->gt 相似变换
+TRUE_SCALE = 1.3
+# 漂移方向（GT坐标系，未归一化）
+DRIFT_DIRECTION = np.array([1.0, 0.5, 0.0])
+
+
+def figure8(t, duration):
+    """8字形轨迹（带高度起伏）在时刻 t 的位置 (N, 3) 和姿态 (N, 4)，duration 内走完一圈"""
+    phase = 2 * np.pi * t / max(duration, 1e-9)
+    p = np.column_stack([20 * np.sin(phase), 10 * np.sin(2 * phase), 1.5 * np.sin(0.5 * phase)])
+    # 航向沿水平速度方向
+    yaw = np.arctan2(20 * np.cos(2 * phase), 20 * np.cos(phase))
+    return p, Rotation.from_euler('z', yaw[:, None]).as_quat()
+
+
+def make_pair(n, rate=200.0, noise=0.02, drift=0.0, time_offset=0.002, scale=TRUE_SCALE, seed=0):
+    """
+    生成一对合成轨迹
+    返回 (gt, est, truth)，truth 为真实的 est->gt 变换 {'s', 'R', 't'}，
+    以及真值变换下ATE的两个确定性来源: GT线性插值到估计时刻的残差RMS 'interp_rms'、漂移偏移RMS 'drift_rms'
+    drift: 沿行驶距离的线性漂移系数 (m/m)，在GT坐标系中注入
+    time_offset: 估计的采样时刻相对GT的偏移 (s)，估计位姿取曲线在该时刻的真值
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / rate
+    # 无论规模大小都覆盖完整的8字形，保证对齐问题的几何条件一致
+    duration = max(t[-1], 1e-9)
+    p_gt, q_gt = figure8(t, duration)
+    gt = np.column_stack([t, p_gt, q_gt])
+
+    t_est = t + time_offset
+    p_true, q_true = figure8(t_est, duration)
+    p_noisy = p_true + rng.normal(0.0, noise, p_true.shape)
+    drift_rms = 0.0
+    if drift:
+        offset = drift * path_length(p_true)[:, None] * DRIFT_DIRECTION
+        p_noisy += offset
+        drift_rms = float(np.sqrt(np.mean(np.sum(offset**2, axis=1))))
+
+    # 真实变换：est = R^T (gt - t) / s
+    R = Rotation.from_euler('xyz', [0.05, -0.03, 1.2]).as_matrix()
+    tr = np.array([3.0, -2.0, 0.5])
+    R_inv = Rotation.from_matrix(R).inv()
+    p_est = (R.T @ (p_noisy - tr).T).T / scale
+    q_est = (R_inv * Rotation.from_quat(q_true)).as_quat()
+    est = np.column_stack([t_est, p_est, q_est])
+
+    # GT采样间隔内的线性插值误差（只统计落在GT时间范围内的估计位姿）
+    inside = (t_est >= t[0]) & (t_est <= t[-1])
+    p_interp = np.column_stack([np.interp(t_est[inside], t, p_gt[:, k]) for k in range(3)])
+    residual = np.linalg.norm(p_interp - p_true[inside], axis=1)
+    interp_rms = float(np.sqrt(np.mean(residual**2))) if len(residual) else 0.0
+
+    return gt, est, {'s': scale, 'R': R, 't': tr, 'interp_rms': interp_rms, 'drift_rms': drift_rms}
+
+
+def write_tum(filename, traj):
+    np.savetxt(filename, traj, fmt='%.9f')
+
+
+class Stage:
+    """
+    计时或记录峰值内存（tracemalloc跟踪NumPy分配）
+    tracemalloc本身会拖慢执行，所以计时和测内存分两遍运行
+    """
+
+    def __init__(self, results, name, memory=False):
+        self.results = results
+        self.name = name
+        self.memory = memory
+
+    def __enter__(self):
+        if self.memory:
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        entry = self.results.setdefault(self.name, {})
+        if self.memory:
+            _, peak = tracemalloc.get_traced_memory()
+            entry['peak_mb'] = peak / 1e6
+        else:
+            entry['seconds'] = elapsed
+        return False
+
+
+def alignment_error(s, R, t, truth):
+    """恢复参数与真值的误差"""
+    dR = Rotation.from_matrix(R.T @ truth['R']).magnitude()
+    return {
+        'rot_err_deg': float(np.degrees(dR)),
+        'trans_err': float(np.linalg.norm(t - truth['t'])),
+        'scale_err': float(abs(s - truth['s'])),
+    }
+
+
+def run_stages(stages, memory, gt_file, est_file, cache_dir):
+    """执行一遍所有评估阶段"""
+    with Stage(stages, 'parse_cold', memory):
+        gt = load_trajectory(gt_file, fmt='tum', cache_dir=cache_dir)
+        est = load_trajectory(est_file, fmt='tum', cache_dir=cache_dir)
+    with Stage(stages, 'load_cached', memory):
+        gt = load_trajectory(gt_file, fmt='tum', cache_dir=cache_dir)
+        est = load_trajectory(est_file, fmt='tum', cache_dir=cache_dir)
+    with Stage(stages, 'associate', memory):
+        assoc = associate_poses(gt, est, interpolation='linear')
+    with Stage(stages, 'align_full', memory):
+        aligned, s, R, t = align_trajectory_umeyama(est, gt, assoc=assoc, with_scale=True)
+    with Stage(stages, 'align_sampled', memory):
+        _, s_sampled, R_sampled, t_sampled = align_trajectory_umeyama(est, gt, with_scale=True)
+    with Stage(stages, 'align_robust', memory):
+        s_robust, R_robust, t_robust, _ = robust_umeyama(assoc.est_positions(est), assoc.ref_positions(gt),
+                                                         loss='huber', with_scale=True)
+    with Stage(stages, 'ate', memory):
+        errors = assoc.position_errors(gt, aligned)
+        ate = float(np.sqrt(np.mean(errors**2)))
+    with Stage(stages, 'rpe', memory):
+        arc = path_length(assoc.ref_positions(gt))
+        compute_rpe(gt, aligned, assoc, dist=arc)
+    with Stage(stages, 'segment_drift', memory):
+        drift_rows, _ = compute_segment_drift(gt, aligned, assoc, dist=arc)
+    return assoc, ate, drift_rows, (s, R, t), (s_sampled, R_sampled, t_sampled), (s_robust, R_robust, t_robust)
+
+
+def check_drift(rows, drift, noise):
+    """
+    有漂移时的校验：按真值变换对齐后，最长分段的平移漂移应接近注入的漂移率
+    期望值 = drift * |方向| * 100 (%)；分段两端的噪声约贡献 sqrt(6) * noise / L，计入容差
+    返回 (passed, 明细)
+    """
+    if not rows:
+        return False, None
+    row = rows[-1]
+    length = row['length']
+    expected = drift * np.linalg.norm(DRIFT_DIRECTION) * 100
+    tol = expected * DRIFT_TOL + np.sqrt(6) * noise / length * 100
+    measured = row['trans_drift_percent']
+    detail = {'length': length, 'measured_percent': measured, 'expected_percent': expected,
+              'tolerance_percent': tol}
+    return bool(abs(measured - expected) <= tol), detail
+
+
+def run_size(n, workdir, noise, drift, time_offset, scale):
+    """单个规模的完整基准"""
+    print(f"📏 N = {n}")
+    stages = {}
+    gt, est, truth = make_pair(n, noise=noise, drift=drift, time_offset=time_offset, scale=scale)
+    gt_file = os.path.join(workdir, f"gt_{n}.txt")
+    est_file = os.path.join(workdir, f"est_{n}.txt")
+    cache_dir = os.path.join(workdir, 'cache')
+
+    with Stage(stages, 'write_tum'):
+        write_tum(gt_file, gt)
+        write_tum(est_file, est)
+
+    for memory in (False, True):
+        if memory:
+            tracemalloc.start()
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        try:
+            out = run_stages(stages, memory, gt_file, est_file, cache_dir)
+        finally:
+            if memory:
+                tracemalloc.stop()
+    assoc, ate, drift_rows, (s, R, t), (s_sampled, R_sampled, t_sampled), (s_robust, R_robust, t_robust) = out
+
+    full = alignment_error(s, R, t, truth)
+    sampled = alignment_error(s_sampled, R_sampled, t_sampled, truth)
+    robust = alignment_error(s_robust, R_robust, t_robust, truth)
+    # 真值变换下的ATE：各轴独立高斯噪声 + GT插值残差 + 漂移偏移
+    expected_ate = float(np.sqrt(3 * noise**2 + truth['interp_rms']**2 + truth['drift_rms']**2))
+    if drift == 0.0:
+        alignment_passed = all(e['rot_err_deg'] < ROT_TOL_DEG and e['trans_err'] < TRANS_TOL and
+                               e['scale_err'] < SCALE_TOL for e in (full, robust))
+        ate_passed = bool(abs(ate - expected_ate) <= expected_ate * ATE_TOL)
+        drift_passed, drift_check = None, None
+    else:
+        # 最小二乘对齐的ATE不会超过真值变换下的ATE
+        alignment_passed = None
+        ate_passed = bool(ate <= expected_ate * (1 + ATE_TOL))
+        truth_aligned = apply_alignment(est, truth['s'], truth['R'], truth['t'])
+        drift_rows, _ = compute_segment_drift(gt, truth_aligned, assoc)
+        drift_passed, drift_check = check_drift(drift_rows, drift, noise)
+    passed = all(p is not False for p in (alignment_passed, ate_passed, drift_passed))
+
+    for name, r in stages.items():
+        peak = f"{r['peak_mb']:>9.1f} MB" if 'peak_mb' in r else ''
+        print(f"  {name:<14} {r['seconds'] * 1000:>10.1f} ms  {peak}")
+    print(f"  matched {len(assoc)}/{n}, ATE {ate:.4f} m ({'<= ' if drift else ''}expected {expected_ate:.4f}), "
+          f"rot err {full['rot_err_deg']:.4f} deg, trans err {full['trans_err']:.4f} m, "
+          f"scale err {full['scale_err']:.2e}")
+    print(f"  robust/full alignment time {stages['align_robust']['seconds'] / stages['align_full']['seconds']:.1f}x, "
+          f"robust rot err {robust['rot_err_deg']:.4f} deg")
+    if drift_check:
+        print(f"  drift @{drift_check['length']:.0f} m: {drift_check['measured_percent']:.3f}% "
+              f"(expected {drift_check['expected_percent']:.3f} ± {drift_check['tolerance_percent']:.3f}%)")
+    print(f"  {'✅' if passed else '❌'} check")
+
+    return {
+        'n_poses': n,
+        'n_matched': len(assoc),
+        'ate_rmse': ate,
+        'expected_ate': expected_ate,
+        'stages': stages,
+        'alignment_full': full,
+        'alignment_sampled': sampled,
+        'alignment_robust': robust,
+        'alignment_passed': alignment_passed,
+        'ate_passed': ate_passed,
+        'drift_check': drift_check,
+        'drift_passed': drift_passed,
+        'passed': passed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='评估流水线基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='轨迹位姿数')
+    parser.add_argument('--noise', type=float, default=0.02, help='位置噪声标准差 (m)')
+    parser.add_argument('--drift', type=float, default=0.0, help='线性漂移系数 (m/m)')
+    parser.add_argument('--time-offset', type=float, default=0.002, help='估计轨迹时间偏移 (s)')
+    parser.add_argument('--scale', type=float, default=TRUE_SCALE, help='真实尺度（Sim(3)对齐需恢复）')
+    parser.add_argument('-o', '--output', default='benchmark_evaluation.json', help='结果JSON路径')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='vir_slam_bench_')
+    results = []
+    try:
+        for n in args.sizes:
+            results.append(run_size(n, workdir, args.noise, args.drift, args.time_offset, args.scale))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'params': {'noise': args.noise, 'drift': args.drift, 'time_offset': args.time_offset,
+                   'scale': args.scale},
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    failed = [r['n_poses'] for r in results if not r['passed']]
+    print("")
+    print(f"📄 结果已写入: {args.output}")
+    if failed:
+        print(f"❌ 校验失败: N = {failed}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+IMU回调延迟基准 - 逐条消息计时，对比旧实现与当前实现的单帧计算开销
+
+旧实现: 每帧构造NumPy数组、Rotation.from_rotvec、旋转复合、
+        as_euler/from_euler 往返做互补滤波（即改造前 imu_callback 的计算部分）
+当前实现: StreamingDeadReckoner（标量四元数原地更新，无欧拉角往返；ZUPT为O(1)滑动和）
+
+两者都从消息对象读取字段开始计时，不包含ROS发布（发布开销两者相同）。
+不依赖ROS，可直接在Jetson上运行:
+    python3 benchmark_imu_callback.py [-n 20000] [--zupt-detector shoe --zupt-window 400] [-o result.json]
+"""
+
+import argparse
+import json
+import platform
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import numpy as np
+from scipy.spatial.transform import Rotation
+
+from imu_dead_reckoning import (CALIBRATION_COUNT, ZUPT_DETECTOR, ZUPT_WINDOW, StreamingDeadReckoner,
+                                calibrate)
+from zupt_detector import DETECTORS
+
+RATE = 200.0
+
+
+class LegacyPipeline:
+    """改造前 imu_callback 的计算部分（校准完成后），逐行保留原写法"""
+
+    def __init__(self, calib):
+        self.position = np.array([0.0, 0.0, 0.0])
+        self.velocity = np.array([0.0, 0.0, 0.0])
+        self.orientation = Rotation.from_quat(calib['orientation'])
+        self.gravity = np.array([0.0, 0.0, 9.81])
+        self.last_time = None
+        self.subtract_gravity = calib['subtract_gravity']
+        self.accel_bias = calib['accel_bias']
+        self.gyro_bias = calib['gyro_bias']
+        self.zupt_gyro_thresh = 0.05
+        self.zupt_accel_var_thresh = 0.5
+        self.zupt_window = deque(maxlen=20)
+        self.alpha = 0.98
+
+    def _detect_stationary(self):
+        if len(self.zupt_window) < 10:
+            return False
+        gyro_list = np.array([s['gyro'] for s in self.zupt_window])
+        acc_list = np.array([s['acc'] for s in self.zupt_window])
+        gyro_norm = np.mean(np.linalg.norm(gyro_list, axis=1))
+        acc_var = np.mean(np.var(acc_list, axis=0))
+        return (gyro_norm < self.zupt_gyro_thresh) and (acc_var < self.zupt_accel_var_thresh)
+
+    def __call__(self, imu_msg):
+        acc_raw = np.array([
+            imu_msg.linear_acceleration.x,
+            imu_msg.linear_acceleration.y,
+            imu_msg.linear_acceleration.z
+        ])
+        gyro_raw = np.array([
+            imu_msg.angular_velocity.x,
+            imu_msg.angular_velocity.y,
+            imu_msg.angular_velocity.z
+        ])
+        current_time = imu_msg.header.stamp.to_sec()
+        if self.last_time is None:
+            self.last_time = current_time
+            return
+        dt = current_time - self.last_time
+        if dt <= 0 or dt > 0.1:
+            self.last_time = current_time
+            return
+
+        acc_body = acc_raw - self.accel_bias
+        gyro = gyro_raw - self.gyro_bias
+        self.zupt_window.append({'acc': acc_body.copy(), 'gyro': gyro.copy()})
+        is_stationary = self._detect_stationary()
+
+        angle = np.linalg.norm(gyro) * dt
+        if angle > 1e-6:
+            axis = gyro / np.linalg.norm(gyro)
+            delta_rotation = Rotation.from_rotvec(axis * angle)
+            self.orientation = self.orientation * delta_rotation
+
+        acc_norm = np.linalg.norm(acc_body)
+        if self.subtract_gravity and 8.0 < acc_norm < 11.0:
+            acc_pitch = np.arctan2(-acc_body[0], np.sqrt(acc_body[1]**2 + acc_body[2]**2))
+            acc_roll = np.arctan2(acc_body[1], acc_body[2])
+            current_euler = self.orientation.as_euler('xyz')
+            alpha = self.alpha if not is_stationary else 0.9
+            fused_roll = alpha * current_euler[0] + (1 - alpha) * acc_roll
+            fused_pitch = alpha * current_euler[1] + (1 - alpha) * acc_pitch
+            fused_yaw = current_euler[2]
+            self.orientation = Rotation.from_euler('xyz', [fused_roll, fused_pitch, fused_yaw])
+
+        acc_world = self.orientation.apply(acc_body)
+        if self.subtract_gravity:
+            acc_world -= self.gravity
+        if is_stationary:
+            self.velocity *= 0.5
+            acc_world *= 0.1
+        self.velocity += acc_world * dt
+        self.velocity *= 0.995
+        self.position += self.velocity * dt
+        quat = self.orientation.as_quat()
+        self.last_time = current_time
+        return self.position, quat
+
+
+class CurrentPipeline:
+    """当前 imu_callback 的计算部分"""
+
+    def __init__(self, calib, zupt_detector=ZUPT_DETECTOR, zupt_window=ZUPT_WINDOW):
+        self.reckoner = StreamingDeadReckoner(calib, zupt_detector, zupt_window)
+
+    def __call__(self, imu_msg):
+        acc = imu_msg.linear_acceleration
+        gyro = imu_msg.angular_velocity
+        reckoner = self.reckoner
+        if not reckoner.process(imu_msg.header.stamp.to_sec(),
+                                acc.x, acc.y, acc.z, gyro.x, gyro.y, gyro.z):
+            return
+        return reckoner.position, reckoner.attitude.as_quat()
+
+
+def make_messages(n, seed=0):
+    """合成IMU消息（结构与sensor_msgs/Imu相同的轻量对象）：静止段和运动段交替"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / RATE
+    moving = (np.arange(n) // 2000) % 2 == 1
+    gyro = rng.normal(0.0, 0.01, (n, 3)) + [0.01, -0.02, 0.005]
+    gyro[moving] += np.column_stack([0.3 * np.sin(t[moving]), np.full(moving.sum(), 0.2),
+                                     0.5 * np.cos(t[moving])])
+    acc = rng.normal(0.0, 0.05, (n, 3)) + [0.1, -0.2, 9.86]
+    acc[moving] += rng.normal(0.0, 1.0, (moving.sum(), 3))
+
+    msgs = []
+    for i in range(n):
+        stamp = SimpleNamespace(to_sec=float(t[i]).__float__)
+        msgs.append(SimpleNamespace(
+            header=SimpleNamespace(stamp=stamp),
+            linear_acceleration=SimpleNamespace(x=acc[i, 0], y=acc[i, 1], z=acc[i, 2]),
+            angular_velocity=SimpleNamespace(x=gyro[i, 0], y=gyro[i, 1], z=gyro[i, 2])))
+    return msgs, acc, gyro
+
+
+def time_pipeline(pipeline, msgs):
+    """逐条计时，返回 (每条耗时数组 us, 最后一次输出)"""
+    perf = time.perf_counter_ns
+    latency = np.empty(len(msgs))
+    out = None
+    for i, msg in enumerate(msgs):
+        start = perf()
+        result = pipeline(msg)
+        latency[i] = perf() - start
+        if result is not None:
+            out = result
+    return latency / 1000.0, out
+
+
+def summarize(latency):
+    return {
+        'mean_us': float(np.mean(latency)),
+        'p50_us': float(np.percentile(latency, 50)),
+        'p99_us': float(np.percentile(latency, 99)),
+        'max_us': float(np.max(latency)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IMU回调延迟基准')
+    parser.add_argument('-n', '--messages', type=int, default=20000, help='消息数')
+    parser.add_argument('--zupt-detector', choices=DETECTORS, default=ZUPT_DETECTOR, help='当前实现的零速检测器')
+    parser.add_argument('--zupt-window', type=int, default=ZUPT_WINDOW, help='当前实现的零速检测窗口长度')
+    parser.add_argument('-o', '--output', default=None, help='结果JSON路径')
+    args = parser.parse_args()
+
+    msgs, acc, gyro = make_messages(args.messages + CALIBRATION_COUNT)
+    calib = calibrate(acc[:CALIBRATION_COUNT], gyro[:CALIBRATION_COUNT])
+    msgs = msgs[CALIBRATION_COUNT:]
+
+    results = {}
+    outputs = {}
+    pipelines = (('legacy', LegacyPipeline(calib)),
+                 ('current', CurrentPipeline(calib, args.zupt_detector, args.zupt_window)))
+    for name, pipeline in pipelines:
+        latency, outputs[name] = time_pipeline(pipeline, msgs)
+        results[name] = summarize(latency)
+
+    print(f"📏 {len(msgs)} 条消息 @ {RATE:.0f} Hz")
+    print(f"  {'':<10}{'mean':>10}{'p50':>10}{'p99':>10}{'max':>10}  (us)")
+    for name, r in results.items():
+        print(f"  {name:<10}{r['mean_us']:>10.1f}{r['p50_us']:>10.1f}{r['p99_us']:>10.1f}{r['max_us']:>10.1f}")
+    speedup = results['legacy']['mean_us'] / results['current']['mean_us']
+    print(f"  加速比: {speedup:.1f}x")
+
+    # 倾角校正公式不同（测地线 vs 欧拉角融合），默认ZUPT设置下终点位置只应有小差异
+    diff = float(np.linalg.norm(np.asarray(outputs['legacy'][0]) - np.asarray(outputs['current'][0])))
+    print(f"  终点位置差异: {diff:.4f} m")
+
+    if args.output:
+        report = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'messages': len(msgs),
+            'zupt': {'detector': args.zupt_detector, 'window': args.zupt_window},
+            'results': results,
+            'speedup': speedup,
+            'final_position_diff_m': diff,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,379 @@
 #!/usr/bin/env python3
-import rosbag
+"""
+bag文件检查 - 话题、类型、数量，以及每个话题的时间统计
+
+只读取bag（格式2.0）的连接记录、块信息和每个块后面的索引记录（每条消息的记录时间
+和块内偏移），不读取、不解压消息内容，因此几十GB的bag也只需几秒。每个话题统计：
+    速率       (N - 1) / (最后 - 最早)
+    周期/抖动  相邻消息间隔的中位数；缺口以外间隔的标准差、|间隔 - 中位数| 的p99
+    间隔缺口   间隔 > --gap-factor × 中位周期 的次数、最长缺口、估计缺失的消息数
+    单调性     时间倒退（间隔 < 0）和重复时间（间隔 = 0）的次数
+默认统计记录时间（rosbag record 收到消息的时刻）；--header 时改为统计 header.stamp，
+需要读取（并解压）每个块，但仍只取消息头中的时间戳，不反序列化消息。
+
+结果缓存在bag旁边的 <bag>.index.json 中（按文件大小和修改时间判断是否有效）。
+
+用法:
+    python3 check_bag.py recording.bag
+    python3 check_bag.py recording.bag --header --gap-factor 5 --json stats.json
+"""
+
+import argparse
+import bz2
+import json
+import os
+import struct
 import sys
+import time
+
+import numpy as np
+
+BAG_MAGIC = b'#ROSBAG V2.0\n'
+OP_BAG_HEADER = 0x03
+
+INDEX_ENTRY = np.dtype([('sec', '<u4'), ('nsec', '<u4'), ('offset', '<u4')])
+CHUNK_COUNT = np.dtype([('conn', '<u4'), ('count', '<u4')])
+
+CACHE_SUFFIX = '.index.json'
+CACHE_VERSION = 1
+DEFAULT_GAP_FACTOR = 3.0
+
+
+# ============ bag索引读取 ============
+
+def parse_header(buf):
+    """记录头: 重复的 (uint32 长度, 'name=value')"""
+    fields = {}
+    pos = 0
+    while pos < len(buf):
+        (n,) = struct.unpack_from('<I', buf, pos)
+        pos += 4
+        name, _, value = buf[pos:pos + n].partition(b'=')
+        fields[name.decode()] = value
+        pos += n
+    return fields
+
+
+def read_record(f, with_data=True):
+    """读取一条记录 -> (header字段, data)；with_data=False 时跳过data，返回其长度"""
+    raw = f.read(4)
+    if len(raw) < 4:
+        return None, None
+    (header_len,) = struct.unpack('<I', raw)
+    header = parse_header(f.read(header_len))
+    (data_len,) = struct.unpack('<I', f.read(4))
+    if with_data:
+        return header, f.read(data_len)
+    f.seek(data_len, os.SEEK_CUR)
+    return header, data_len
+
+
+def _u32(value):
+    return struct.unpack('<I', value)[0]
+
+
+def _u64(value):
+    return struct.unpack('<Q', value)[0]
+
+
+def _time(value):
+    sec, nsec = struct.unpack('<II', value)
+    return sec + nsec * 1e-9
+
+
+def read_bag_index(filename, header_stamps=False):
+    """
+    -> (connections, chunks, times)
+    connections: {conn_id: {'topic', 'type', 'has_header'}}
+    chunks: [{'pos', 'start', 'end', 'counts': {conn: n}}]
+    times: {conn_id: int64纳秒数组}（记录时间，或 header_stamps=True 时的 header.stamp）
+    """
+    connections, chunks, record, header = _read_index(filename, header_stamps)
+    if header_stamps:
+        # 没有header的消息类型仍用记录时间
+        record.update(header)
+    return connections, chunks, record
+
+
+def read_bag_stamps(filename):
+    """
+    一次读取每条消息的记录时间和 header.stamp（同一索引顺序，逐条对应）
+    -> (connections, record, header)；header 只包含有header的连接
+    """
+    connections, _, record, header = _read_index(filename, True)
+    return connections, record, header
+
+
+def _read_index(filename, payload):
+    with open(filename, 'rb') as f:
+        if f.read(len(BAG_MAGIC)) != BAG_MAGIC:
+            raise ValueError(f"不是ROS bag 2.0格式: {filename}")
+        header, _ = read_record(f, with_data=False)
+        if header is None or _op(header) != OP_BAG_HEADER:
+            raise ValueError("缺少bag头记录")
+        index_pos = _u64(header['index_pos'])
+        conn_count = _u32(header['conn_count'])
+        chunk_count = _u32(header['chunk_count'])
+        if index_pos == 0:
+            raise ValueError("bag没有索引（录制未正常结束），请先运行 rosbag reindex")
+
+        f.seek(index_pos)
+        connections = {}
+        for _ in range(conn_count):
+            header, data = read_record(f)
+            conn_header = parse_header(data)
+            definition = conn_header.get('message_definition', b'').decode(errors='replace')
+            connections[_u32(header['conn'])] = {
+                'topic': header['topic'].decode(),
+                'type': conn_header.get('type', b'').decode(),
+                'has_header': _has_header(definition),
+            }
+
+        chunks = []
+        for _ in range(chunk_count):
+            header, data = read_record(f)
+            counts = np.frombuffer(data, dtype=CHUNK_COUNT)
+            chunks.append({
+                'pos': _u64(header['chunk_pos']),
+                'start': _time(header['start_time']),
+                'end': _time(header['end_time']),
+                'counts': dict(zip(counts['conn'].tolist(), counts['count'].tolist())),
+            })
+
+        record_parts = {conn: [] for conn in connections}
+        header_parts = {conn: [] for conn, info in connections.items() if payload and info['has_header']}
+        for chunk in chunks:
+            f.seek(chunk['pos'])
+            # 只统计记录时间时跳过块数据，直接读后面的索引记录
+            chunk_header, chunk_data = read_record(f, with_data=payload)
+            if payload:
+                chunk_data = _decompress(chunk_header, chunk_data)
+            for _ in range(len(chunk['counts'])):
+                header, data = read_record(f)
+                conn = _u32(header['conn'])
+                entries = np.frombuffer(data, dtype=INDEX_ENTRY)
+                record_parts[conn].append(entries['sec'].astype(np.int64) * 1000000000 + entries['nsec'])
+                if conn in header_parts:
+                    header_parts[conn].append(_payload_stamps(chunk_data, entries['offset']))
+
+    return connections, chunks, _concat_parts(record_parts), _concat_parts(header_parts)
+
+
+def _concat_parts(parts):
+    return {conn: np.concatenate(p) if p else np.empty(0, dtype=np.int64) for conn, p in parts.items()}
+
+
+def _op(header):
+    return header['op'][0] if 'op' in header else None
+
 
-def check_bag_topics(bag_path):
+def _has_header(definition):
+    for line in definition.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if line:
+            return line.split()[0] in ('Header', 'std_msgs/Header')
+    return False
+
+
+def _decompress(chunk_header, data):
+    compression = chunk_header['compression'].decode()
+    if compression == 'none':
+        return data
+    if compression == 'bz2':
+        return bz2.decompress(data)
+    if compression == 'lz4':
+        try:
+            import lz4.frame
+        except ImportError:
+            raise RuntimeError("lz4压缩的bag需要 pip install lz4")
+        return lz4.frame.decompress(data)
+    raise ValueError(f"未知的压缩格式: {compression}")
+
+
+def _payload_stamps(chunk_data, offsets):
+    """块内每条消息记录的 header.stamp（纳秒）：记录头长度 -> data起点 -> 偏移4处的 secs/nsecs"""
+    buf = np.frombuffer(chunk_data, dtype=np.uint8)
+    offsets = offsets.astype(np.int64)
+
+    def u32_at(pos):
+        return buf[pos[:, None] + np.arange(4)].copy().view('<u4')[:, 0].astype(np.int64)
+
+    header_len = u32_at(offsets)
+    data_start = offsets + 4 + header_len + 4
+    return u32_at(data_start + 4) * 1000000000 + u32_at(data_start + 8)
+
+
+# ============ 时间统计 ============
+
+def topic_timing(times_ns, gap_factor=DEFAULT_GAP_FACTOR):
+    """单个话题的时间统计（秒/Hz），全部向量化"""
+    n = len(times_ns)
+    result = {'count': int(n)}
+    if n == 0:
+        return result
+    t = (times_ns - times_ns[0]) * 1e-9
+    result['start'] = times_ns[0] * 1e-9
+    result['end'] = times_ns[-1] * 1e-9
+    if n < 2:
+        return result
+    dt = np.diff(t)
+    span = float(t.max() - t.min())
+    positive = dt[dt > 0]
+    period = float(np.median(positive)) if len(positive) else 0.0
+    gaps = dt > gap_factor * period if period > 0 else np.zeros(len(dt), dtype=bool)
+    # 抖动只统计缺口以外的间隔
+    regular = dt[~gaps]
+    dev = np.abs(regular - period)
+    result.update({
+        'duration': span,
+        'rate_hz': (n - 1) / span if span > 0 else 0.0,
+        'period_ms': period * 1e3,
+        'jitter_std_ms': float(regular.std()) * 1e3,
+        'jitter_p99_ms': float(np.percentile(dev, 99)) * 1e3,
+        'max_interval_s': float(dt.max()),
+        'gaps': int(gaps.sum()),
+        'missing_estimate': int(np.maximum(np.round(dt[gaps] / period) - 1, 0).sum()) if period > 0 else 0,
+        'backwards': int((dt < 0).sum()),
+        'duplicates': int((dt == 0).sum()),
+    })
+    if result['gaps']:
+        i = int(np.argmax(np.where(gaps, dt, -np.inf)))
+        result['longest_gap'] = {'at': float(times_ns[i] * 1e-9), 'seconds': float(dt[i])}
+    return result
+
+
+def bag_statistics(filename, header_stamps=False, gap_factor=DEFAULT_GAP_FACTOR):
+    connections, chunks, times = read_bag_index(filename, header_stamps)
+    by_topic = {}
+    for conn, info in connections.items():
+        entry = by_topic.setdefault(info['topic'], {'type': info['type'], 'parts': []})
+        entry['parts'].append(times[conn])
+
+    topics = {}
+    for topic, entry in sorted(by_topic.items()):
+        # 同一话题的多个连接按时间合并（各连接内部保持原顺序）
+        t = entry['parts'][0] if len(entry['parts']) == 1 else np.sort(np.concatenate(entry['parts']), kind='stable')
+        stats = topic_timing(t, gap_factor)
+        stats['type'] = entry['type']
+        stats['connections'] = len(entry['parts'])
+        topics[topic] = stats
+
+    start = min((c['start'] for c in chunks), default=0.0)
+    end = max((c['end'] for c in chunks), default=0.0)
+    return {
+        'file': os.path.abspath(filename),
+        'size_bytes': os.path.getsize(filename),
+        'start': start,
+        'end': end,
+        'duration': end - start,
+        'messages': int(sum(len(t) for t in times.values())),
+        'chunks': len(chunks),
+        'stamps': 'header' if header_stamps else 'record',
+        'gap_factor': gap_factor,
+        'topics': topics,
+    }
+
+
+# ============ 缓存 ============
+
+def _cache_key(filename, header_stamps, gap_factor):
+    st = os.stat(filename)
+    return {'version': CACHE_VERSION, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+            'stamps': 'header' if header_stamps else 'record', 'gap_factor': gap_factor}
+
+
+def cached_statistics(filename, header_stamps=False, gap_factor=DEFAULT_GAP_FACTOR, use_cache=True):
+    """-> (统计结果, 是否来自缓存)"""
+    cache_file = filename + CACHE_SUFFIX
+    key = _cache_key(filename, header_stamps, gap_factor)
+    entries = []
+    if use_cache and os.path.exists(cache_file):
+        try:
+            with open(cache_file) as f:
+                entries = json.load(f)
+            for entry in entries:
+                if entry.get('key') == key:
+                    return entry['result'], True
+        except (ValueError, OSError, TypeError, AttributeError):
+            entries = []
+
+    result = bag_statistics(filename, header_stamps, gap_factor)
+    if use_cache:
+        # 文件已变化的旧条目丢弃，同一文件的其它选项保留
+        entries = [e for e in entries if isinstance(e, dict) and e.get('key', {}).get('size') == key['size']
+                   and e['key'].get('mtime_ns') == key['mtime_ns']]
+        entries.append({'key': key, 'result': result})
+        try:
+            with open(cache_file, 'w') as f:
+                json.dump(entries, f, indent=1)
+        except OSError as e:
+            print(f"⚠️ 无法写入缓存 {cache_file}: {e}")
+    return result, False
+
+
+# ============ 输出 ============
+
+def print_statistics(stats):
+    print(f"📋 Bag文件: {stats['file']} ({stats['size_bytes'] / 1e9:.2f} GB, {stats['chunks']} 个块)")
+    print(f"⏰ 时长: {stats['duration']:.2f} 秒")
+    print(f"📊 消息总数: {stats['messages']}")
+    print(f"\n📋 话题列表（{'header.stamp' if stats['stamps'] == 'header' else '记录时间'}）:")
+    print(f"  {'topic':<32}{'count':>9}{'Hz':>9}{'period':>9}{'jitter':>9}{'p99 ms':>9}"
+          f"{'gaps':>6}{'max s':>8}{'back':>6}{'dup':>6}  type")
+    for topic, s in stats['topics'].items():
+        if s['count'] < 2:
+            print(f"  {topic:<32}{s['count']:>9}{'':>62}  {s['type']}")
+            continue
+        print(f"  {topic:<32}{s['count']:>9}{s['rate_hz']:>9.2f}{s['period_ms']:>9.2f}{s['jitter_std_ms']:>9.2f}"
+              f"{s['jitter_p99_ms']:>9.2f}{s['gaps']:>6}{s['max_interval_s']:>8.2f}{s['backwards']:>6}"
+              f"{s['duplicates']:>6}  {s['type']}")
+
+    problems = [(topic, s) for topic, s in stats['topics'].items() if s.get('gaps') or s.get('backwards')]
+    if problems:
+        print("\n⚠️ 需要注意:")
+        for topic, s in problems:
+            if s.get('gaps'):
+                gap = s['longest_gap']
+                print(f"  {topic}: {s['gaps']} 处缺口（约缺 {s['missing_estimate']} 条），"
+                      f"最长 {gap['seconds']:.2f}s @ {gap['at']:.3f}")
+            if s.get('backwards'):
+                print(f"  {topic}: 时间倒退 {s['backwards']} 次")
+
+
+def check_bag_topics(bag_path, header_stamps=False, gap_factor=DEFAULT_GAP_FACTOR, use_cache=True):
     try:
-        bag = rosbag.Bag(bag_path, 'r')
-        print(f"📋 Bag文件: {bag_path}")
-        print(f"⏰ 时长: {bag.get_end_time() - bag.get_start_time():.2f} 秒")
-        print(f"📊 消息总数: {bag.get_message_count()}")
-        print("\n📋 话题列表:")
-        
-        info = bag.get_type_and_topic_info()
-        for topic, topic_info in info.topics.items():
-            msg_count = topic_info.message_count
-            msg_type = topic_info.msg_type
-            print(f"  {topic}: {msg_type} ({msg_count} 条消息)")
-        
-        bag.close()
+        start = time.time()
+        stats, from_cache = cached_statistics(bag_path, header_stamps, gap_factor, use_cache)
+        print_statistics(stats)
+        print(f"\n⚡ {'缓存' if from_cache else '索引读取'}用时 {time.time() - start:.2f}s")
+        return stats
     except Exception as e:
         print(f"❌ 错误: {e}")
+        return None
 
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("用法: python3 check_bag.py <bag文件路径>")
+
+def main():
+    parser = argparse.ArgumentParser(description='bag文件检查（只读索引）')
+    parser.add_argument('bag', help='bag文件路径')
+    parser.add_argument('--header', action='store_true', help='统计header.stamp（需读取消息数据，较慢）')
+    parser.add_argument('--gap-factor', type=float, default=DEFAULT_GAP_FACTOR,
+                        help='间隔超过中位周期的倍数视为缺口')
+    parser.add_argument('--no-cache', action='store_true', help='不读写 <bag>.index.json')
+    parser.add_argument('--json', default=None, help='统计结果另存为JSON')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.bag):
+        print(f"❌ 文件不存在: {args.bag}")
+        sys.exit(1)
+
+    stats = check_bag_topics(args.bag, args.header, args.gap_factor, not args.no_cache)
+    if stats is None:
         sys.exit(1)
-    
-    check_bag_topics(sys.argv[1])
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(stats, f, indent=2)
+        print(f"💾 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
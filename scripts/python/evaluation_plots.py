@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+评估图渲染 - 非交互(Agg)后端、保形降采样、多进程并行出图
+
+每个绘图函数只接收已经降采样的小数组，可以在子进程中独立执行；
+统计量（均值、最大值等）由调用方在全分辨率数据上计算后传入。
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+# 每条曲线的最大点数
+MAX_PLOT_POINTS = 4000
+DPI = 150
+
+
+def lttb_indices(x, y, n_out=MAX_PLOT_POINTS):
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回保留点的索引
+    按索引分桶，三角形面积在 (x, y) 平面上计算，
+    因此既可用于时间序列，也可用于XY轨迹这类非单调曲线。首尾点总是保留。
+    """
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    # n_out-2 个中间桶: [edges[b], edges[b+1])
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    # 每个桶的均值（最后一个"下一桶"为终点）
+    counts = np.diff(np.append(edges, n))
+    mean_x = np.add.reduceat(x, edges) / counts
+    mean_y = np.add.reduceat(y, edges) / counts
+
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        if hi <= lo:
+            hi = lo + 1
+        cx, cy = mean_x[b + 1], mean_y[b + 1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[b + 1] = a
+    return selected
+
+
+def decimate(x, y, n_out=MAX_PLOT_POINTS):
+    """降采样一条曲线，返回 (x, y)"""
+    idx = lttb_indices(np.asarray(x, dtype=float), np.asarray(y, dtype=float), n_out)
+    return np.asarray(x)[idx], np.asarray(y)[idx]
+
+
+def plot_xy_figure(path, dataset, gt, vio, vir, gt_detail, vio_detail, vir_detail):
+    """图1: XY平面对齐轨迹对比，各参数为 (x, y) 元组"""
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 7))
+
+    # 左图：全轨迹
+    ax1.plot(*gt, 'g-', linewidth=2.5, alpha=0.6, label='Ground Truth', zorder=1)
+    ax1.plot(*vio, 'b-', linewidth=1.8, alpha=0.7, label='VIO (VINS-Mono)', zorder=2)
+    ax1.plot(*vir, 'r-', linewidth=1.8, alpha=0.7, label='VIR-SLAM', zorder=3)
+    ax1.scatter(gt[0][0], gt[1][0], c='green', s=200, marker='o', edgecolors='black', linewidths=2, label='Start', zorder=5)
+    ax1.scatter(gt[0][-1], gt[1][-1], c='red', s=200, marker='X', edgecolors='black', linewidths=2, label='End', zorder=5)
+    ax1.set_xlabel('X (m)', fontsize=13, fontweight='bold')
+    ax1.set_ylabel('Y (m)', fontsize=13, fontweight='bold')
+    ax1.set_title('XY Trajectory (Aligned)', fontsize=14, fontweight='bold')
+    ax1.legend(fontsize=11, loc='best')
+    ax1.grid(True, alpha=0.3)
+    ax1.axis('equal')
+
+    # 右图：局部放大
+    ax2.plot(*gt_detail, 'g-', linewidth=2.5, alpha=0.6, label='Ground Truth')
+    if len(vio_detail[0]):
+        ax2.plot(*vio_detail, 'b-', linewidth=2, alpha=0.7, label='VIO')
+    if len(vir_detail[0]):
+        ax2.plot(*vir_detail, 'r-', linewidth=2, alpha=0.7, label='VIR-SLAM')
+    ax2.set_xlabel('X (m)', fontsize=13, fontweight='bold')
+    ax2.set_ylabel('Y (m)', fontsize=13, fontweight='bold')
+    ax2.set_title('Local Detail', fontsize=14, fontweight='bold')
+    ax2.legend(fontsize=11, loc='best')
+    ax2.grid(True, alpha=0.3)
+    ax2.axis('equal')
+
+    fig.suptitle(f'Trajectory Comparison: {dataset}', fontsize=16, fontweight='bold')
+    fig.tight_layout()
+    fig.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+
+def plot_error_figure(path, dataset, vio, vir, stats, xlabel='Time (s)'):
+    """
+    图2: 误差随时间/行驶距离变化
+    vio, vir: (x, error) 元组；stats: 全分辨率统计量 vio_mean/vir_mean/vio_max/vir_max
+    """
+    fig, ax = plt.subplots(figsize=(14, 6))
+
+    ax.plot(*vio, 'b-', linewidth=2, alpha=0.7, label='VIO Error')
+    ax.plot(*vir, 'r-', linewidth=2, alpha=0.7, label='VIR-SLAM Error')
+    ax.fill_between(*vio, alpha=0.3, color='blue')
+    ax.fill_between(*vir, alpha=0.3, color='red')
+
+    vio_mean = stats['vio_mean']
+    vir_mean = stats['vir_mean']
+    ax.axhline(vio_mean, color='blue', linestyle='--', linewidth=1.5, alpha=0.5, label=f'VIO Mean: {vio_mean:.3f}m')
+    ax.axhline(vir_mean, color='red', linestyle='--', linewidth=1.5, alpha=0.5, label=f'VIR Mean: {vir_mean:.3f}m')
+
+    ax.set_xlabel(xlabel, fontsize=13, fontweight='bold')
+    ax.set_ylabel('Position Error (m)', fontsize=13, fontweight='bold')
+    ax.set_title(f'Position Error vs Ground Truth: {dataset}', fontsize=15, fontweight='bold')
+    ax.legend(fontsize=11, loc='best')
+    ax.grid(True, alpha=0.3)
+
+    improve = (vio_mean - vir_mean) / vio_mean * 100
+    stats_text = f'Improvement: {improve:+.2f}%\n'
+    stats_text += f'VIO Max: {stats["vio_max"]:.3f}m\n'
+    stats_text += f'VIR Max: {stats["vir_max"]:.3f}m'
+    ax.text(0.02, 0.98, stats_text, transform=ax.transAxes,
+            fontsize=12, verticalalignment='top',
+            bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
+
+    fig.tight_layout()
+    fig.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+
+def plot_xz_figure(path, dataset, gt, vio, vir):
+    """图3: XZ平面轨迹，各参数为 (x, z) 元组"""
+    fig, ax = plt.subplots(figsize=(14, 7))
+
+    ax.plot(*gt, 'g-', linewidth=2.5, alpha=0.6, label='Ground Truth', zorder=1)
+    ax.plot(*vio, 'b-', linewidth=1.8, alpha=0.7, label='VIO (VINS-Mono)', zorder=2)
+    ax.plot(*vir, 'r-', linewidth=1.8, alpha=0.7, label='VIR-SLAM', zorder=3)
+    ax.scatter(gt[0][0], gt[1][0], c='green', s=200, marker='o', edgecolors='black', linewidths=2, label='Start', zorder=5)
+    ax.scatter(gt[0][-1], gt[1][-1], c='red', s=200, marker='X', edgecolors='black', linewidths=2, label='End', zorder=5)
+
+    ax.set_xlabel('X (m)', fontsize=13, fontweight='bold')
+    ax.set_ylabel('Z (m)', fontsize=13, fontweight='bold')
+    ax.set_title(f'XZ Plane Trajectory (Aligned): {dataset}', fontsize=15, fontweight='bold')
+    ax.legend(fontsize=11, loc='best')
+    ax.grid(True, alpha=0.3)
+    ax.axis('equal')
+
+    fig.tight_layout()
+    fig.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+
+def plot_uwb_figure(path, dataset, gt_dist, vio_dist, vir_dist, vio_diff, vir_diff, stats):
+    """
+    图4: 与UWB锚点的距离对比
+    *_dist / *_diff: (time, value) 元组；stats: 全分辨率 vio_mean/vir_mean/vio_max/vir_max
+    """
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10))
+
+    # 子图1: 距离随时间变化
+    ax1.plot(*gt_dist, 'g-', linewidth=2, alpha=0.6, label='Ground Truth', zorder=1)
+    ax1.plot(*vio_dist, 'b-', linewidth=1.5, alpha=0.7, label='VIO', zorder=2)
+    ax1.plot(*vir_dist, 'r-', linewidth=1.5, alpha=0.7, label='VIR-SLAM', zorder=3)
+    ax1.set_xlabel('Time (s)', fontsize=12, fontweight='bold')
+    ax1.set_ylabel('Distance to UWB Anchor (m)', fontsize=12, fontweight='bold')
+    ax1.set_title('Distance to UWB Anchor Over Time', fontsize=14, fontweight='bold')
+    ax1.legend(fontsize=11, loc='best')
+    ax1.grid(True, alpha=0.3)
+
+    # 子图2: 与GT的距离差异
+    ax2.plot(*vio_diff, 'b-', linewidth=2, alpha=0.7, label='VIO Distance Error')
+    ax2.plot(*vir_diff, 'r-', linewidth=2, alpha=0.7, label='VIR-SLAM Distance Error')
+    ax2.fill_between(*vio_diff, alpha=0.3, color='blue')
+    ax2.fill_between(*vir_diff, alpha=0.3, color='red')
+
+    vio_mean_diff = stats['vio_mean']
+    vir_mean_diff = stats['vir_mean']
+    ax2.axhline(vio_mean_diff, color='blue', linestyle='--', linewidth=1.5, alpha=0.5,
+                label=f'VIO Mean: {vio_mean_diff:.3f}m')
+    ax2.axhline(vir_mean_diff, color='red', linestyle='--', linewidth=1.5, alpha=0.5,
+                label=f'VIR Mean: {vir_mean_diff:.3f}m')
+    ax2.set_xlabel('Time (s)', fontsize=12, fontweight='bold')
+    ax2.set_ylabel('Distance Error (m)', fontsize=12, fontweight='bold')
+    ax2.set_title('Position Difference vs Ground Truth', fontsize=14, fontweight='bold')
+    ax2.legend(fontsize=11, loc='best')
+    ax2.grid(True, alpha=0.3)
+
+    # 添加统计信息
+    dist_improve = (vio_mean_diff - vir_mean_diff) / vio_mean_diff * 100
+    stats_text = f'Distance Error Improvement: {dist_improve:+.2f}%\n'
+    stats_text += f'VIO Max Diff: {stats["vio_max"]:.3f}m\n'
+    stats_text += f'VIR Max Diff: {stats["vir_max"]:.3f}m'
+    ax2.text(0.02, 0.98, stats_text, transform=ax2.transAxes,
+             fontsize=11, verticalalignment='top',
+             bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
+
+    fig.suptitle(f'UWB Anchor Distance Analysis: {dataset}', fontsize=16, fontweight='bold')
+    fig.tight_layout()
+    fig.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+
+def _call(job):
+    func, kwargs = job
+    return func(**kwargs)
+
+
+def render_figures(jobs, workers=None):
+    """
+    渲染一组互相独立的图
+    jobs: [(绘图函数, 参数字典), ...]
+    workers: 进程数，<=1 时串行（例如已在批量评估的子进程中）
+    返回生成的文件路径列表（与jobs顺序一致）
+    """
+    if workers is None:
+        workers = min(len(jobs), os.cpu_count() or 1)
+    if workers <= 1 or len(jobs) <= 1:
+        return [_call(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_call, jobs))
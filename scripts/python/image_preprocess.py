@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+图像预处理 - 彩色图像转灰度 + CLAHE增强（VIR-SLAM的 /synced/image_raw）
+
+不依赖cv_bridge：直接在 sensor_msgs/Image 的 data 上建立 numpy 视图（不复制），
+按 step 处理行填充。cv2 的 CLAHE 对象不是线程安全的，多线程时每个线程一个
+（thread_clahe）。
+
+ImagePreprocessor 把转换放到小线程池中，不占用rospy订阅回调线程，
+积压时丢弃旧帧、保留最新帧，延迟有上界并记录在直方图中。
+"""
+
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from node_metrics import LatencyHistogram
+
+CLIP_LIMIT = 2.0
+TILE_GRID = 8
+
+# encoding -> (通道数, 转灰度的cv2转换码；None 表示已是灰度)
+GRAY_CONVERSIONS = {
+    'mono8': (1, None),
+    'bgr8': (3, cv2.COLOR_BGR2GRAY),
+    'rgb8': (3, cv2.COLOR_RGB2GRAY),
+    'bgra8': (4, cv2.COLOR_BGRA2GRAY),
+    'rgba8': (4, cv2.COLOR_RGBA2GRAY),
+}
+
+
+def image_view(msg):
+    """Image消息 -> (H, W) 或 (H, W, C) 的uint8视图（与 msg.data 共享内存）；不支持的编码返回 None"""
+    conversion = GRAY_CONVERSIONS.get(msg.encoding)
+    if conversion is None:
+        return None
+    channels = conversion[0]
+    rows = np.frombuffer(msg.data, dtype=np.uint8, count=msg.height * msg.step).reshape(msg.height, msg.step)
+    pixels = rows[:, :msg.width * channels]
+    if channels == 1:
+        return pixels
+    return pixels.reshape(msg.height, msg.width, channels)
+
+
+def to_gray(msg):
+    """Image消息 -> 灰度 (H, W) uint8；不支持的编码返回 None"""
+    view = image_view(msg)
+    if view is None:
+        return None
+    code = GRAY_CONVERSIONS[msg.encoding][1]
+    return view if code is None else cv2.cvtColor(view, code)
+
+
+def make_clahe(clip_limit=CLIP_LIMIT, tile_grid=TILE_GRID):
+    return cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile_grid, tile_grid))
+
+
+_local = threading.local()
+
+
+def thread_clahe(clip_limit=CLIP_LIMIT, tile_grid=TILE_GRID):
+    """当前线程的CLAHE对象（首次调用时创建）"""
+    clahe = getattr(_local, 'clahe', None)
+    if clahe is None or _local.params != (clip_limit, tile_grid):
+        clahe = _local.clahe = make_clahe(clip_limit, tile_grid)
+        _local.params = (clip_limit, tile_grid)
+    return clahe
+
+
+def gray_clahe(msg, clahe=None):
+    """Image消息 -> CLAHE增强后的灰度图；clahe 为空时使用当前线程的对象"""
+    gray = to_gray(msg)
+    if gray is None:
+        return None
+    return (clahe or thread_clahe()).apply(gray)
+
+
+def mono8_message(header, gray, image_class):
+    """灰度数组 -> mono8 Image消息（header沿用输入）"""
+    out = image_class()
+    out.header = header
+    out.height, out.width = gray.shape
+    out.encoding = 'mono8'
+    out.is_bigendian = 0
+    out.step = out.width
+    out.data = gray.tobytes()
+    return out
+
+
+class ImagePreprocessor:
+    """
+    线程池图像预处理：submit 在订阅回调中立即返回，转换在 workers 个线程中进行
+    （cv2 释放GIL），结果按提交顺序交给 publish(msg, gray, arrival)，
+    arrival 为 submit 时传入的到达时间（供时间同步使用，不受处理耗时影响）。
+
+    丢帧策略（保留最新）：等待队列最多 max_pending 帧，满时丢弃最旧的一帧；
+    线程取到的帧已等待超过 max_age 秒时同样丢弃。因此每帧的额外延迟有上界，
+    处理不过来时输出帧率下降而不是延迟累积。
+    stats: 可选的 node_metrics.TopicStats，记录每帧从提交到发布的延迟和丢帧数
+    """
+
+    def __init__(self, publish, workers=2, max_pending=2, max_age=0.05,
+                 clip_limit=CLIP_LIMIT, tile_grid=TILE_GRID, stats=None):
+        self.publish = publish
+        self.max_age = max_age
+        self.clahe_params = (clip_limit, tile_grid)
+        self.stats = stats
+        self.pending = deque(maxlen=max_pending)
+        self.cond = threading.Condition()
+        # 发布在 cond 之外进行（publish 可能触发其它话题的发布），由 publish_lock 保证顺序
+        self.publish_lock = threading.Lock()
+        self.next_job = 0
+        self.next_publish = 0
+        self.done = {}
+        self.submitted = 0
+        self.published = 0
+        self.dropped = 0
+        self.unsupported = 0
+        self.errors = 0
+        self.last_error = None
+        self.queue_wait = LatencyHistogram()
+        self.process_time = LatencyHistogram()
+        self.latency = LatencyHistogram()
+        self.running = True
+        self.threads = [threading.Thread(target=self._worker, name=f'image_preprocess_{i}', daemon=True)
+                        for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, msg, arrival=None):
+        with self.cond:
+            self.submitted += 1
+            if len(self.pending) == self.pending.maxlen:
+                self._drop()
+            self.pending.append((msg, arrival, time.perf_counter()))
+            self.cond.notify()
+
+    def _drop(self):
+        self.dropped += 1
+        if self.stats is not None:
+            self.stats.drops += 1
+
+    def _worker(self):
+        perf = time.perf_counter
+        while True:
+            with self.cond:
+                while self.running and not self.pending:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                msg, arrival, submitted = self.pending.popleft()
+                if perf() - submitted > self.max_age:
+                    self._drop()
+                    continue
+                job = self.next_job
+                self.next_job += 1
+
+            start = perf()
+            error = None
+            try:
+                gray = gray_clahe(msg, thread_clahe(*self.clahe_params))
+            except Exception as e:
+                gray, error = None, e
+            end = perf()
+
+            with self.cond:
+                self.queue_wait.record(start - submitted)
+                self.process_time.record(end - start)
+                self.done[job] = (msg, arrival, gray, error, submitted)
+            self._publish_ready()
+
+    def _publish_ready(self):
+        """
+        按取出顺序发布已完成的帧（后取出的帧先完成时等待前面的帧）。
+        持有 publish_lock 的线程负责发布，其它线程不等待，结果留给它；
+        释放后再检查一次，避免在释放前放入的结果无人发布
+        """
+        perf = time.perf_counter
+        while self.publish_lock.acquire(blocking=False):
+            try:
+                with self.cond:
+                    ready = []
+                    while self.next_publish in self.done:
+                        ready.append(self.done.pop(self.next_publish))
+                        self.next_publish += 1
+                for msg, arrival, gray, error, submitted in ready:
+                    if error is not None:
+                        self.errors += 1
+                        self.last_error = error
+                        if self.stats is not None:
+                            self.stats.errors += 1
+                        continue
+                    if gray is None:
+                        self.unsupported += 1
+                        continue
+                    self.publish(msg, gray, arrival)
+                    latency = perf() - submitted
+                    self.latency.record(latency)
+                    self.published += 1
+                    if self.stats is not None:
+                        self.stats.record(latency)
+            finally:
+                self.publish_lock.release()
+            with self.cond:
+                if self.next_publish not in self.done:
+                    return
+
+    def summary(self):
+        return {
+            'submitted': self.submitted,
+            'published': self.published,
+            'dropped': self.dropped,
+            'unsupported': self.unsupported,
+            'errors': self.errors,
+            'queue_wait_p99_ms': self.queue_wait.percentile(99) * 1e3,
+            'process_mean_ms': self.process_time.mean * 1e3,
+            'process_p99_ms': self.process_time.percentile(99) * 1e3,
+            'latency_p50_ms': self.latency.percentile(50) * 1e3,
+            'latency_p99_ms': self.latency.percentile(99) * 1e3,
+            'latency_max_ms': self.latency.max * 1e3,
+        }
+
+    def close(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        for thread in self.threads:
+            thread.join()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+轻量姿态后端 - 标量四元数 [x, y, z, w]，原地更新
+
+IMU回调的热路径：陀螺积分、roll/pitch倾角校正、加速度转世界坐标系，
+全部是Python浮点运算，不创建NumPy数组或scipy Rotation对象。
+
+倾角校正不经过欧拉角：把当前姿态预测的重力方向（机体系）朝加速度计测得的方向
+沿测地线转动 gain 比例的夹角。校正轴与重力方向垂直，不改变航向(yaw)；
+小角度下与"roll/pitch按权重融合"的欧拉角写法一致，且没有万向锁。
+"""
+
+import math
+
+# 转角小于该值时跳过陀螺积分（与原实现一致）
+MIN_ROTATION_ANGLE = 1e-6
+
+
+class QuaternionAttitude:
+    """姿态四元数，所有方法原地更新"""
+
+    __slots__ = ('x', 'y', 'z', 'w')
+
+    def __init__(self, q=(0.0, 0.0, 0.0, 1.0)):
+        self.reset(q)
+
+    def reset(self, q):
+        x, y, z, w = (float(v) for v in q)
+        norm = math.sqrt(x * x + y * y + z * z + w * w)
+        self.x, self.y, self.z, self.w = x / norm, y / norm, z / norm, w / norm
+
+    def as_quat(self):
+        return self.x, self.y, self.z, self.w
+
+    def multiply(self, bx, by, bz, bw):
+        """右乘增量 q ← q ⊗ b"""
+        x, y, z, w = self.x, self.y, self.z, self.w
+        self.x = w * bx + x * bw + y * bz - z * by
+        self.y = w * by - x * bz + y * bw + z * bx
+        self.z = w * bz + x * by - y * bx + z * bw
+        self.w = w * bw - x * bx - y * by - z * bz
+
+    def integrate(self, gx, gy, gz, dt):
+        """陀螺积分：机体系角速度 (rad/s) 乘以 dt 的旋转增量"""
+        angle = math.sqrt(gx * gx + gy * gy + gz * gz) * dt
+        if angle <= MIN_ROTATION_ANGLE:
+            return
+        s = math.sin(0.5 * angle) * dt / angle
+        self.multiply(gx * s, gy * s, gz * s, math.cos(0.5 * angle))
+
+    def normalize(self):
+        x, y, z, w = self.x, self.y, self.z, self.w
+        inv = 1.0 / math.sqrt(x * x + y * y + z * z + w * w)
+        self.x, self.y, self.z, self.w = x * inv, y * inv, z * inv, w * inv
+
+    def correct_tilt(self, ax, ay, az, gain):
+        """
+        roll/pitch校正：预测的重力方向朝测量的加速度方向转动 gain 比例
+        (ax, ay, az) 为机体系加速度（静止时指向上方），gain 即 1 - alpha
+        """
+        norm = math.sqrt(ax * ax + ay * ay + az * az)
+        if norm <= 0.0:
+            return
+        mx, my, mz = ax / norm, ay / norm, az / norm
+
+        # 当前姿态下机体系的"上"方向: R^T e_z
+        x, y, z, w = self.x, self.y, self.z, self.w
+        px = 2.0 * (x * z - w * y)
+        py = 2.0 * (y * z + w * x)
+        pz = 1.0 - 2.0 * (x * x + y * y)
+
+        # 把测量方向转到预测方向的旋转轴和角度，q ← q ⊗ δq 使预测方向朝测量方向移动
+        cx = my * pz - mz * py
+        cy = mz * px - mx * pz
+        cz = mx * py - my * px
+        sin_angle = math.sqrt(cx * cx + cy * cy + cz * cz)
+        if sin_angle < 1e-12:
+            self.normalize()
+            return
+        angle = math.atan2(sin_angle, mx * px + my * py + mz * pz)
+        half = 0.5 * gain * angle
+        s = math.sin(half) / sin_angle
+        self.multiply(cx * s, cy * s, cz * s, math.cos(half))
+        self.normalize()
+
+    def rotate(self, vx, vy, vz):
+        """机体系向量转到世界系，返回 (x, y, z)"""
+        x, y, z, w = self.x, self.y, self.z, self.w
+        # v + 2 u × (u × v + w v)
+        tx = 2.0 * (y * vz - z * vy)
+        ty = 2.0 * (z * vx - x * vz)
+        tz = 2.0 * (x * vy - y * vx)
+        return (vx + w * tx + (y * tz - z * ty),
+                vy + w * ty + (z * tx - x * tz),
+                vz + w * tz + (x * ty - y * tx))
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+IMU静态标定 - 逐帧累积均值/方差（Welford），内存与标定时长无关
+
+CalibrationAccumulator 同时用于:
+    IMUToPoseConverter / 预积分节点的启动校准（逐帧 update）
+    静态标定（calibrate_imu_static.sh 在容器内运行本脚本，ROS模式）
+    离线标定（bag或文本文件分块 update_batch，与逐帧结果一致）
+result() 与 imu_dead_reckoning.calibrate 返回格式相同，另附各轴标准差、样本数和时长。
+
+用法:
+    python3 imu_calibration.py --duration 30 -o /tmp/imu_calibration.yaml     # ROS，订阅 /livox/imu
+    python3 imu_calibration.py static.bag --topic /livox/imu -o imu_calibration.yaml
+"""
+
+import argparse
+import math
+import os
+import sys
+
+import numpy as np
+
+from imu_dead_reckoning import GRAVITY, calibration_from_means, load_imu_bag, load_imu_text
+
+DEFAULT_TOPIC = '/livox/imu'
+DEFAULT_DURATION = 30.0          # s
+MIN_SAMPLES = 100
+GRAVITY_TOLERANCE = 0.5          # m/s^2，静态标定重力模长检查
+
+
+class CalibrationAccumulator:
+    """静止段的运行矩：六轴均值、平方偏差和（Welford / Chan合并）、加速度模长均值"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = [0.0] * 6        # ax, ay, az, gx, gy, gz
+        self.m2 = [0.0] * 6
+        self.acc_norm_mean = 0.0
+        self.t_first = None
+        self.t_last = None
+
+    def update(self, ax, ay, az, gx, gy, gz, t=None):
+        """加入一帧"""
+        self.count += 1
+        inv = 1.0 / self.count
+        mean = self.mean
+        m2 = self.m2
+        for i, x in enumerate((ax, ay, az, gx, gy, gz)):
+            d = x - mean[i]
+            mean[i] += d * inv
+            m2[i] += d * (x - mean[i])
+        self.acc_norm_mean += (math.sqrt(ax * ax + ay * ay + az * az) - self.acc_norm_mean) * inv
+        if t is not None:
+            if self.t_first is None:
+                self.t_first = t
+            self.t_last = t
+
+    def update_batch(self, acc, gyro, t=None):
+        """加入一段 (N, 3) 数据，按块统计后与已有矩合并"""
+        data = np.hstack([np.asarray(acc, dtype=float), np.asarray(gyro, dtype=float)])
+        n = len(data)
+        if n == 0:
+            return
+        mean_b = data.mean(axis=0)
+        m2_b = ((data - mean_b) ** 2).sum(axis=0)
+        norm_b = float(np.mean(np.linalg.norm(data[:, :3], axis=1)))
+
+        total = self.count + n
+        mean_a = np.array(self.mean)
+        delta = mean_b - mean_a
+        self.mean = (mean_a + delta * (n / total)).tolist()
+        self.m2 = (np.array(self.m2) + m2_b + delta**2 * (self.count * n / total)).tolist()
+        self.acc_norm_mean += (norm_b - self.acc_norm_mean) * (n / total)
+        self.count = total
+        if t is not None and len(t):
+            if self.t_first is None:
+                self.t_first = float(t[0])
+            self.t_last = float(t[-1])
+
+    @property
+    def duration(self):
+        if self.t_first is None:
+            return 0.0
+        return self.t_last - self.t_first
+
+    def mean_acc(self):
+        return np.array(self.mean[:3])
+
+    def mean_gyro(self):
+        return np.array(self.mean[3:])
+
+    def std(self):
+        """六轴总体标准差（与 np.std 相同）"""
+        if self.count == 0:
+            return np.zeros(6)
+        return np.sqrt(np.array(self.m2) / self.count)
+
+    def result(self):
+        """校准结果（calibrate 的返回格式 + 'accel_std', 'gyro_std', 'sample_count', 'duration'）"""
+        if self.count == 0:
+            raise ValueError("没有校准数据")
+        calib = calibration_from_means(self.mean_acc(), self.mean_gyro(), self.acc_norm_mean)
+        std = self.std()
+        calib['accel_std'] = std[:3]
+        calib['gyro_std'] = std[3:]
+        calib['sample_count'] = self.count
+        calib['duration'] = self.duration
+        return calib
+
+
+def static_report(acc):
+    """
+    静态标定结果（calibrate_imu_static.sh 的YAML字段）
+    acc_bias 为原始加速度均值（含重力），与原标定脚本一致
+    """
+    mean_acc = acc.mean_acc()
+    std = acc.std()
+    return {
+        'acc_bias': mean_acc.tolist(),
+        'gyro_bias': acc.mean_gyro().tolist(),
+        'acc_noise': std[:3].tolist(),
+        'gyro_noise': std[3:].tolist(),
+        'gravity_norm': float(np.linalg.norm(mean_acc)),
+        'sample_count': acc.count,
+        'duration': float(acc.duration),
+    }
+
+
+def print_report(report):
+    fmt = lambda v: ', '.join(f'{x:.6f}' for x in v)
+    print(f"\n📊 IMU标定结果:")
+    print(f"数据点数: {report['sample_count']}")
+    print(f"采集时长: {report['duration']:.1f}秒")
+    print(f"\n加速度偏置: [{fmt(report['acc_bias'])}]")
+    print(f"陀螺仪偏置: [{fmt(report['gyro_bias'])}]")
+    print(f"\n加速度噪声: [{fmt(report['acc_noise'])}]")
+    print(f"陀螺仪噪声: [{fmt(report['gyro_noise'])}]")
+    print(f"\n重力大小: {report['gravity_norm']:.3f} m/s² (期望: {GRAVITY})")
+    if abs(report['gravity_norm'] - GRAVITY) > GRAVITY_TOLERANCE:
+        print("❌ 重力测量异常！请检查IMU安装方向")
+    else:
+        print("✅ 重力测量正常")
+
+
+def collect_ros(topic, duration):
+    """订阅IMU话题，按消息时间戳累积 duration 秒"""
+    import rospy
+    from sensor_msgs.msg import Imu
+
+    rospy.init_node('imu_calibrator', anonymous=True)
+    acc = CalibrationAccumulator()
+
+    def callback(msg):
+        a = msg.linear_acceleration
+        g = msg.angular_velocity
+        acc.update(a.x, a.y, a.z, g.x, g.y, g.z, msg.header.stamp.to_sec())
+
+    rospy.Subscriber(topic, Imu, callback, queue_size=1000)
+    print(f"📊 开始IMU标定 - 设备必须静止! ({topic})")
+    print(f"收集{duration:.0f}秒数据...")
+    rate = rospy.Rate(10)
+    wall_limit = rospy.get_time() + duration + 10.0
+    while not rospy.is_shutdown() and acc.duration < duration:
+        if rospy.get_time() > wall_limit and acc.count < MIN_SAMPLES:
+            break
+        rate.sleep()
+    return acc
+
+
+def collect_file(filename, topic, accel_first, chunk=100000):
+    if filename.endswith('.bag'):
+        t, a, g = load_imu_bag(filename, topic)
+    else:
+        t, a, g = load_imu_text(filename, accel_first)
+    acc = CalibrationAccumulator()
+    for s in range(0, len(t), chunk):
+        acc.update_batch(a[s:s + chunk], g[s:s + chunk], t[s:s + chunk])
+    return acc
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IMU静态标定')
+    parser.add_argument('input', nargs='?', default=None, help='IMU数据 (.bag 或 文本/CSV)，不给则订阅ROS话题')
+    parser.add_argument('--topic', default=DEFAULT_TOPIC, help='IMU话题')
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help='ROS模式采集时长 (s)')
+    parser.add_argument('--accel-first', action='store_true', help='文本列顺序为 t, a, w')
+    parser.add_argument('-o', '--output', default='/tmp/imu_calibration.yaml', help='输出YAML')
+    args = parser.parse_args()
+
+    if args.input is None:
+        acc = collect_ros(args.topic, args.duration)
+    else:
+        if not os.path.exists(args.input):
+            print(f"❌ 文件不存在: {args.input}")
+            sys.exit(1)
+        acc = collect_file(args.input, args.topic, args.accel_first)
+
+    if acc.count < MIN_SAMPLES:
+        print("❌ 数据不足，请检查IMU话题")
+        sys.exit(1)
+
+    report = static_report(acc)
+    print_report(report)
+
+    import yaml
+    with open(args.output, 'w') as f:
+        yaml.dump(report, f)
+    print(f"\n💾 标定结果已保存到: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+IMU航位推算离线批处理 - 与 IMUToPoseConverter 相同的 校准 → ZUPT → 互补滤波 → 积分 流程，
+一次处理整段IMU数据（bag或文本文件），输出TUM轨迹
+
+各阶段均为分块NumPy运算:
+    校准         前 CALIBRATION_COUNT 帧的均值
+    ZUPT检测     滑动窗口（累加和差分）一次算出每帧的静止标志，判据与实时节点共用 zupt_detector
+    姿态         旋转增量、倾角校正条件、滤波增益全部预先向量化计算；
+                 互补滤波存在状态反馈，只剩一个逐帧的标量四元数循环（imu_attitude，无对象创建）
+    速度/位置    v_k = c_k v_{k-1} + b_k 为线性递推，分块用累乘/累加求解；位置为累加和
+
+用法:
+    python3 imu_dead_reckoning.py <imu.bag|imu.csv> -o imu_pose.txt [--topic /synced/imu]
+文本文件列顺序默认为EuRoC格式: t, wx, wy, wz, ax, ay, az（逗号或空格分隔，时间戳可为纳秒）
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from imu_attitude import MIN_ROTATION_ANGLE, QuaternionAttitude
+from zupt_detector import DETECTORS, ZuptDetector, make_criterion
+
+# ============ 与 IMUToPoseConverter 一致的参数 ============
+GRAVITY = 9.81
+CALIBRATION_COUNT = 200          # 校准帧数（需保持静止）
+GRAVITY_NORM_THRESH = 7.0        # 校准加速度模长超过该值视为数据包含重力
+MAX_DT = 0.1                     # 超过该时间间隔的帧跳过
+
+ZUPT_DETECTOR = 'variance'       # 检测器，见 zupt_detector.DETECTORS
+ZUPT_WINDOW = 20                 # 滑动窗口长度（每帧代价与窗口长度无关）
+ZUPT_MIN_SAMPLES = 10            # 窗口内样本数不足时不判静止
+
+ALPHA = 0.98                     # 互补滤波陀螺权重
+ALPHA_STATIONARY = 0.9           # 静止时更信任加速度
+TILT_ACC_RANGE = (8.0, 11.0)     # 加速度模长在此范围内才做roll/pitch校正
+
+STATIONARY_VELOCITY_DECAY = 0.5  # 静止时速度衰减
+STATIONARY_ACCEL_SCALE = 0.1     # 静止时加速度抑制
+VELOCITY_DECAY = 0.995           # 持续衰减减少漂移
+
+# 分块大小（线性递推的累乘在该长度内不会下溢）
+RECURRENCE_CHUNK = 256
+WINDOW_CHUNK = 65536
+
+DEFAULT_TOPIC = '/synced/imu'
+
+
+# ============ 四元数工具 [x, y, z, w] ============
+
+def quat_multiply(a, b):
+    """批量四元数乘法 a ⊗ b，(..., 4)"""
+    ax, ay, az, aw = np.moveaxis(a, -1, 0)
+    bx, by, bz, bw = np.moveaxis(b, -1, 0)
+    return np.stack([
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+        aw * bw - ax * bx - ay * by - az * bz,
+    ], axis=-1)
+
+
+def rotvec_to_quat(v, eps=MIN_ROTATION_ANGLE):
+    """批量旋转向量转四元数 (N, 3) -> (N, 4)，转角不超过eps时为单位四元数（与实时节点一致）"""
+    angle = np.linalg.norm(v, axis=1)
+    q = np.zeros((len(v), 4))
+    q[:, 3] = 1.0
+    big = angle > eps
+    half = 0.5 * angle[big]
+    q[big, :3] = v[big] * (np.sin(half) / angle[big])[:, None]
+    q[big, 3] = np.cos(half)
+    return q
+
+
+def euler_to_quat(roll, pitch, yaw):
+    """外旋xyz欧拉角转四元数（等价于 Rotation.from_euler('xyz', ...)）"""
+    cr, sr = np.cos(0.5 * roll), np.sin(0.5 * roll)
+    cp, sp = np.cos(0.5 * pitch), np.sin(0.5 * pitch)
+    cy, sy = np.cos(0.5 * yaw), np.sin(0.5 * yaw)
+    return np.stack([
+        sr * cp * cy - cr * sp * sy,
+        cr * sp * cy + sr * cp * sy,
+        cr * cp * sy - sr * sp * cy,
+        cr * cp * cy + sr * sp * sy,
+    ], axis=-1)
+
+
+def quat_rotate(q, v):
+    """批量用四元数旋转向量 (N, 4), (N, 3) -> (N, 3)"""
+    u = q[:, :3]
+    w = q[:, 3:4]
+    uv = np.cross(u, v)
+    return v + 2.0 * (w * uv + np.cross(u, uv))
+
+
+def tilt_from_acc(acc):
+    """由加速度估计 (roll, pitch)，支持 (3,) 或 (N, 3)"""
+    acc = np.asarray(acc)
+    ax, ay, az = acc[..., 0], acc[..., 1], acc[..., 2]
+    pitch = np.arctan2(-ax, np.sqrt(ay**2 + az**2))
+    roll = np.arctan2(ay, az)
+    return roll, pitch
+
+
+# ============ 流程各阶段 ============
+
+def calibrate(acc_samples, gyro_samples):
+    """
+    静止校准：确定重力模式和bias
+    返回 {'accel_bias', 'gyro_bias', 'subtract_gravity', 'mean_acc_norm', 'orientation'}
+    orientation 为初始姿态四元数（由加速度估计roll/pitch，yaw为0）
+    长时间校准（逐帧累积、内存恒定）见 imu_calibration.CalibrationAccumulator
+    """
+    acc_samples = np.asarray(acc_samples, dtype=float)
+    gyro_samples = np.asarray(gyro_samples, dtype=float)
+    mean_acc_norm = float(np.mean(np.linalg.norm(acc_samples, axis=1)))
+    return calibration_from_means(np.mean(acc_samples, axis=0), np.mean(gyro_samples, axis=0), mean_acc_norm)
+
+
+def calibration_from_means(mean_acc, mean_gyro, mean_acc_norm):
+    """由静止段的均值得到校准结果（calibrate 的返回格式）"""
+    mean_acc = np.asarray(mean_acc, dtype=float)
+    subtract_gravity = mean_acc_norm > GRAVITY_NORM_THRESH
+    if subtract_gravity:
+        # 假设静止时z轴朝上，均值应该是[0,0,g]
+        accel_bias = mean_acc - np.array([0.0, 0.0, GRAVITY])
+        roll, pitch = tilt_from_acc(mean_acc)
+        orientation = euler_to_quat(roll, pitch, 0.0)
+    else:
+        # 已去重力，静止时应该是[0,0,0]
+        accel_bias = mean_acc
+        orientation = np.array([0.0, 0.0, 0.0, 1.0])
+
+    return {
+        'accel_bias': accel_bias,
+        'gyro_bias': np.asarray(mean_gyro, dtype=float),
+        'subtract_gravity': bool(subtract_gravity),
+        'mean_acc_norm': float(mean_acc_norm),
+        'orientation': orientation,
+    }
+
+
+def detect_stationary(acc, gyro, window=ZUPT_WINDOW, detector=ZUPT_DETECTOR, gravity=GRAVITY,
+                      min_samples=ZUPT_MIN_SAMPLES, chunk_size=WINDOW_CHUNK, **params):
+    """
+    每帧的静止标志（窗口为截至当前帧的最近window帧）
+    与实时节点的 ZuptDetector 使用同一判据；窗口内的滑动和由分块累加和差分得到
+    """
+    n = len(acc)
+    criterion = make_criterion(detector, gravity, **params)
+    min_samples = min(min_samples, window)
+    # 每帧对滑动和的贡献: a (3), |a|², |ω|, |ω|²
+    w2 = np.einsum('ij,ij->i', gyro, gyro)
+    terms = np.column_stack([acc, np.einsum('ij,ij->i', acc, acc), np.sqrt(w2), w2])
+    stationary = np.zeros(n, dtype=bool)
+
+    for start in range(0, n, chunk_size):
+        stop = min(n, start + chunk_size)
+        ctx = max(0, start - (window - 1))
+        cs = np.vstack([np.zeros((1, 6)), np.cumsum(terms[ctx:stop], axis=0)])
+
+        # 块内位置 k 对应全局帧 ctx + k，窗口为 [lo, k]
+        k = np.arange(start - ctx, stop - ctx)
+        lo = np.maximum(k + 1 - window, 0)
+        count = (k + 1 - lo).astype(float)
+        sums = cs[k + 1] - cs[lo]
+
+        stationary[start:stop] = (count >= min_samples) & criterion(count, *sums.T)
+    return stationary
+
+
+def integrate_orientation(q0, dq, tilt_mask, acc_body, tilt_gain):
+    """
+    陀螺积分 + roll/pitch互补校正（与实时节点共用 QuaternionAttitude）
+    q0: 初始四元数；dq: 每帧旋转增量 (N, 4)；tilt_mask: 是否做倾角校正 (N,)
+    acc_body: 机体系加速度 (N, 3)；tilt_gain: 每帧校正比例 1 - alpha (N,)
+    返回每帧的姿态 (N, 4)
+
+    校正后的姿态是下一帧积分的起点，存在反馈，无法整体向量化；
+    这里只做标量运算，所有逐帧输入都已预先算好。
+    """
+    n = len(dq)
+    out = np.empty((n, 4))
+    att = QuaternionAttitude(q0)
+    multiply, correct_tilt, normalize = att.multiply, att.correct_tilt, att.normalize
+    dq_l = dq.tolist()
+    mask_l = tilt_mask.tolist()
+    acc_l = acc_body.tolist()
+    gain_l = tilt_gain.tolist()
+
+    for i in range(n):
+        multiply(*dq_l[i])
+        if mask_l[i]:
+            correct_tilt(*acc_l[i], gain_l[i])
+        else:
+            normalize()
+        out[i] = (att.x, att.y, att.z, att.w)
+    return out
+
+
+def linear_recurrence(c, b, x0, chunk_size=RECURRENCE_CHUNK):
+    """
+    求解 x_k = c_k x_{k-1} + b_k
+    c: (N,)，b: (N, 3)，x0: (3,)；返回 (N, 3)
+    块内 x_k = P_k (x_start + Σ b_j / P_j)，P为块内累乘；块长度保证P不下溢
+    """
+    n = len(c)
+    out = np.empty_like(b)
+    x = np.asarray(x0, dtype=float)
+    for start in range(0, n, chunk_size):
+        stop = min(n, start + chunk_size)
+        P = np.cumprod(c[start:stop])[:, None]
+        out[start:stop] = P * (x + np.cumsum(b[start:stop] / P, axis=0))
+        x = out[stop - 1]
+    return out
+
+
+def dead_reckon(t, acc, gyro, calibration_count=CALIBRATION_COUNT, zupt_detector=ZUPT_DETECTOR,
+                zupt_window=ZUPT_WINDOW, verbose=True):
+    """
+    整段IMU航位推算
+    t: (N,) 秒；acc, gyro: (N, 3)
+    返回 (traj, calib)，traj 为 (M, 8) TUM数组 [t, x, y, z, qx, qy, qz, qw]，
+    与实时节点逐帧发布的位姿一一对应（校准帧、首帧和异常时间间隔的帧不输出）
+    """
+    if len(t) <= calibration_count + 1:
+        raise ValueError(f"IMU数据不足: {len(t)} 帧（校准需要 {calibration_count} 帧）")
+
+    calib = calibrate(acc[:calibration_count], gyro[:calibration_count])
+    if verbose:
+        mode = 'INCLUDES gravity, will subtract' if calib['subtract_gravity'] else 'EXCLUDES gravity'
+        print(f"🔧 Calibration: acc_norm={calib['mean_acc_norm']:.2f}, data {mode}")
+        print(f"   Accel bias: [{', '.join(f'{v:.4f}' for v in calib['accel_bias'])}]")
+        print(f"   Gyro bias:  [{', '.join(f'{v:.4f}' for v in calib['gyro_bias'])}]")
+
+    # 校准后的第一帧只用于初始化时间
+    t = t[calibration_count:]
+    dt = np.diff(t)
+    valid = (dt > 0) & (dt <= MAX_DT)
+    t = t[1:][valid]
+    dt = dt[valid]
+    acc_body = acc[calibration_count + 1:][valid] - calib['accel_bias']
+    gyro = gyro[calibration_count + 1:][valid] - calib['gyro_bias']
+
+    stationary = detect_stationary(acc_body, gyro, zupt_window, zupt_detector,
+                                   GRAVITY if calib['subtract_gravity'] else 0.0)
+
+    # 姿态
+    dq = rotvec_to_quat(gyro * dt[:, None])
+    acc_norm = np.linalg.norm(acc_body, axis=1)
+    tilt_mask = (calib['subtract_gravity'] & (acc_norm > TILT_ACC_RANGE[0]) &
+                 (acc_norm < TILT_ACC_RANGE[1]))
+    tilt_gain = 1.0 - np.where(stationary, ALPHA_STATIONARY, ALPHA)
+    quats = integrate_orientation(calib['orientation'], dq, tilt_mask, acc_body, tilt_gain)
+
+    # 加速度转世界坐标系
+    acc_world = quat_rotate(quats, acc_body)
+    if calib['subtract_gravity']:
+        acc_world[:, 2] -= GRAVITY
+    acc_world[stationary] *= STATIONARY_ACCEL_SCALE
+
+    # v_k = decay * (g_k v_{k-1} + a_k dt_k)，p_k = p_{k-1} + v_k dt_k
+    c = VELOCITY_DECAY * np.where(stationary, STATIONARY_VELOCITY_DECAY, 1.0)
+    velocity = linear_recurrence(c, VELOCITY_DECAY * acc_world * dt[:, None], np.zeros(3))
+    position = np.cumsum(velocity * dt[:, None], axis=0)
+
+    if verbose:
+        print(f"   处理 {len(t)} 帧, 静止 {np.mean(stationary) * 100:.1f}%, "
+              f"跳过 {np.count_nonzero(~valid)} 帧异常时间间隔")
+
+    return np.column_stack([t, position, quats]), calib
+
+
+class StreamingDeadReckoner:
+    """
+    逐帧航位推算（IMUToPoseConverter 的计算部分，与ROS无关）
+    状态全部是Python浮点/预分配列表，每帧原地更新；姿态由 QuaternionAttitude 维护
+    """
+
+    def __init__(self, calib, zupt_detector=ZUPT_DETECTOR, zupt_window=ZUPT_WINDOW):
+        self.accel_bias = tuple(float(v) for v in calib['accel_bias'])
+        self.gyro_bias = tuple(float(v) for v in calib['gyro_bias'])
+        self.subtract_gravity = calib['subtract_gravity']
+        self.attitude = QuaternionAttitude(calib['orientation'])
+
+        self.position = [0.0, 0.0, 0.0]
+        self.velocity = [0.0, 0.0, 0.0]
+        self.last_time = None
+        self.stationary = False
+        self.zupt = ZuptDetector(zupt_window, zupt_detector, ZUPT_MIN_SAMPLES,
+                                 GRAVITY if self.subtract_gravity else 0.0)
+
+        lo, hi = TILT_ACC_RANGE
+        self._tilt_lo2 = lo * lo
+        self._tilt_hi2 = hi * hi
+
+    def process(self, t, ax, ay, az, gx, gy, gz):
+        """
+        处理一帧原始IMU数据（校准之后）
+        返回 True 表示位姿已更新；首帧和异常时间间隔的帧返回 False
+        """
+        if self.last_time is None:
+            self.last_time = t
+            return False
+        dt = t - self.last_time
+        self.last_time = t
+        if dt <= 0 or dt > MAX_DT:
+            return False
+
+        # 去除bias
+        ba, bg = self.accel_bias, self.gyro_bias
+        ax -= ba[0]
+        ay -= ba[1]
+        az -= ba[2]
+        gx -= bg[0]
+        gy -= bg[1]
+        gz -= bg[2]
+
+        # ZUPT检测
+        stationary = self.zupt.update(ax, ay, az, gx, gy, gz)
+        self.stationary = stationary
+
+        # 姿态：陀螺积分 + 倾角校正
+        att = self.attitude
+        att.integrate(gx, gy, gz, dt)
+        acc_norm2 = ax * ax + ay * ay + az * az
+        if self.subtract_gravity and self._tilt_lo2 < acc_norm2 < self._tilt_hi2:
+            att.correct_tilt(ax, ay, az, 1.0 - (ALPHA_STATIONARY if stationary else ALPHA))
+
+        # 加速度转世界坐标系
+        wx, wy, wz = att.rotate(ax, ay, az)
+        if self.subtract_gravity:
+            wz -= GRAVITY
+
+        # ZUPT：静止时速度快速衰减、抑制加速度积分
+        v = self.velocity
+        if stationary:
+            v[0] *= STATIONARY_VELOCITY_DECAY
+            v[1] *= STATIONARY_VELOCITY_DECAY
+            v[2] *= STATIONARY_VELOCITY_DECAY
+            wx *= STATIONARY_ACCEL_SCALE
+            wy *= STATIONARY_ACCEL_SCALE
+            wz *= STATIONARY_ACCEL_SCALE
+
+        # 速度和位置积分
+        p = self.position
+        v[0] = (v[0] + wx * dt) * VELOCITY_DECAY
+        v[1] = (v[1] + wy * dt) * VELOCITY_DECAY
+        v[2] = (v[2] + wz * dt) * VELOCITY_DECAY
+        p[0] += v[0] * dt
+        p[1] += v[1] * dt
+        p[2] += v[2] * dt
+        return True
+
+
+# ============ 数据读取 ============
+
+def load_imu_bag(filename, topic=DEFAULT_TOPIC):
+    """从bag读取IMU话题，返回 (t, acc, gyro)"""
+    import rosbag
+
+    with rosbag.Bag(filename) as bag:
+        n = bag.get_message_count(topic_filters=[topic])
+        data = np.empty((n, 7))
+        k = 0
+        for _, msg, _ in bag.read_messages(topics=[topic]):
+            a = msg.linear_acceleration
+            g = msg.angular_velocity
+            data[k] = (msg.header.stamp.to_sec(), a.x, a.y, a.z, g.x, g.y, g.z)
+            k += 1
+    data = data[:k]
+    return data[:, 0], data[:, 1:4], data[:, 4:7]
+
+
+def load_imu_text(filename, accel_first=False):
+    """
+    从文本文件读取IMU，返回 (t, acc, gyro)
+    默认列顺序 t, wx, wy, wz, ax, ay, az（EuRoC imu0/data.csv），accel_first时为 t, a, w
+    """
+    from trajectory_io import NS_TIMESTAMP_THRESHOLD, _parse_columns
+
+    with open(filename, 'rb') as f:
+        cols = _parse_columns(f.read().replace(b',', b' '))
+    if cols.ndim != 2 or cols.shape[1] < 7:
+        raise ValueError(f"IMU文件列数不足: {filename}")
+
+    t = cols[:, 0].copy()
+    if len(t) and t[0] > NS_TIMESTAMP_THRESHOLD:
+        t *= 1e-9
+    if accel_first:
+        return t, cols[:, 1:4], cols[:, 4:7]
+    return t, cols[:, 4:7], cols[:, 1:4]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IMU航位推算离线批处理')
+    parser.add_argument('input', help='IMU数据: .bag 或 文本/CSV文件')
+    parser.add_argument('-o', '--output', default='imu_pose.txt', help='输出TUM轨迹')
+    parser.add_argument('--topic', default=DEFAULT_TOPIC, help='bag中的IMU话题')
+    parser.add_argument('--accel-first', action='store_true', help='文本列顺序为 t, a, w')
+    parser.add_argument('--calibration-count', type=int, default=CALIBRATION_COUNT, help='校准帧数')
+    parser.add_argument('--zupt-detector', choices=DETECTORS, default=ZUPT_DETECTOR, help='零速检测器')
+    parser.add_argument('--zupt-window', type=int, default=ZUPT_WINDOW, help='零速检测窗口长度（帧）')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"❌ 文件不存在: {args.input}")
+        sys.exit(1)
+
+    start = time.time()
+    if args.input.endswith('.bag'):
+        t, acc, gyro = load_imu_bag(args.input, args.topic)
+    else:
+        t, acc, gyro = load_imu_text(args.input, args.accel_first)
+    load_time = time.time() - start
+    print(f"📂 读取 {len(t)} 帧IMU ({load_time:.2f}s)")
+
+    start = time.time()
+    traj, _ = dead_reckon(t, acc, gyro, calibration_count=args.calibration_count,
+                          zupt_detector=args.zupt_detector, zupt_window=args.zupt_window)
+    elapsed = time.time() - start
+
+    np.savetxt(args.output, traj, fmt='%.9f')
+    duration = t[-1] - t[0] if len(t) else 0.0
+    print(f"✅ 已写入 {len(traj)} 个位姿: {args.output}")
+    print(f"   数据时长 {duration:.1f}s, 处理用时 {elapsed:.2f}s "
+          f"({duration / max(elapsed, 1e-9):.0f}x 实时)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+IMU预积分 - 相邻关键帧之间的相对运动 ΔR / Δv / Δp、对bias的雅可比和协方差
+
+每个关键帧间隔输出一条摘要（约为IMU频率的1/10~1/30），下游更新bias时用一阶雅可比修正:
+    ΔR' = ΔR · Exp(∂ΔR/∂bg · δbg)
+    Δv' = Δv + ∂Δv/∂ba · δba + ∂Δv/∂bg · δbg
+    Δp' = Δp + ∂Δp/∂ba · δba + ∂Δp/∂bg · δbg
+无需重新积分。离散化采用 Forster et al. (TRO 2017) 的欧拉形式，IMU读数在两个采样之间保持不变，
+关键帧时刻落在两个IMU采样之间时在该时刻切分。重力不在预积分中扣除。
+
+两种用法，逐步积分代码相同（批量维度K）:
+    在线  ROS节点订阅 /synced/imu 和相机话题（只解析消息头时间戳），发布 /imu_preintegration
+    离线  整段IMU数组 + 关键帧时间戳，所有间隔并行按步推进，结果写入 .npz
+
+用法:
+    python3 imu_preintegration.py                                   # ROS节点
+    python3 imu_preintegration.py --offline imu.bag --frames imu.bag -o preint.npz
+    python3 imu_preintegration.py --offline imu0/data.csv --frames frames.txt -o preint.npz
+"""
+
+import argparse
+import struct
+import sys
+import time
+from collections import deque
+
+import numpy as np
+from scipy.spatial.transform import Rotation
+
+from imu_calibration import CalibrationAccumulator
+from imu_dead_reckoning import CALIBRATION_COUNT, calibrate, load_imu_bag, load_imu_text
+
+# 连续时间噪声密度（与VINS配置的 acc_n / gyr_n 含义相同）
+ACC_NOISE = 0.08
+GYRO_NOISE = 0.004
+
+DEFAULT_FRAME_TOPIC = '/synced/image_raw'
+DEFAULT_OUTPUT_TOPIC = '/imu_preintegration'
+
+# 离线模式每批并行的间隔数
+BATCH_INTERVALS = 8192
+# 在线模式等待关键帧时最多缓存的IMU帧数
+MAX_PENDING_IMU = 4000
+
+# 扁平摘要的布局（Float64MultiArray）
+SUMMARY_LAYOUT = (
+    ('t0', 1), ('t1', 1), ('n_samples', 1),
+    ('delta_q', 4), ('delta_v', 3), ('delta_p', 3),
+    ('acc_bias', 3), ('gyro_bias', 3),
+    ('dR_dbg', 9), ('dv_dba', 9), ('dv_dbg', 9), ('dp_dba', 9), ('dp_dbg', 9),
+    ('covariance', 45),   # [φ, v, p] 9x9协方差的上三角（按行）
+)
+SUMMARY_SIZE = sum(n for _, n in SUMMARY_LAYOUT)
+JACOBIANS = ('dR_dbg', 'dv_dba', 'dv_dbg', 'dp_dba', 'dp_dbg')
+_TRIU = np.triu_indices(9)
+
+
+def skew(v):
+    """批量反对称矩阵 (K, 3) -> (K, 3, 3)"""
+    S = np.zeros(v.shape[:-1] + (3, 3))
+    S[..., 0, 1] = -v[..., 2]
+    S[..., 0, 2] = v[..., 1]
+    S[..., 1, 0] = v[..., 2]
+    S[..., 1, 2] = -v[..., 0]
+    S[..., 2, 0] = -v[..., 1]
+    S[..., 2, 1] = v[..., 0]
+    return S
+
+
+def so3_exp_and_jr(phi):
+    """
+    批量 Exp(φ) 和右雅可比 Jr(φ)，(K, 3) -> (K, 3, 3), (K, 3, 3)
+    小角度时用泰勒展开，避免除零
+    """
+    theta2 = np.einsum('ij,ij->i', phi, phi)
+    theta = np.sqrt(theta2)
+    small = theta < 1e-4
+    safe = np.where(small, 1.0, theta)
+    A = np.where(small, 1.0 - theta2 / 6.0, np.sin(safe) / safe)
+    B = np.where(small, 0.5 - theta2 / 24.0, (1.0 - np.cos(safe)) / safe**2)
+    C = np.where(small, 1.0 / 6.0 - theta2 / 120.0, (safe - np.sin(safe)) / safe**3)
+
+    S = skew(phi)
+    S2 = S @ S
+    I = np.eye(3)
+    R = I + A[:, None, None] * S + B[:, None, None] * S2
+    Jr = I - B[:, None, None] * S + C[:, None, None] * S2
+    return R, Jr
+
+
+class PreintegrationState:
+    """
+    K个间隔的预积分状态，step() 同时推进全部间隔
+    dt=0 的步（离线模式的补齐）不改变任何状态
+    """
+
+    def __init__(self, k, acc_bias, gyro_bias, acc_noise=ACC_NOISE, gyro_noise=GYRO_NOISE):
+        self.acc_bias = np.broadcast_to(np.asarray(acc_bias, dtype=float), (k, 3)).copy()
+        self.gyro_bias = np.broadcast_to(np.asarray(gyro_bias, dtype=float), (k, 3)).copy()
+        self.acc_var = acc_noise**2
+        self.gyro_var = gyro_noise**2
+
+        I = np.broadcast_to(np.eye(3), (k, 3, 3))
+        self.dR = I.copy()
+        self.dv = np.zeros((k, 3))
+        self.dp = np.zeros((k, 3))
+        self.duration = np.zeros(k)
+        self.n_samples = np.zeros(k, dtype=int)
+        self.dR_dbg = np.zeros((k, 3, 3))
+        self.dv_dba = np.zeros((k, 3, 3))
+        self.dv_dbg = np.zeros((k, 3, 3))
+        self.dp_dba = np.zeros((k, 3, 3))
+        self.dp_dbg = np.zeros((k, 3, 3))
+        self.covariance = np.zeros((k, 9, 9))
+
+    def step(self, acc, gyro, dt):
+        """以读数 acc, gyro (K, 3) 积分 dt (K,) 秒"""
+        a = acc - self.acc_bias
+        w = gyro - self.gyro_bias
+        dt1 = dt[:, None]
+        dt3 = dt[:, None, None]
+        dt2_3 = 0.5 * dt3 * dt3
+
+        dR = self.dR
+        dRk, Jr = so3_exp_and_jr(w * dt1)
+        dR_a = np.einsum('kij,kj->ki', dR, a)
+        dR_ax = dR @ skew(a)
+        dR_ax_J = dR_ax @ self.dR_dbg
+
+        # 协方差 [φ, v, p]: Σ = A Σ Aᵀ + Q
+        k = len(dt)
+        A = np.zeros((k, 9, 9))
+        A[:, 0:3, 0:3] = dRk.transpose(0, 2, 1)
+        A[:, 3:6, 0:3] = -dR_ax * dt3
+        A[:, 3:6, 3:6] = np.eye(3)
+        A[:, 6:9, 0:3] = -dR_ax * dt2_3
+        A[:, 6:9, 3:6] = np.eye(3) * dt3
+        A[:, 6:9, 6:9] = np.eye(3)
+        Q = np.zeros((k, 9, 9))
+        Q[:, 0:3, 0:3] = self.gyro_var * dt3 * (Jr @ Jr.transpose(0, 2, 1))
+        eye = np.eye(3) * self.acc_var
+        Q[:, 3:6, 3:6] = eye * dt3
+        Q[:, 3:6, 6:9] = eye * dt2_3
+        Q[:, 6:9, 3:6] = eye * dt2_3
+        Q[:, 6:9, 6:9] = eye * (0.25 * dt3**3)
+        self.covariance = A @ self.covariance @ A.transpose(0, 2, 1) + Q
+
+        # 雅可比（使用更新前的 ΔR, Δv 雅可比）
+        self.dp_dba += self.dv_dba * dt3 - dR * dt2_3
+        self.dp_dbg += self.dv_dbg * dt3 - dR_ax_J * dt2_3
+        self.dv_dba -= dR * dt3
+        self.dv_dbg -= dR_ax_J * dt3
+        self.dR_dbg = dRk.transpose(0, 2, 1) @ self.dR_dbg - Jr * dt3
+
+        # 状态
+        self.dp += self.dv * dt1 + 0.5 * dR_a * dt1 * dt1
+        self.dv += dR_a * dt1
+        self.dR = dR @ dRk
+        self.duration += dt
+        self.n_samples += dt > 0
+
+    def summaries(self, t0, t1):
+        """当前状态的摘要字典（数组的第一维为间隔）"""
+        out = {
+            't0': np.asarray(t0, dtype=float),
+            't1': np.asarray(t1, dtype=float),
+            'n_samples': self.n_samples.copy(),
+            'delta_q': Rotation.from_matrix(self.dR).as_quat(),
+            'delta_R': self.dR.copy(),
+            'delta_v': self.dv.copy(),
+            'delta_p': self.dp.copy(),
+            'acc_bias': self.acc_bias.copy(),
+            'gyro_bias': self.gyro_bias.copy(),
+            'covariance': self.covariance.copy(),
+        }
+        for name in JACOBIANS:
+            out[name] = getattr(self, name).copy()
+        return out
+
+
+def correct_bias(summary, acc_bias, gyro_bias):
+    """
+    一阶bias修正，返回 (ΔR, Δv, Δp)
+    summary 为单个间隔的摘要（unpack_summary 的结果或 summaries 的一行）
+    """
+    dba = np.asarray(acc_bias, dtype=float) - summary['acc_bias']
+    dbg = np.asarray(gyro_bias, dtype=float) - summary['gyro_bias']
+    dR_corr, _ = so3_exp_and_jr((summary['dR_dbg'] @ dbg)[None])
+    dR = np.asarray(summary['delta_R']) @ dR_corr[0]
+    dv = summary['delta_v'] + summary['dv_dba'] @ dba + summary['dv_dbg'] @ dbg
+    dp = summary['delta_p'] + summary['dp_dba'] @ dba + summary['dp_dbg'] @ dbg
+    return dR, dv, dp
+
+
+def pack_summary(summaries, i=0):
+    """第i个间隔的摘要打包为长度 SUMMARY_SIZE 的列表"""
+    out = []
+    for name, n in SUMMARY_LAYOUT:
+        if name == 'covariance':
+            out.extend(summaries['covariance'][i][_TRIU].tolist())
+        else:
+            out.extend(np.ravel(summaries[name][i]).tolist())
+    return out
+
+
+def unpack_summary(data):
+    """打包数据还原为单个间隔的摘要字典"""
+    data = np.asarray(data, dtype=float)
+    summary = {}
+    offset = 0
+    for name, n in SUMMARY_LAYOUT:
+        v = data[offset:offset + n]
+        offset += n
+        if name in ('t0', 't1'):
+            summary[name] = float(v[0])
+        elif name == 'n_samples':
+            summary[name] = int(v[0])
+        elif name == 'covariance':
+            cov = np.zeros((9, 9))
+            cov[_TRIU] = v
+            summary[name] = cov + np.triu(cov, 1).T
+        elif n == 9:
+            summary[name] = v.reshape(3, 3)
+        else:
+            summary[name] = v
+    summary['delta_R'] = Rotation.from_quat(summary['delta_q']).as_matrix()
+    return summary
+
+
+class Preintegrator:
+    """
+    在线预积分：IMU和关键帧时间戳异步到达
+    IMU先缓存，关键帧时间戳之后的第一帧IMU到达时才积分到该时刻并输出摘要，
+    因此关键帧消息早到或晚到（在IMU缓存范围内）都能正确切分
+    缓存溢出（长时间无关键帧）时丢弃最旧的IMU并计入 dropped，当前积分作废，
+    从下一个关键帧重新开始，避免输出跨越数据缺口的摘要
+    """
+
+    def __init__(self, acc_bias, gyro_bias, acc_noise=ACC_NOISE, gyro_noise=GYRO_NOISE):
+        self.acc_bias = acc_bias
+        self.gyro_bias = gyro_bias
+        self.acc_noise = acc_noise
+        self.gyro_noise = gyro_noise
+        self.imu = deque(maxlen=MAX_PENDING_IMU)
+        self.dropped = 0        # 缓存溢出丢弃的IMU帧数
+        self.frames = deque()
+        self.held = None        # (t, acc, gyro)：当前生效的IMU读数
+        self.cursor = None      # 已积分到的时刻
+        self.state = None
+        self.t0 = None
+        self._acc = np.empty((1, 3))
+        self._gyro = np.empty((1, 3))
+        self._dt = np.empty(1)
+
+    def _reset(self, t0):
+        self.state = PreintegrationState(1, self.acc_bias, self.gyro_bias, self.acc_noise, self.gyro_noise)
+        self.t0 = t0
+
+    def _advance(self, t):
+        if self.state is not None and t > self.cursor:
+            self._acc[0] = self.held[1]
+            self._gyro[0] = self.held[2]
+            self._dt[0] = t - self.cursor
+            self.state.step(self._acc, self._gyro, self._dt)
+        self.cursor = max(self.cursor, t)
+
+    def add_imu(self, t, acc, gyro):
+        """加入一帧IMU，返回因此完成的摘要列表"""
+        if len(self.imu) == self.imu.maxlen:
+            self.dropped += 1
+            self.state = None
+            self.held = None
+        self.imu.append((t, acc, gyro))
+        return self._process()
+
+    def add_frame(self, t):
+        """加入一个关键帧时间戳，返回因此完成的摘要列表"""
+        if self.frames and t <= self.frames[-1]:
+            return []
+        self.frames.append(t)
+        return self._process()
+
+    def _process(self):
+        out = []
+        while self.frames and self.imu and self.imu[-1][0] >= self.frames[0]:
+            tf = self.frames.popleft()
+            # 积分到关键帧时刻之前的所有IMU
+            while self.imu and self.imu[0][0] <= tf:
+                sample = self.imu.popleft()
+                if self.held is not None:
+                    self._advance(sample[0])
+                else:
+                    self.cursor = sample[0]
+                self.held = sample
+            if self.held is None:
+                continue  # 关键帧早于第一帧IMU
+            self._advance(tf)
+            if self.state is not None:
+                out.append(self.state.summaries([self.t0], [tf]))
+            self._reset(tf)
+        return out
+
+
+def frame_intervals(t, frame_times):
+    """
+    离线切分: 每个间隔 [f_i, f_{i+1}] 覆盖的IMU采样下标范围
+    返回 (f0, f1, first, last)，只保留被IMU完整覆盖的间隔
+    """
+    frame_times = np.asarray(frame_times, dtype=float)
+    f0, f1 = frame_times[:-1], frame_times[1:]
+    keep = (f0 >= t[0]) & (f1 <= t[-1]) & (f1 > f0)
+    f0, f1 = f0[keep], f1[keep]
+    first = np.searchsorted(t, f0, side='right') - 1
+    last = np.searchsorted(t, f1, side='right') - 1
+    return f0, f1, first, last
+
+
+def preintegrate_batch(t, acc, gyro, frame_times, acc_bias, gyro_bias, acc_noise=ACC_NOISE,
+                       gyro_noise=GYRO_NOISE, batch=BATCH_INTERVALS):
+    """
+    离线预积分：所有关键帧间隔并行推进，第j步处理每个间隔的第j个IMU子区间
+    返回合并后的摘要字典（第一维为间隔）
+    """
+    f0, f1, first, last = frame_intervals(t, frame_times)
+    t_next = np.append(t[1:], np.inf)
+    parts = []
+    for s in range(0, len(f0), batch):
+        sl = slice(s, s + batch)
+        bf0, bf1, bfirst, blast = f0[sl], f1[sl], first[sl], last[sl]
+        state = PreintegrationState(len(bf0), acc_bias, gyro_bias, acc_noise, gyro_noise)
+        steps = int(np.max(blast - bfirst)) + 1
+        for j in range(steps):
+            idx = np.minimum(bfirst + j, blast)
+            active = bfirst + j <= blast
+            start = np.maximum(t[idx], bf0)
+            stop = np.minimum(t_next[idx], bf1)
+            dt = np.where(active, np.maximum(stop - start, 0.0), 0.0)
+            state.step(acc[idx], gyro[idx], dt)
+        parts.append(state.summaries(bf0, bf1))
+
+    if not parts:
+        return None
+    return {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+
+
+def load_frame_times(filename, topic=DEFAULT_FRAME_TOPIC):
+    """关键帧时间戳：bag中相机话题的消息头时间，或文本文件的第一列（秒或纳秒）"""
+    if filename.endswith('.bag'):
+        import rosbag
+
+        stamps = []
+        with rosbag.Bag(filename) as bag:
+            # raw模式只取消息头（seq, secs, nsecs），不反序列化图像
+            for _, msg, _ in bag.read_messages(topics=[topic], raw=True):
+                secs, nsecs = struct.unpack_from('<II', msg[1], 4)
+                stamps.append(secs + nsecs * 1e-9)
+        return np.array(stamps)
+
+    from trajectory_io import NS_TIMESTAMP_THRESHOLD
+
+    values = np.loadtxt(filename, delimiter=',' if filename.endswith('.csv') else None,
+                        comments='#', ndmin=2)[:, 0]
+    if len(values) and values[0] > NS_TIMESTAMP_THRESHOLD:
+        values = values * 1e-9
+    return np.sort(values)
+
+
+def run_offline(args):
+    start = time.time()
+    if args.offline.endswith('.bag'):
+        t, acc, gyro = load_imu_bag(args.offline, args.imu_topic)
+    else:
+        t, acc, gyro = load_imu_text(args.offline, args.accel_first)
+    frames = load_frame_times(args.frames, args.frame_topic)[::args.frame_stride]
+    print(f"📂 IMU {len(t)} 帧, 关键帧 {len(frames)} 个 ({time.time() - start:.2f}s)")
+
+    calib = calibrate(acc[:CALIBRATION_COUNT], gyro[:CALIBRATION_COUNT])
+    start = time.time()
+    result = preintegrate_batch(t, acc, gyro, frames, calib['accel_bias'], calib['gyro_bias'],
+                                args.acc_noise, args.gyro_noise)
+    if result is None:
+        print("❌ 没有被IMU完整覆盖的关键帧间隔")
+        sys.exit(1)
+    np.savez(args.output, **result)
+    print(f"✅ {len(result['t0'])} 个间隔 ({time.time() - start:.2f}s): {args.output}")
+    print(f"   平均每个间隔 {np.mean(result['n_samples']):.1f} 个IMU子区间")
+
+
+def run_node():
+    import rospy
+    from sensor_msgs.msg import Imu
+    from std_msgs.msg import Float64MultiArray, MultiArrayDimension
+
+    rospy.init_node('imu_preintegration', anonymous=True)
+    frame_topic = rospy.get_param('~frame_topic', DEFAULT_FRAME_TOPIC)
+    frame_stride = max(1, int(rospy.get_param('~frame_stride', 1)))
+    acc_noise = rospy.get_param('~acc_n', ACC_NOISE)
+    gyro_noise = rospy.get_param('~gyr_n', GYRO_NOISE)
+    pub = rospy.Publisher(rospy.get_param('~output_topic', DEFAULT_OUTPUT_TOPIC),
+                          Float64MultiArray, queue_size=50)
+
+    state = {'preint': None, 'calibration': CalibrationAccumulator(), 'frames': 0}
+
+    msg = Float64MultiArray()
+    msg.layout.dim = [MultiArrayDimension(label='summary', size=SUMMARY_SIZE, stride=SUMMARY_SIZE)]
+
+    def publish(summaries):
+        for s in summaries:
+            msg.data = pack_summary(s)
+            pub.publish(msg)
+
+    def imu_callback(imu_msg):
+        a = imu_msg.linear_acceleration
+        g = imu_msg.angular_velocity
+        if state['preint'] is None:
+            # 与IMU转换器相同的静止校准
+            calibration = state['calibration']
+            calibration.update(a.x, a.y, a.z, g.x, g.y, g.z)
+            if calibration.count >= CALIBRATION_COUNT:
+                calib = calibration.result()
+                state['preint'] = Preintegrator(calib['accel_bias'], calib['gyro_bias'], acc_noise, gyro_noise)
+                rospy.loginfo("Preintegration: calibration done, accel bias [%.4f, %.4f, %.4f], "
+                              "gyro bias [%.4f, %.4f, %.4f]" % (tuple(calib['accel_bias']) + tuple(calib['gyro_bias'])))
+            return
+        preint = state['preint']
+        dropped = preint.dropped
+        publish(preint.add_imu(imu_msg.header.stamp.to_sec(), (a.x, a.y, a.z), (g.x, g.y, g.z)))
+        if preint.dropped != dropped:
+            rospy.logwarn_throttle(10, "Preintegration: no frame on %s for %d IMU samples, "
+                                       "dropped %d so far, integration restarted" % (
+                                           frame_topic, MAX_PENDING_IMU, preint.dropped))
+
+    def frame_callback(raw):
+        # AnyMsg：只解析消息头中的时间戳，不反序列化图像
+        state['frames'] += 1
+        if state['preint'] is None or (state['frames'] - 1) % frame_stride:
+            return
+        secs, nsecs = struct.unpack_from('<II', raw._buff, 4)
+        publish(state['preint'].add_frame(secs + nsecs * 1e-9))
+
+    rospy.Subscriber('/synced/imu', Imu, imu_callback, queue_size=1000)
+    rospy.Subscriber(frame_topic, rospy.AnyMsg, frame_callback, queue_size=100)
+    rospy.loginfo("IMU preintegration started: /synced/imu + %s (stride %d) -> %s" % (
+        frame_topic, frame_stride, pub.name))
+    rospy.spin()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IMU预积分（关键帧间隔）')
+    parser.add_argument('--offline', metavar='IMU_FILE', default=None,
+                        help='离线模式：IMU数据 (.bag 或 CSV)，不给则作为ROS节点运行')
+    parser.add_argument('--frames', default=None, help='关键帧时间戳: .bag（相机话题）或文本文件')
+    parser.add_argument('--frame-topic', default=DEFAULT_FRAME_TOPIC, help='bag中的相机话题')
+    parser.add_argument('--frame-stride', type=int, default=1, help='每隔几帧取一个关键帧')
+    parser.add_argument('--imu-topic', default='/synced/imu', help='bag中的IMU话题')
+    parser.add_argument('--accel-first', action='store_true', help='IMU文本列顺序为 t, a, w')
+    parser.add_argument('--acc-noise', type=float, default=ACC_NOISE, help='加速度计噪声密度')
+    parser.add_argument('--gyro-noise', type=float, default=GYRO_NOISE, help='陀螺噪声密度')
+    parser.add_argument('-o', '--output', default='imu_preintegration.npz', help='离线结果')
+    args, _ = parser.parse_known_args()
+
+    if args.offline:
+        if not args.frames:
+            parser.error('离线模式需要 --frames')
+        run_offline(args)
+    else:
+        run_node()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+实时增量评估 - 跟随(tail)正在写入的VINS结果CSV，边运行边给出对齐后的ATE和漂移
+
+新写入的完整行才会被解析（记录文件偏移，不重读旧数据）；每批新位姿与GT关联后
+只并入Umeyama充分统计量，对齐参数和当前对齐下的ATE由统计量直接求出，不从头重新对齐。
+分段漂移只对上次快照之后新增的位姿计算（以当前对齐为准）。
+
+用法:
+    python3 live_evaluation.py <gt_file> <vins_result.csv> [--interval 2] [--max-ate 0.5]
+    或 python3 align_trajectories.py <eval_dir> <dataset> --follow <vins_result.csv>
+超过 --max-ate 时以返回码2退出，便于外层脚本提前终止bag回放。
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from trajectory_association import DEFAULT_MAX_DT, associate_poses
+from trajectory_io import detect_format, load_trajectory, parse_rows
+from trajectory_rpe import path_length
+from umeyama import UmeyamaAccumulator
+
+# 默认快照间隔和轮询间隔（秒）
+DEFAULT_INTERVAL = 2.0
+POLL_INTERVAL = 0.2
+# 文件持续无新数据多久后认为运行结束（秒）
+DEFAULT_IDLE_TIMEOUT = 30.0
+# 快照漂移使用的分段长度（米）
+DEFAULT_SEGMENT_LENGTH = 10.0
+# 匹配位姿数少于该值时不做中止判断（对齐尚不稳定）
+MIN_MATCHED_FOR_ABORT = 200
+
+ABORT_EXIT_CODE = 2
+
+
+class TrajectoryTail:
+    """
+    增量读取正在写入的轨迹文件
+    每次poll只读取上次偏移之后的字节，未写完的最后一行留到下次
+    """
+
+    def __init__(self, filename, fmt=None):
+        self.filename = filename
+        self.fmt = fmt or detect_format(filename)
+        self.offset = 0
+        self.partial = b''
+        self.inode = None
+
+    def poll(self):
+        """
+        返回 (新增的完整行 (K, 8), 是否重新开始)
+        文件被截断或被替换（VINS重启后重写）时从头读取，并返回 restarted=True
+        """
+        try:
+            st = os.stat(self.filename)
+        except OSError:
+            return np.zeros((0, 8)), False
+        size = st.st_size
+        restarted = (self.inode is not None and st.st_ino != self.inode) or size < self.offset
+        self.inode = st.st_ino
+        if restarted:
+            self.offset = 0
+            self.partial = b''
+        if size == self.offset:
+            return np.zeros((0, 8)), restarted
+
+        with open(self.filename, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        self.offset += len(data)
+
+        data = self.partial + data
+        end = data.rfind(b'\n')
+        if end < 0:
+            self.partial = data
+            return np.zeros((0, 8)), restarted
+        self.partial = data[end + 1:]
+        return parse_rows(data[:end + 1], self.fmt, self.filename), restarted
+
+
+class GrowingArray:
+    """按行追加的数组，容量倍增，摊还O(1)"""
+
+    def __init__(self, n_cols, capacity=1024):
+        self.data = np.empty((capacity, n_cols))
+        self.size = 0
+
+    def extend(self, rows):
+        need = self.size + len(rows)
+        if need > len(self.data):
+            data = np.empty((max(need, 2 * len(self.data)), self.data.shape[1]))
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+        self.data[self.size:need] = rows
+        self.size = need
+
+    @property
+    def view(self):
+        return self.data[:self.size]
+
+
+class IncrementalEvaluator:
+    """
+    增量评估器
+    update(rows) 并入新位姿；snapshot() 返回当前指标，代价与新增位姿数成正比
+    """
+
+    def __init__(self, gt, max_dt=DEFAULT_MAX_DT, interpolation='nearest', with_scale=False,
+                 segment_length=DEFAULT_SEGMENT_LENGTH):
+        self.gt = gt
+        self.max_dt = max_dt
+        self.interpolation = interpolation
+        self.with_scale = with_scale
+        self.segment_length = segment_length
+
+        self.acc = UmeyamaAccumulator()
+        self.n_poses = 0
+        # 已匹配的位姿对: [t, 估计xyz, GT xyz, GT累计弧长]
+        self.pairs = GrowingArray(8)
+        self.last_snapshot = 0
+        self.drift_sum = 0.0
+        self.drift_count = 0
+
+    def update(self, rows):
+        """并入一批新位姿 (K, 8)，返回新匹配的位姿数"""
+        if len(rows) == 0:
+            return 0
+        self.n_poses += len(rows)
+        if np.any(np.diff(rows[:, 0]) < 0):
+            rows = rows[np.argsort(rows[:, 0], kind='stable')]
+
+        assoc = associate_poses(self.gt, rows, max_dt=self.max_dt, interpolation=self.interpolation)
+        if len(assoc) == 0:
+            return 0
+        p_est = assoc.est_positions(rows)
+        p_gt = assoc.ref_positions(self.gt)
+        self.acc.update(p_est, p_gt)
+
+        # 接续已有的弧长
+        prev = self.pairs.view[-1:]
+        start = p_gt[:1] if len(prev) == 0 else prev[:, 4:7]
+        arc0 = 0.0 if len(prev) == 0 else prev[0, 7]
+        block = np.empty((len(p_est), 8))
+        block[:, 0] = assoc.timestamps(rows)
+        block[:, 1:4] = p_est
+        block[:, 4:7] = p_gt
+        block[:, 7] = arc0 + path_length(np.vstack([start, p_gt]))[1:]
+        self.pairs.extend(block)
+        return len(block)
+
+    def _recent_drift(self, s, R):
+        """上次快照之后结束的分段的平移漂移 (%)，以当前对齐计算"""
+        pairs = self.pairs.view
+        arc = pairs[:, 7]
+        j = np.arange(self.last_snapshot, len(pairs))
+        i = np.searchsorted(arc, arc[j] - self.segment_length, side='right') - 1
+        keep = i >= 0
+        i, j = i[keep], j[keep]
+        if len(j) == 0:
+            return None
+        d_est = s * (pairs[j, 1:4] - pairs[i, 1:4]) @ R.T
+        d_gt = pairs[j, 4:7] - pairs[i, 4:7]
+        length = np.maximum(arc[j] - arc[i], 1e-9)
+        drift = np.linalg.norm(d_est - d_gt, axis=1) / length * 100
+        self.drift_sum += float(np.sum(drift))
+        self.drift_count += len(drift)
+        return float(np.mean(drift))
+
+    def snapshot(self):
+        """当前指标；匹配位姿不足3个时返回None"""
+        pairs = self.pairs.view
+        if len(pairs) < 3:
+            return None
+        s, R, t = self.acc.solve(self.with_scale)
+        last = pairs[-1]
+        latest_error = np.linalg.norm(s * R @ last[1:4] + t - last[4:7])
+        recent_drift = self._recent_drift(s, R)
+        self.last_snapshot = len(pairs)
+
+        return {
+            'time': float(last[0]),
+            'n_poses': self.n_poses,
+            'n_matched': len(pairs),
+            'ate_rmse': self.acc.residual_rms(s, R, t),
+            'latest_error': float(latest_error),
+            'path_length': float(last[7]),
+            'recent_drift_percent': recent_drift,
+            'drift_percent': self.drift_sum / self.drift_count if self.drift_count else None,
+            'scale': float(s),
+        }
+
+
+def format_snapshot(snap):
+    """快照的单行文本"""
+    drift = '-' if snap['recent_drift_percent'] is None else f"{snap['recent_drift_percent']:.2f}%"
+    return (f"⏱️  t={snap['time']:.1f}s  poses {snap['n_poses']}  matched {snap['n_matched']}  "
+            f"ATE {snap['ate_rmse']:.4f} m  latest {snap['latest_error']:.4f} m  "
+            f"dist {snap['path_length']:.1f} m  drift {drift}")
+
+
+def follow(gt_file, est_file, interval=DEFAULT_INTERVAL, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+           max_ate=None, snapshot_file=None, max_dt=DEFAULT_MAX_DT, interpolation='nearest',
+           with_scale=False, segment_length=DEFAULT_SEGMENT_LENGTH):
+    """
+    跟随估计文件直到持续 idle_timeout 秒无新数据（<=0 时一直跟随，Ctrl-C结束）
+    返回 (最后一次快照, 是否因超过max_ate而中止)
+    """
+    gt = load_trajectory(gt_file)
+    tail = TrajectoryTail(est_file)
+    evaluator = IncrementalEvaluator(gt, max_dt, interpolation, with_scale, segment_length)
+    out = open(snapshot_file, 'a') if snapshot_file else None
+
+    print(f"👀 跟随: {est_file}")
+    print(f"   GT: {gt_file} ({len(gt)} 个位姿)")
+
+    snap = None
+    aborted = False
+    last_data = time.time()
+    next_snapshot = time.time() + interval
+    try:
+        while True:
+            rows, restarted = tail.poll()
+            now = time.time()
+            if restarted:
+                # 新的一次运行：丢弃旧运行的对齐统计量、位姿对和漂移
+                print("🔄 估计文件被截断/重写（VINS重启？），重新开始评估", flush=True)
+                evaluator = IncrementalEvaluator(gt, max_dt, interpolation, with_scale, segment_length)
+                snap = None
+            if len(rows):
+                evaluator.update(rows)
+                last_data = now
+            elif idle_timeout > 0 and evaluator.n_poses and now - last_data > idle_timeout:
+                break
+
+            if now >= next_snapshot:
+                next_snapshot = now + interval
+                current = evaluator.snapshot()
+                if current is not None and current['n_matched'] > (snap or {}).get('n_matched', 0):
+                    snap = current
+                    print(format_snapshot(snap), flush=True)
+                    if out:
+                        out.write(json.dumps(snap) + '\n')
+                        out.flush()
+                    if (max_ate is not None and snap['n_matched'] >= MIN_MATCHED_FOR_ABORT
+                            and snap['ate_rmse'] > max_ate):
+                        print(f"❌ ATE {snap['ate_rmse']:.4f} m 超过阈值 {max_ate} m，中止")
+                        aborted = True
+                        break
+
+            if not len(rows):
+                time.sleep(POLL_INTERVAL)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out:
+            out.close()
+
+    if not aborted:
+        final = evaluator.snapshot()
+        if final is not None:
+            snap = final
+        print("")
+        if snap is None:
+            print("⚠️  没有与GT匹配的位姿")
+        else:
+            print("📊 最终结果:")
+            print(format_snapshot(snap))
+            if snap['drift_percent'] is not None:
+                print(f"   平均漂移 ({segment_length:.0f}m分段): {snap['drift_percent']:.3f}%")
+    return snap, aborted
+
+
+def add_follow_arguments(parser):
+    """follow模式的公共命令行参数（align_trajectories.py复用）"""
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='快照间隔 (s)')
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help='无新数据多久后结束 (s)，<=0 表示一直跟随')
+    parser.add_argument('--max-ate', type=float, default=None, help='ATE超过该值时中止 (m)')
+    parser.add_argument('--snapshot-file', default=None, help='快照追加写入的JSON Lines文件')
+    parser.add_argument('--segment-length', type=float, default=DEFAULT_SEGMENT_LENGTH,
+                        help='漂移分段长度 (m)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='实时增量轨迹评估')
+    parser.add_argument('gt_file', help='Ground Truth轨迹 (TUM)')
+    parser.add_argument('est_file', help='正在写入的估计轨迹 (VINS CSV / TUM)')
+    add_follow_arguments(parser)
+    parser.add_argument('--max-dt', type=float, default=DEFAULT_MAX_DT, help='时间戳关联最大时间差 (s)')
+    parser.add_argument('--interpolation', choices=['nearest', 'linear'], default='nearest',
+                        help='时间戳关联方式')
+    args = parser.parse_args()
+
+    _, aborted = follow(args.gt_file, args.est_file, interval=args.interval,
+                        idle_timeout=args.idle_timeout, max_ate=args.max_ate,
+                        snapshot_file=args.snapshot_file, max_dt=args.max_dt,
+                        interpolation=args.interpolation, segment_length=args.segment_length)
+    sys.exit(ABORT_EXIT_CODE if aborted else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+节点性能统计 - 每个订阅话题的回调耗时、排队延迟、消息速率和丢包
+
+    回调耗时   回调函数本身的执行时间（含发布/序列化），perf_counter 计时
+    排队延迟   回调开始时刻 - 消息 header.stamp（传输 + 订阅队列等待；
+               仿真时间下与bag中的时间戳同一时钟）
+    速率       上个统计周期内的消息数 / 周期时长
+    丢包       header.seq 的跳号数（发布端按序递增，中间缺的即未送达回调的消息）
+
+耗时和延迟记录在对数分桶直方图中（每个十倍区间10个桶），每条消息O(1)、无分配，
+单次记录约1-2us。统计核心与ROS无关；start_ros() 之后按 ~diagnostics_period 周期
+在 /diagnostics 发布 diagnostic_msgs/DiagnosticArray（rqt_robot_monitor 可直接查看），
+节点关闭时打印汇总并写入 ~metrics_file（默认 /tmp/node_metrics_<节点名>.json）。
+
+用法:
+    self.metrics = NodeMetrics('imu_to_pose_converter')
+    rospy.Subscriber('/synced/imu', Imu, self.metrics.instrument('/synced/imu', self.imu_callback))
+    self.metrics.start_ros()
+"""
+
+import json
+import math
+import time
+
+# 直方图范围: 1us .. 100s
+HIST_MIN_EXP = -6
+HIST_MAX_EXP = 2
+BUCKETS_PER_DECADE = 10
+N_BUCKETS = (HIST_MAX_EXP - HIST_MIN_EXP) * BUCKETS_PER_DECADE
+
+DEFAULT_PERIOD = 5.0            # s，诊断发布周期
+DIAGNOSTICS_TOPIC = '/diagnostics'
+SEQ_WRAP = 2**32
+
+
+class LatencyHistogram:
+    """对数分桶直方图（单位秒），另记录精确的计数、总和与最大值"""
+
+    def __init__(self):
+        self.buckets = [0] * (N_BUCKETS + 2)   # 首尾为下溢/上溢桶
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, x):
+        self.count += 1
+        self.total += x
+        if x > self.max:
+            self.max = x
+        if x <= 0.0:
+            self.buckets[0] += 1
+            return
+        i = int((math.log10(x) - HIST_MIN_EXP) * BUCKETS_PER_DECADE) + 1
+        if i < 0:
+            i = 0
+        elif i > N_BUCKETS + 1:
+            i = N_BUCKETS + 1
+        self.buckets[i] += 1
+
+    @staticmethod
+    def bucket_upper(i):
+        """第i个桶的上边界（秒）"""
+        return 10.0 ** (HIST_MIN_EXP + i / BUCKETS_PER_DECADE)
+
+    def percentile(self, q):
+        """百分位数估计（所在桶的上边界，不超过最大值）"""
+        if self.count == 0:
+            return 0.0
+        target = q / 100.0 * self.count
+        cum = 0
+        for i, c in enumerate(self.buckets):
+            cum += c
+            if cum >= target and c:
+                return min(self.bucket_upper(i), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class TopicStats:
+    def __init__(self, topic):
+        self.topic = topic
+        self.latency = LatencyHistogram()
+        self.delay = LatencyHistogram()
+        self.count = 0
+        self.drops = 0
+        self.errors = 0
+        self.last_seq = None
+        self.period_start_count = 0
+        self.rate = 0.0
+
+    def record(self, latency, stamp=None, seq=None, arrival=None):
+        """
+        记录一条消息：回调耗时 latency（秒），stamp / seq 为回调前的 header 值
+        （回调和发布端可能改写header），arrival 为回调开始时刻（与stamp同一时钟）
+        """
+        self.count += 1
+        self.latency.record(latency)
+        if stamp is not None and arrival is not None:
+            self.delay.record(arrival - stamp)
+        if seq is None:
+            return
+        if self.last_seq is not None and seq:
+            gap = (seq - self.last_seq - 1) % SEQ_WRAP
+            # 发布端重启时seq回到0附近，不计为丢包
+            if 0 < gap < SEQ_WRAP // 2:
+                self.drops += gap
+        self.last_seq = seq
+
+    def close_period(self, elapsed):
+        """结束一个统计周期，更新速率"""
+        if elapsed > 0:
+            self.rate = (self.count - self.period_start_count) / elapsed
+        self.period_start_count = self.count
+
+    def summary(self):
+        lat, delay = self.latency, self.delay
+        return {
+            'count': self.count,
+            'rate_hz': self.rate,
+            'drops': self.drops,
+            'errors': self.errors,
+            'latency_mean_us': lat.mean * 1e6,
+            'latency_p50_us': lat.percentile(50) * 1e6,
+            'latency_p99_us': lat.percentile(99) * 1e6,
+            'latency_max_us': lat.max * 1e6,
+            'delay_mean_ms': delay.mean * 1e3,
+            'delay_p50_ms': delay.percentile(50) * 1e3,
+            'delay_p99_ms': delay.percentile(99) * 1e3,
+            'delay_max_ms': delay.max * 1e3,
+        }
+
+
+class NodeMetrics:
+    """
+    一个节点内所有话题的统计
+    now: 排队延迟使用的时钟（ROS中为 rospy.get_time，start_ros 时设置）
+    """
+
+    def __init__(self, name, now=time.time):
+        self.name = name
+        self.now = now
+        self.topics = {}
+        self.period_start = time.monotonic()
+        self.start_time = self.period_start
+
+    def topic(self, topic):
+        stats = self.topics.get(topic)
+        if stats is None:
+            stats = self.topics[topic] = TopicStats(topic)
+        return stats
+
+    def instrument(self, topic, callback):
+        """包装订阅回调，记录每条消息的耗时与延迟；回调抛出的异常计入errors后继续抛出"""
+        stats = self.topic(topic)
+        perf = time.perf_counter
+
+        def wrapped(msg, *args):
+            header = getattr(msg, 'header', None)
+            if header is None:
+                stamp = seq = None
+            else:
+                stamp = header.stamp.secs + header.stamp.nsecs * 1e-9
+                seq = header.seq
+            arrival = self.now()
+            start = perf()
+            try:
+                return callback(msg, *args)
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                stats.record(perf() - start, stamp, seq, arrival)
+
+        return wrapped
+
+    def close_period(self):
+        now = time.monotonic()
+        elapsed = now - self.period_start
+        for stats in self.topics.values():
+            stats.close_period(elapsed)
+        self.period_start = now
+
+    def snapshot(self):
+        return {topic: stats.summary() for topic, stats in self.topics.items()}
+
+    def format_report(self):
+        lines = [f"📊 {self.name} 回调统计（运行 {time.monotonic() - self.start_time:.0f}s）"]
+        lines.append(f"  {'topic':<28}{'count':>10}{'Hz':>10}{'drops':>8}"
+                     f"{'cb p50':>10}{'p99':>10}{'max us':>10}{'delay p50':>11}{'p99 ms':>10}")
+        for topic, s in self.snapshot().items():
+            lines.append(f"  {topic:<28}{s['count']:>10}{s['rate_hz']:>10.1f}{s['drops']:>8}"
+                         f"{s['latency_p50_us']:>10.0f}{s['latency_p99_us']:>10.0f}{s['latency_max_us']:>10.0f}"
+                         f"{s['delay_p50_ms']:>11.2f}{s['delay_p99_ms']:>10.2f}")
+        return lines
+
+    def dump(self, filename):
+        report = {
+            'node': self.name,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'uptime_s': time.monotonic() - self.start_time,
+            'topics': self.snapshot(),
+            'latency_histograms': {
+                topic: {'bucket_upper_s': [LatencyHistogram.bucket_upper(i) for i in range(N_BUCKETS + 2)],
+                        'callback': s.latency.buckets, 'delay': s.delay.buckets}
+                for topic, s in self.topics.items()},
+        }
+        with open(filename, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    def start_ros(self):
+        """周期发布 /diagnostics，关闭时打印汇总并写JSON（需在 rospy.init_node 之后调用）"""
+        import rospy
+        from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
+
+        self.now = rospy.get_time
+        period = rospy.get_param('~diagnostics_period', DEFAULT_PERIOD)
+        metrics_file = rospy.get_param(
+            '~metrics_file', '/tmp/node_metrics_%s.json' % rospy.get_name().strip('/').replace('/', '_'))
+        pub = rospy.Publisher(rospy.get_param('~diagnostics_topic', DIAGNOSTICS_TOPIC),
+                              DiagnosticArray, queue_size=10)
+
+        def publish(event):
+            self.close_period()
+            msg = DiagnosticArray()
+            msg.header.stamp = rospy.Time.now()
+            for topic, s in self.snapshot().items():
+                status = DiagnosticStatus()
+                status.level = DiagnosticStatus.WARN if s['drops'] or s['errors'] else DiagnosticStatus.OK
+                status.name = '%s: %s' % (self.name, topic)
+                status.hardware_id = self.name
+                status.message = '%.1f Hz, p99 %.0f us' % (s['rate_hz'], s['latency_p99_us'])
+                status.values = [KeyValue(key=k, value='%.3f' % v if isinstance(v, float) else str(v))
+                                 for k, v in s.items()]
+                msg.status.append(status)
+            pub.publish(msg)
+
+        def shutdown():
+            for line in self.format_report():
+                rospy.loginfo(line)
+            if metrics_file:
+                try:
+                    self.dump(metrics_file)
+                    rospy.loginfo("Metrics written to %s" % metrics_file)
+                except IOError as e:
+                    rospy.logwarn("Failed to write metrics: %s" % e)
+
+        self.timer = rospy.Timer(rospy.Duration(period), publish)
+        rospy.on_shutdown(shutdown)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+可视化路径缓冲 - 固定容量环形缓冲 + 按空间距离抽稀 + 发布限频
+
+位姿逐帧加入（O(1)，满了自动丢弃最旧的），路径只在到达发布间隔且有新位姿时才整体发布，
+RViz的序列化/带宽开销从"每帧整条路径"降到"每秒rate条路径"。与ROS无关，
+节点只需在 should_publish 为真时把 poses() 填进 nav_msgs/Path。
+"""
+
+from collections import deque
+
+DEFAULT_CAPACITY = 1000
+DEFAULT_RATE = 10.0          # Hz，<=0 表示每帧发布（原行为）
+DEFAULT_MIN_DISTANCE = 0.0   # m，相邻保留位姿的最小间距，0为不抽稀
+
+
+class PathBuffer:
+    def __init__(self, capacity=DEFAULT_CAPACITY, rate=DEFAULT_RATE, min_distance=DEFAULT_MIN_DISTANCE):
+        self.buffer = deque(maxlen=int(capacity))
+        self.period = 1.0 / rate if rate > 0 else 0.0
+        self.min_distance2 = float(min_distance) ** 2
+        self.last_kept = None
+        self.last_publish = None
+        self.dirty = False
+
+    def add(self, pose, x, y, z):
+        """加入一个位姿（x, y, z为其位置），返回是否被保留"""
+        if self.min_distance2 > 0.0 and self.last_kept is not None:
+            lx, ly, lz = self.last_kept
+            dx, dy, dz = x - lx, y - ly, z - lz
+            if dx * dx + dy * dy + dz * dz < self.min_distance2:
+                return False
+        self.buffer.append(pose)
+        self.last_kept = (x, y, z)
+        self.dirty = True
+        return True
+
+    def should_publish(self, stamp):
+        """
+        到达发布间隔（按消息时间戳，回放加速/仿真时间下同样适用）且有新位姿时返回True，并记为已发布
+        时间戳回退（bag重新播放）时立即发布
+        """
+        if not self.dirty:
+            return False
+        if (self.last_publish is not None and self.last_publish <= stamp
+                and stamp - self.last_publish < self.period):
+            return False
+        self.last_publish = stamp
+        self.dirty = False
+        return True
+
+    def poses(self):
+        """当前路径（按时间顺序的列表）"""
+        return list(self.buffer)
+
+    def __len__(self):
+        return len(self.buffer)
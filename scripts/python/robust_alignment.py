@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+鲁棒轨迹对齐 - 抵抗UWB跳变、VIO重置等离群点
+
+1. 初值：批量最小样本假设（每个假设3个点对），所有假设的Umeyama解用
+   堆叠的3x3 SVD一次求出，再在一组随机点上一次性计算 (K, M) 残差矩阵，
+   取残差中位数最小的假设（LMedS，无需阈值）
+2. 迭代重加权 (IRLS)：按Huber或Cauchy权重做加权Umeyama，残差尺度用MAD估计。
+   点数多时先在随机子集上迭代到收敛，再在全部点上只做一遍加权精化：
+   沿用子集的残差尺度，逐块计算残差、权重并累加加权统计量，最后一遍残差用于判定内点
+
+全量数据只遍历两次，10^6 点上总代价约为普通Umeyama的3倍
+（其余为与N无关的初值假设和子集迭代）。
+"""
+
+import numpy as np
+
+from umeyama import UmeyamaAccumulator
+
+# 批量假设数量和评分用的点数
+N_HYPOTHESES = 256
+N_SCORE_POINTS = 2000
+
+# 损失函数参数（以MAD尺度为单位，取常用的95%效率值）
+HUBER_K = 1.345
+CAUCHY_C = 2.385
+
+MAX_ITERATIONS = 20
+CONVERGENCE_TOL = 1e-9
+
+# 粗迭代使用的子集大小
+N_COARSE_POINTS = 50000
+
+# 每块处理的点数
+ROBUST_CHUNK_SIZE = 65536
+
+
+def _batched_umeyama(x, y, with_scale=False):
+    """
+    批量Umeyama: x, y (K, m, 3) -> s (K,), R (K, 3, 3), t (K, 3)
+    """
+    mx = x.mean(1)
+    my = y.mean(1)
+    xc = x - mx[:, None, :]
+    yc = y - my[:, None, :]
+    Sxy = np.matmul(yc.transpose(0, 2, 1), xc) / x.shape[1]
+
+    U, D, Vt = np.linalg.svd(Sxy)
+    S = np.ones((len(x), 3))
+    S[np.linalg.det(U) * np.linalg.det(Vt) < 0, 2] = -1
+    R = np.matmul(U * S[:, None, :], Vt)
+
+    if with_scale:
+        sx = np.mean(np.sum(xc**2, axis=2), axis=1)
+        s = np.sum(D * S, axis=1) / np.maximum(sx, 1e-12)
+    else:
+        s = np.ones(len(x))
+    t = my - s[:, None] * np.einsum('kij,kj->ki', R, mx)
+    return s, R, t
+
+
+def _residuals(x, y, s, R, t):
+    """|y - (s R x + t)| (N,)"""
+    d = x @ (s * R).T
+    d += t
+    d -= y
+    return np.sqrt(np.einsum('ij,ij->i', d, d))
+
+
+def _robust_weights(r, sigma, loss):
+    if loss == 'huber':
+        k = HUBER_K * sigma
+        return np.where(r <= k, 1.0, k / np.maximum(r, 1e-12))
+    if loss == 'cauchy':
+        return 1.0 / (1.0 + (r / (CAUCHY_C * sigma))**2)
+    raise ValueError(f"未知的损失函数: {loss}")
+
+
+def _mad_sigma(r):
+    """残差的鲁棒尺度（残差为非负距离，用中位数估计）"""
+    return max(1.4826 * np.median(r), 1e-9)
+
+
+def initial_hypothesis(x, y, with_scale=False, n_hypotheses=N_HYPOTHESES,
+                       n_score=N_SCORE_POINTS, seed=0):
+    """批量最小样本假设 + LMedS评分，返回 (s, R, t)"""
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    samples = rng.integers(0, n, size=(n_hypotheses, 3))
+    s, R, t = _batched_umeyama(x[samples], y[samples], with_scale)
+
+    # 所有假设在同一组点上一次性评分
+    idx = rng.choice(n, size=min(n, n_score), replace=False)
+    xs, ys = x[idx], y[idx]
+    pred = s[:, None, None] * np.einsum('kij,mj->kmi', R, xs) + t[:, None, :]
+    res = np.linalg.norm(ys[None, :, :] - pred, axis=2)
+    res[~np.isfinite(res)] = np.inf
+    best = int(np.argmin(np.median(res, axis=1)))
+    return s[best], R[best], t[best]
+
+
+def _irls(x, y, s, R, t, loss, with_scale, max_iterations, chunk_size):
+    """从初值 (s, R, t) 开始迭代重加权，返回 (s, R, t, 残差)"""
+    n = len(x)
+    r = _residuals(x, y, s, R, t)
+    for _ in range(max_iterations):
+        w = _robust_weights(r, _mad_sigma(r), loss)
+
+        acc = UmeyamaAccumulator()
+        for start in range(0, n, chunk_size):
+            sl = slice(start, start + chunk_size)
+            acc.update(x[sl], y[sl], w[sl])
+        s_new, R_new, t_new = acc.solve(with_scale)
+
+        change = np.abs(R_new - R).max() + np.abs(t_new - t).max() + abs(s_new - s)
+        s, R, t = s_new, R_new, t_new
+        r = _residuals(x, y, s, R, t)
+        if change < CONVERGENCE_TOL:
+            break
+    return s, R, t, r
+
+
+def _refine(x, y, s, R, t, sigma, loss, with_scale, chunk_size):
+    """全量单遍加权精化：固定残差尺度sigma，逐块计算权重并累加，求解一次"""
+    acc = UmeyamaAccumulator()
+    for start in range(0, len(x), chunk_size):
+        xs, ys = x[start:start + chunk_size], y[start:start + chunk_size]
+        acc.update(xs, ys, _robust_weights(_residuals(xs, ys, s, R, t), sigma, loss))
+    return acc.solve(with_scale)
+
+
+def robust_umeyama(x, y, loss='huber', with_scale=False, max_iterations=MAX_ITERATIONS,
+                   chunk_size=ROBUST_CHUNK_SIZE):
+    """
+    鲁棒Umeyama对齐
+    x: 源点 (N, 3)，y: 目标点 (N, 3)，使 y ≈ s R x + t
+    loss: 'huber' / 'cauchy'
+    返回 (s, R, t, inliers)，inliers 为布尔数组（残差在损失函数阈值内）
+    """
+    if loss not in ('huber', 'cauchy'):
+        raise ValueError(f"未知的损失函数: {loss}")
+    n = len(x)
+    if n < 3:
+        acc = UmeyamaAccumulator()
+        acc.update(x, y)
+        s, R, t = acc.solve(with_scale)
+        return s, R, t, np.ones(n, dtype=bool)
+
+    s, R, t = initial_hypothesis(x, y, with_scale)
+
+    if n > N_COARSE_POINTS:
+        # 子集上迭代到收敛，全量上单遍精化
+        idx = np.sort(np.random.default_rng(1).choice(n, size=N_COARSE_POINTS, replace=False))
+        s, R, t, r = _irls(x[idx], y[idx], s, R, t, loss, with_scale, max_iterations, chunk_size)
+        sigma = _mad_sigma(r)
+        s, R, t = _refine(x, y, s, R, t, sigma, loss, with_scale, chunk_size)
+        r = _residuals(x, y, s, R, t)
+    else:
+        s, R, t, r = _irls(x, y, s, R, t, loss, with_scale, max_iterations, chunk_size)
+        sigma = _mad_sigma(r)
+
+    threshold = (HUBER_K if loss == 'huber' else CAUCHY_C) * sigma
+    return s, R, t, r <= threshold
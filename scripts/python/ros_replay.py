@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+节点回放工具 - 不需要roscore，把录制的消息直接送进节点类的回调，按CPU速度运行
+
+节点类在 rospy_standin 的本地话题图中创建（Publisher/Subscriber/Timer/参数与真实rospy用法相同），
+输入消息按时间顺序逐条调用订阅回调，时钟为消息的记录时刻（相当于 rosbag play --clock，
+但不等待）。节点的输出可保存为文本，也可与参考文件比较（回调回归测试）。
+
+输入:
+    --bag FILE        bag中节点订阅的全部话题（需要rosbag）
+    --imu FILE        IMU文本/CSV（EuRoC列顺序），发布到 --imu-topic
+    --poses FILE      轨迹文件（TUM/EuRoC/VINS），作为PoseStamped发布到 --pose-topic
+
+用法:
+    python3 ros_replay.py imu_to_pose --imu imu0/data.csv --save /imu_pose=imu_pose.txt _path_rate:=0
+    python3 ros_replay.py imu_to_pose uwb_to_range --bag recording.bag --json replay.json
+    python3 ros_replay.py uwb_to_range --poses uwb.txt --expect /uwb/corrected_range=ranges_ref.txt
+"""
+
+import argparse
+import ast
+import copy
+import heapq
+import importlib
+import json
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from node_metrics import LatencyHistogram
+from rospy_standin import LocalGraph, message_class
+
+NODES = {
+    'imu_to_pose': 'imu_to_pose_converter:IMUToPoseConverter',
+    'uwb_to_range': 'uwb_pose_to_range_converter:UWBPoseToRangeConverter',
+}
+
+# 回放时默认不写节点的统计JSON（可用 _metrics_file:=... 打开）
+DEFAULT_PARAMS = {'~metrics_file': ''}
+
+
+class ReplayHarness:
+    """
+    本地话题图 + 回放
+    capture: 需要保存输出的话题集合，'all' 为全部；其余话题只计数
+             可转为数值行的消息（见 message_row）在发布时即转换，其余保存深拷贝
+    """
+
+    def __init__(self, params=None, capture=(), verbose=False):
+        merged = dict(DEFAULT_PARAMS)
+        merged.update(params or {})
+        self.graph = LocalGraph(merged, sink=self._capture, log=self._log if verbose else None)
+        self.capture = capture
+        self.outputs = {}
+        self.output_counts = Counter()
+        self.dispatch = {}
+        self.nodes = []
+        self.fed = 0
+        self.wall_time = 0.0
+        self.callback_time = 0.0
+        self._capture_time = 0.0
+        self.t_first = None
+        self.t_last = None
+        self._installed = None
+
+    def __enter__(self):
+        self._installed = self.graph.installed()
+        self._installed.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self.graph.shutdown()
+        return self._installed.__exit__(*exc)
+
+    def _log(self, level, msg):
+        print(f"[{level}] [{self.graph.time:.3f}] {msg}")
+
+    def _capture(self, topic, msg):
+        # 捕获在回调内部发生，其耗时从回调计时中扣除
+        start = time.perf_counter()
+        self.output_counts[topic] += 1
+        if self.capture == 'all' or topic in self.capture:
+            try:
+                item = message_row(self.graph.time, msg)
+            except TypeError:
+                item = copy.deepcopy(msg)
+            self.outputs.setdefault(topic, []).append(item)
+        self._capture_time += time.perf_counter() - start
+
+    def load_node(self, spec):
+        """创建节点: NODES中的别名或 'module:Class'"""
+        module_name, class_name = NODES.get(spec, spec).split(':')
+        sys.modules.pop(module_name, None)   # 确保节点模块绑定到替身rospy
+        module = importlib.import_module(module_name)
+        node = getattr(module, class_name)()
+        self.nodes.append(node)
+        return node
+
+    @property
+    def input_topics(self):
+        return sorted(self.graph.subscribers)
+
+    def feed(self, topic, msg, t):
+        """时钟推进到t（触发到期的Timer），调用该话题的全部订阅回调"""
+        self.graph.advance(t)
+        subs = self.graph.subscribers.get(topic)
+        if not subs:
+            return
+        hist = self.dispatch.get(topic)
+        if hist is None:
+            hist = self.dispatch[topic] = LatencyHistogram()
+        perf = time.perf_counter
+        for sub in subs:
+            captured = self._capture_time
+            start = perf()
+            sub.callback(msg)
+            elapsed = perf() - start - (self._capture_time - captured)
+            hist.record(elapsed)
+            self.callback_time += elapsed
+        self.fed += 1
+        if self.t_first is None:
+            self.t_first = t
+        self.t_last = t
+
+    def replay(self, messages):
+        """messages: 按时间排序的 (topic, msg, t)"""
+        start = time.perf_counter()
+        for topic, msg, t in messages:
+            self.feed(topic, msg, t)
+        self.graph.shutdown()
+        self.wall_time = time.perf_counter() - start
+
+    def report(self):
+        duration = (self.t_last - self.t_first) if self.fed else 0.0
+        return {
+            'messages': self.fed,
+            'data_duration_s': duration,
+            'wall_time_s': self.wall_time,
+            'callback_time_s': self.callback_time,
+            'messages_per_s': self.fed / self.wall_time if self.wall_time > 0 else 0.0,
+            'speedup': duration / self.wall_time if self.wall_time > 0 else 0.0,
+            'callbacks': {
+                topic: {'count': h.count, 'mean_us': h.mean * 1e6, 'p50_us': h.percentile(50) * 1e6,
+                        'p99_us': h.percentile(99) * 1e6, 'max_us': h.max * 1e6}
+                for topic, h in self.dispatch.items()},
+            'outputs': dict(self.output_counts),
+        }
+
+
+# ============ 输入 ============
+
+def bag_messages(filename, topics):
+    import rosbag
+
+    with rosbag.Bag(filename) as bag:
+        for topic, msg, t in bag.read_messages(topics=topics):
+            yield topic, msg, t.to_sec()
+
+
+def _stamp_factory():
+    # 真实消息包为 genpy.Time，替身为 rospy_standin.Time
+    return type(message_class('std_msgs/Header')().stamp).from_sec
+
+
+def imu_text_messages(filename, topic, accel_first=False):
+    from imu_dead_reckoning import load_imu_text
+
+    t, acc, gyro = load_imu_text(filename, accel_first)
+    Imu = message_class('sensor_msgs/Imu')
+    stamp = _stamp_factory()
+    for i in range(len(t)):
+        msg = Imu()
+        msg.header.stamp = stamp(t[i])
+        msg.header.seq = i + 1
+        a, g = msg.linear_acceleration, msg.angular_velocity
+        a.x, a.y, a.z = acc[i]
+        g.x, g.y, g.z = gyro[i]
+        yield topic, msg, float(t[i])
+
+
+def pose_text_messages(filename, topic, frame_id='world'):
+    from trajectory_io import load_trajectory
+
+    traj = load_trajectory(filename)
+    PoseStamped = message_class('geometry_msgs/PoseStamped')
+    stamp = _stamp_factory()
+    for i, row in enumerate(traj):
+        msg = PoseStamped()
+        msg.header.stamp = stamp(row[0])
+        msg.header.seq = i + 1
+        msg.header.frame_id = frame_id
+        p, q = msg.pose.position, msg.pose.orientation
+        p.x, p.y, p.z = row[1:4]
+        q.x, q.y, q.z, q.w = row[4:8]
+        yield topic, msg, float(row[0])
+
+
+# ============ 输出 ============
+
+def message_row(t, msg):
+    """输出消息转为一行数值（PoseStamped为TUM格式）"""
+    stamp = msg.header.stamp.to_sec() if hasattr(msg, 'header') else t
+    if hasattr(msg, 'pose'):
+        p, q = msg.pose.position, msg.pose.orientation
+        return [stamp, p.x, p.y, p.z, q.x, q.y, q.z, q.w]
+    if hasattr(msg, 'point'):
+        p = msg.point
+        return [stamp, p.x, p.y, p.z]
+    if hasattr(msg, 'data') and not isinstance(msg.data, (bytes, str)):
+        return [stamp] + list(msg.data)
+    raise TypeError(f"无法转换为数值行的消息类型: {type(msg).__name__}")
+
+
+def output_array(harness, topic):
+    """捕获的输出（已转为数值行）"""
+    rows = harness.outputs.get(topic, [])
+    if rows and not isinstance(rows[0], list):
+        raise TypeError(f"{topic} 的消息类型无法保存为数值")
+    return np.array(rows, dtype=float)
+
+
+def parse_topic_file(items, flag):
+    out = {}
+    for item in items or []:
+        topic, sep, filename = item.partition('=')
+        if not sep:
+            raise SystemExit(f"❌ {flag} 格式应为 TOPIC=FILE: {item}")
+        out[topic] = filename
+    return out
+
+
+def parse_ros_params(argv):
+    """rosrun风格参数: _name:=value（私有）或 name:=value"""
+    params = {}
+    for arg in argv:
+        name, sep, value = arg.partition(':=')
+        if not sep:
+            raise SystemExit(f"❌ 无法识别的参数: {arg}")
+        if value.lower() in ('true', 'false'):
+            parsed = value.lower() == 'true'
+        else:
+            try:
+                parsed = ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                parsed = value
+        params['~' + name[1:] if name.startswith('_') else name] = parsed
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(description='节点回放（不需要roscore，按CPU速度运行）')
+    parser.add_argument('nodes', nargs='+', help=f"节点: {', '.join(NODES)} 或 module:Class")
+    parser.add_argument('--bag', default=None, help='输入bag（节点订阅的全部话题）')
+    parser.add_argument('--imu', default=None, help='IMU文本/CSV')
+    parser.add_argument('--imu-topic', default='/synced/imu', help='--imu 的发布话题')
+    parser.add_argument('--accel-first', action='store_true', help='IMU文本列顺序为 t, a, w')
+    parser.add_argument('--poses', default=None, help='轨迹文件，作为PoseStamped发布')
+    parser.add_argument('--pose-topic', default='/uwb/pose', help='--poses 的发布话题')
+    parser.add_argument('--save', action='append', metavar='TOPIC=FILE', help='保存输出话题（可重复）')
+    parser.add_argument('--expect', action='append', metavar='TOPIC=FILE', help='与参考输出比较（可重复）')
+    parser.add_argument('--tolerance', type=float, default=1e-8, help='--expect 的绝对误差容限')
+    parser.add_argument('--json', default=None, help='保存回放统计')
+    parser.add_argument('-v', '--verbose', action='store_true', help='打印节点日志')
+    args, extra = parser.parse_known_args()
+
+    save = parse_topic_file(args.save, '--save')
+    expect = parse_topic_file(args.expect, '--expect')
+    params = parse_ros_params(extra)
+    if not (args.bag or args.imu or args.poses):
+        parser.error('需要 --bag、--imu 或 --poses')
+
+    with ReplayHarness(params, capture=set(save) | set(expect), verbose=args.verbose) as harness:
+        for spec in args.nodes:
+            harness.load_node(spec)
+        print(f"🔌 {len(harness.nodes)} 个节点, 订阅: {', '.join(harness.input_topics)}")
+
+        sources = []
+        if args.bag:
+            sources.append(bag_messages(args.bag, harness.input_topics))
+        if args.imu:
+            sources.append(imu_text_messages(args.imu, args.imu_topic, args.accel_first))
+        if args.poses:
+            sources.append(pose_text_messages(args.poses, args.pose_topic))
+        messages = sources[0] if len(sources) == 1 else heapq.merge(*sources, key=lambda m: m[2])
+        harness.replay(messages)
+
+    report = harness.report()
+    print(f"✅ {report['messages']} 条消息, 数据时长 {report['data_duration_s']:.1f}s, "
+          f"用时 {report['wall_time_s']:.2f}s ({report['messages_per_s']:.0f} msg/s, "
+          f"{report['speedup']:.0f}x 实时)")
+    print(f"  {'topic':<28}{'count':>9}{'mean':>9}{'p50':>9}{'p99':>9}{'max':>9}  (us)")
+    for topic, c in report['callbacks'].items():
+        print(f"  {topic:<28}{c['count']:>9}{c['mean_us']:>9.1f}{c['p50_us']:>9.1f}"
+              f"{c['p99_us']:>9.1f}{c['max_us']:>9.1f}")
+    print("  输出: " + ', '.join(f"{topic} ×{n}" for topic, n in sorted(report['outputs'].items())))
+
+    for topic, filename in save.items():
+        np.savetxt(filename, output_array(harness, topic), fmt='%.9f')
+        print(f"💾 {topic} -> {filename}")
+
+    failed = False
+    for topic, filename in expect.items():
+        actual = output_array(harness, topic)
+        reference = np.loadtxt(filename, ndmin=2)
+        if actual.shape != reference.shape:
+            print(f"❌ {topic}: 形状 {actual.shape} != 参考 {reference.shape}")
+            failed = True
+            continue
+        err = float(np.max(np.abs(actual - reference))) if actual.size else 0.0
+        ok = err <= args.tolerance
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {topic}: 最大误差 {err:.3e} (容限 {args.tolerance:g})")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 统计已写入: {args.json}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+rospy 本地替身 - 不需要roscore，发布/订阅在进程内直接调用
+
+提供节点类用到的 rospy 接口子集（init_node / get_param / Publisher / Subscriber / Timer /
+on_shutdown / get_published_topics / Time / 日志），以及常用消息包的轻量替身（std_msgs、geometry_msgs、sensor_msgs、
+nav_msgs、diagnostic_msgs）。已安装真实消息包时优先使用真实消息类。
+
+时钟为仿真时间：由 LocalGraph.advance 推进（回放时为bag记录时刻），
+时钟越过触发时刻的 Timer 在推进时依次调用，与 rosbag play --clock 的行为一致。
+
+    graph = LocalGraph(params={'~path_rate': 0.0})
+    with graph.installed():
+        module = importlib.import_module('imu_to_pose_converter')
+        node = module.IMUToPoseConverter()
+    graph.publish('/synced/imu', msg)
+"""
+
+import contextlib
+import importlib
+import math
+import sys
+import types
+
+PARAM_NOT_SET = object()
+
+
+# ============ 时间 ============
+
+class Time:
+    """rospy.Time 替身（也用作 Duration）"""
+    __slots__ = ('secs', 'nsecs')
+
+    def __init__(self, secs=0, nsecs=0):
+        # 与genpy相同，secs可以是浮点数（rospy.Duration(0.01)）
+        total = int(round(secs * 1000000000)) + int(nsecs) if isinstance(secs, float) else \
+            int(secs) * 1000000000 + int(nsecs)
+        self.secs, self.nsecs = divmod(total, 1000000000)
+
+    @classmethod
+    def from_sec(cls, sec):
+        total = int(round(sec * 1e9))
+        return cls(0, total)
+
+    def to_sec(self):
+        return self.secs + self.nsecs * 1e-9
+
+    def to_nsec(self):
+        return self.secs * 1000000000 + self.nsecs
+
+    def is_zero(self):
+        return self.secs == 0 and self.nsecs == 0
+
+    def __add__(self, other):
+        return type(self)(0, self.to_nsec() + other.to_nsec())
+
+    def __sub__(self, other):
+        return type(self)(0, self.to_nsec() - other.to_nsec())
+
+    def __lt__(self, other):
+        return self.to_nsec() < other.to_nsec()
+
+    def __le__(self, other):
+        return self.to_nsec() <= other.to_nsec()
+
+    def __eq__(self, other):
+        return isinstance(other, Time) and self.to_nsec() == other.to_nsec()
+
+    def __hash__(self):
+        return hash(self.to_nsec())
+
+    def __repr__(self):
+        return f"Time({self.secs}, {self.nsecs})"
+
+
+Duration = Time
+
+
+# ============ 消息替身 ============
+
+class Message:
+    """字段按 _fields 初始化；支持 genpy 风格的关键字构造"""
+    _fields = ()
+    _type = ''
+
+    def __init__(self, **kwargs):
+        for name, default in self._fields:
+            setattr(self, name, kwargs.pop(name) if name in kwargs else default())
+        if kwargs:
+            raise TypeError(f"{self._type} 没有字段: {', '.join(kwargs)}")
+
+    def __repr__(self):
+        return f"{self._type}({', '.join(f'{n}={getattr(self, n)!r}' for n, _ in self._fields)})"
+
+
+def _message(type_name, fields, **constants):
+    cls = type(type_name.split('/')[1], (Message,), dict(constants, _type=type_name, _fields=tuple(fields),
+                                                          __slots__=tuple(n for n, _ in fields)))
+    cls._has_header = any(n == 'header' for n, _ in fields)
+    return cls
+
+
+def _zero():
+    return 0
+
+
+def _zero_f():
+    return 0.0
+
+
+def _empty_str():
+    return ''
+
+
+def _empty_list():
+    return []
+
+
+def _cov9():
+    return [0.0] * 9
+
+
+Header = _message('std_msgs/Header', [('seq', _zero), ('stamp', Time), ('frame_id', _empty_str)])
+String = _message('std_msgs/String', [('data', _empty_str)])
+MultiArrayDimension = _message('std_msgs/MultiArrayDimension',
+                               [('label', _empty_str), ('size', _zero), ('stride', _zero)])
+MultiArrayLayout = _message('std_msgs/MultiArrayLayout', [('dim', _empty_list), ('data_offset', _zero)])
+Float64MultiArray = _message('std_msgs/Float64MultiArray', [('layout', MultiArrayLayout), ('data', _empty_list)])
+
+Point = _message('geometry_msgs/Point', [('x', _zero_f), ('y', _zero_f), ('z', _zero_f)])
+Vector3 = _message('geometry_msgs/Vector3', [('x', _zero_f), ('y', _zero_f), ('z', _zero_f)])
+Quaternion = _message('geometry_msgs/Quaternion', [('x', _zero_f), ('y', _zero_f), ('z', _zero_f), ('w', _zero_f)])
+Pose = _message('geometry_msgs/Pose', [('position', Point), ('orientation', Quaternion)])
+PoseStamped = _message('geometry_msgs/PoseStamped', [('header', Header), ('pose', Pose)])
+PointStamped = _message('geometry_msgs/PointStamped', [('header', Header), ('point', Point)])
+
+Imu = _message('sensor_msgs/Imu', [
+    ('header', Header), ('orientation', Quaternion), ('orientation_covariance', _cov9),
+    ('angular_velocity', Vector3), ('angular_velocity_covariance', _cov9),
+    ('linear_acceleration', Vector3), ('linear_acceleration_covariance', _cov9)])
+Image = _message('sensor_msgs/Image', [
+    ('header', Header), ('height', _zero), ('width', _zero), ('encoding', _empty_str),
+    ('is_bigendian', _zero), ('step', _zero), ('data', bytes)])
+CameraInfo = _message('sensor_msgs/CameraInfo', [
+    ('header', Header), ('height', _zero), ('width', _zero), ('distortion_model', _empty_str),
+    ('D', _empty_list), ('K', _cov9), ('R', _cov9), ('P', lambda: [0.0] * 12)])
+PointCloud2 = _message('sensor_msgs/PointCloud2', [
+    ('header', Header), ('height', _zero), ('width', _zero), ('fields', _empty_list),
+    ('is_bigendian', bool), ('point_step', _zero), ('row_step', _zero), ('data', bytes), ('is_dense', bool)])
+
+Path = _message('nav_msgs/Path', [('header', Header), ('poses', _empty_list)])
+
+KeyValue = _message('diagnostic_msgs/KeyValue', [('key', _empty_str), ('value', _empty_str)])
+DiagnosticStatus = _message('diagnostic_msgs/DiagnosticStatus', [
+    ('level', _zero), ('name', _empty_str), ('message', _empty_str), ('hardware_id', _empty_str),
+    ('values', _empty_list)], OK=0, WARN=1, ERROR=2, STALE=3)
+DiagnosticArray = _message('diagnostic_msgs/DiagnosticArray', [('header', Header), ('status', _empty_list)])
+
+MESSAGE_PACKAGES = {
+    'std_msgs': (Header, String, MultiArrayDimension, MultiArrayLayout, Float64MultiArray),
+    'geometry_msgs': (Point, Vector3, Quaternion, Pose, PoseStamped, PointStamped),
+    'sensor_msgs': (Imu, Image, CameraInfo, PointCloud2),
+    'nav_msgs': (Path,),
+    'diagnostic_msgs': (KeyValue, DiagnosticStatus, DiagnosticArray),
+}
+
+
+class AnyMsg:
+    """
+    rospy.AnyMsg 替身：本地图中直接转交原消息对象；
+    转发原始字节时发布 AnyMsg(buff, {'type', 'message_definition'})，与rospy收到的相同
+    """
+    _type = '*'
+
+    def __init__(self, buff=b'', connection_header=None):
+        self._buff = buff
+        self._connection_header = connection_header or {}
+
+
+class ROSInterruptException(Exception):
+    pass
+
+
+# ============ 本地话题图 ============
+
+class LocalPublisher:
+    def __init__(self, graph, topic, data_class, queue_size=None, latch=False, **kwargs):
+        self.graph = graph
+        self.name = graph.resolve(topic)
+        self.data_class = data_class
+        self.seq = 0
+        graph.publishers.setdefault(self.name, []).append(self)
+
+    def publish(self, msg):
+        # 与rospy序列化时相同：带header的消息由发布端填入递增的seq
+        header = getattr(msg, 'header', None)
+        if header is not None:
+            self.seq += 1
+            header.seq = self.seq
+        self.graph.publish(self.name, msg)
+
+    def get_num_connections(self):
+        return len(self.graph.subscribers.get(self.name, ()))
+
+    def unregister(self):
+        self.graph.publishers[self.name].remove(self)
+
+
+class LocalSubscriber:
+    def __init__(self, graph, topic, data_class, callback=None, callback_args=None, queue_size=None, **kwargs):
+        self.graph = graph
+        self.name = graph.resolve(topic)
+        self.data_class = data_class
+        if callback_args is None:
+            self.callback = callback
+        else:
+            self.callback = lambda msg: callback(msg, callback_args)
+        graph.subscribers.setdefault(self.name, []).append(self)
+
+    def unregister(self):
+        self.graph.subscribers[self.name].remove(self)
+
+
+class LocalTimer:
+    def __init__(self, graph, period, callback, oneshot=False, **kwargs):
+        self.graph = graph
+        self.period = period.to_sec()
+        self.callback = callback
+        self.oneshot = oneshot
+        self.next_fire = graph.time + self.period
+        graph.timers.append(self)
+
+    def shutdown(self):
+        if self in self.graph.timers:
+            self.graph.timers.remove(self)
+
+
+class LocalGraph:
+    """
+    进程内话题图
+    params: 参数字典，键为 '~name'（私有）或全局名
+    sink(topic, msg): 每条发布到本地图的消息都会调用（回放工具用来捕获输出）
+    """
+
+    def __init__(self, params=None, sink=None, log=None):
+        self.params = dict(params or {})
+        self.sink = sink
+        self.log = log
+        self.subscribers = {}
+        self.publishers = {}
+        self.timers = []
+        self.shutdown_hooks = []
+        self.time = 0.0
+        self.started = False
+        self.node_names = []
+        self.is_shutdown = False
+        self.module = self._make_rospy()
+
+    def resolve(self, topic):
+        return topic if topic.startswith('/') else '/' + topic
+
+    # ---- 消息分发 ----
+    def publish(self, topic, msg):
+        if self.sink is not None:
+            self.sink(topic, msg)
+        for sub in self.subscribers.get(topic, ()):
+            sub.callback(msg)
+
+    def advance(self, t):
+        """推进时钟到t并触发到期的Timer"""
+        if not self.started:
+            # 第一条消息之前创建的Timer从该时刻开始计时
+            self.started = True
+            for timer in self.timers:
+                timer.next_fire = t + timer.period
+        if t < self.time:
+            self.time = t
+            return
+        while True:
+            due = [timer for timer in self.timers if timer.next_fire <= t]
+            if not due:
+                break
+            timer = min(due, key=lambda x: x.next_fire)
+            self.time = timer.next_fire
+            # 与rospy.Rate相同：落后超过一个周期时不补发，从当前时刻重新计时
+            timer.next_fire += timer.period
+            if timer.next_fire <= t - timer.period:
+                timer.next_fire = t + timer.period
+            if timer.oneshot:
+                timer.shutdown()
+            now = Time.from_sec(self.time)
+            timer.callback(types.SimpleNamespace(current_real=now, current_expected=now, last_real=None))
+        self.time = t
+
+    def shutdown(self, reason='replay finished'):
+        if self.is_shutdown:
+            return
+        self.is_shutdown = True
+        for hook in self.shutdown_hooks:
+            hook()
+
+    # ---- rospy 模块替身 ----
+    def _make_rospy(self):
+        graph = self
+        rospy = types.ModuleType('rospy')
+
+        class _Time(Time):
+            @classmethod
+            def now(cls):
+                return cls.from_sec(graph.time)
+
+        def init_node(name, anonymous=False, **kwargs):
+            graph.node_names.append('/' + name.lstrip('/'))
+
+        def get_name():
+            return graph.node_names[-1] if graph.node_names else '/unnamed'
+
+        def get_param(name, default=PARAM_NOT_SET):
+            if name in graph.params:
+                return graph.params[name]
+            if default is PARAM_NOT_SET:
+                raise KeyError(name)
+            return default
+
+        def get_published_topics(namespace='/'):
+            return [[topic, pubs[0].data_class._type] for topic, pubs in graph.publishers.items()
+                    if pubs and topic.startswith(namespace)]
+
+        def _logger(level):
+            def log(msg, *args):
+                if graph.log is not None:
+                    graph.log(level, msg % args if args else msg)
+            return log
+
+        def _throttled(level):
+            log = _logger(level)
+            last = {}
+
+            def throttled(period, msg, *args):
+                # 与rospy相同，按调用位置限频（消息内容每次可以不同）
+                caller = sys._getframe(1)
+                key = (caller.f_code, caller.f_lineno)
+                if graph.time - last.get(key, -math.inf) >= period:
+                    last[key] = graph.time
+                    log(msg, *args)
+            return throttled
+
+        rospy.Time = _Time
+        rospy.Duration = Duration
+        rospy.AnyMsg = AnyMsg
+        rospy.ROSInterruptException = ROSInterruptException
+        rospy.init_node = init_node
+        rospy.get_name = get_name
+        rospy.get_param = get_param
+        rospy.has_param = lambda name: name in graph.params
+        rospy.set_param = graph.params.__setitem__
+        rospy.get_published_topics = get_published_topics
+        rospy.get_time = lambda: graph.time
+        rospy.get_rostime = lambda: _Time.from_sec(graph.time)
+        rospy.is_shutdown = lambda: graph.is_shutdown
+        rospy.on_shutdown = graph.shutdown_hooks.append
+        rospy.signal_shutdown = graph.shutdown
+        rospy.spin = lambda: None
+        rospy.sleep = lambda duration: None
+        rospy.Publisher = lambda *a, **k: LocalPublisher(graph, *a, **k)
+        rospy.Subscriber = lambda *a, **k: LocalSubscriber(graph, *a, **k)
+        rospy.Timer = lambda *a, **k: LocalTimer(graph, *a, **k)
+        for level in ('debug', 'info', 'warn', 'err', 'fatal'):
+            setattr(rospy, 'log' + level, _logger(level))
+            setattr(rospy, 'log' + level + '_throttle', _throttled(level))
+        rospy.logwarning = rospy.logwarn
+        return rospy
+
+    @contextlib.contextmanager
+    def installed(self):
+        """在 sys.modules 中安装 rospy 替身（消息包缺失时一并安装），退出时恢复"""
+        saved = {name: sys.modules.get(name) for name in ['rospy'] + [
+            f'{pkg}{suffix}' for pkg in MESSAGE_PACKAGES for suffix in ('', '.msg')]}
+        sys.modules['rospy'] = self.module
+        for pkg, classes in MESSAGE_PACKAGES.items():
+            try:
+                importlib.import_module(pkg + '.msg')
+            except ImportError:
+                package = types.ModuleType(pkg)
+                msg_module = types.ModuleType(pkg + '.msg')
+                for cls in classes:
+                    setattr(msg_module, cls.__name__, cls)
+                package.msg = msg_module
+                sys.modules[pkg] = package
+                sys.modules[pkg + '.msg'] = msg_module
+        try:
+            yield self.module
+        finally:
+            for name, module in saved.items():
+                if module is None:
+                    sys.modules.pop(name, None)
+                else:
+                    sys.modules[name] = module
+
+
+def message_class(type_name):
+    """按 'pkg/Type' 取消息类（已安装真实消息包时为真实类）"""
+    pkg, name = type_name.split('/')
+    return getattr(importlib.import_module(pkg + '.msg'), name)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+多传感器时间同步 - 时钟偏移/漂移在线估计 + 近似时间匹配
+
+不再用回调时刻的 rospy.Time.now() 覆盖时间戳（会把调度抖动写进数据，负载高时
+IMU和图像的先后顺序会错乱），而是保留传感器的硬件时间戳 header.stamp，估计它到
+本机时钟的映射：
+
+    到达时间 = 硬件时间 + 偏移(硬件时间) + 传输延迟,   传输延迟 >= 0
+
+偏移取每个桶（bucket 秒）内 (到达 - 硬件) 的最小值（延迟最小的消息），对最近
+window 秒的桶最小值做直线拟合得到偏移和漂移（skew），再把直线下移到最低点
+（下包络）。校正后的时间 = 硬件时间 + 偏移 - 固定延迟（~sync_latency，默认0），
+且不晚于到达时间；同一传感器内保持单调。硬件时钟跳变（设备重启）时估计重置。
+
+每个传感器一个按时间排序的缓冲（保留 horizon 秒），匹配用二分查找 O(log n)。
+输出经过延迟预算 max_latency：校正时间早于 (当前时间 - max_latency) 的消息按
+时间顺序依次发布，因此各话题之间的先后与时间戳一致；以枢轴传感器（图像）为准，
+在其余传感器中找最近且在 slop 内的消息组成一组。
+
+用法（ROS节点内）:
+    self.sync = RosSensorSync({'image': pub_image, 'imu': pub_imu, ...})
+    rospy.Subscriber('/livox/imu', Imu, lambda msg: self.sync.add('imu', msg))
+"""
+
+import bisect
+import heapq
+import math
+import threading
+from collections import deque
+
+DEFAULT_BUCKET = 1.0            # s，偏移取最小值的时间桶
+DEFAULT_WINDOW = 60.0           # s，偏移/漂移拟合窗口
+RESET_THRESHOLD = 1.0           # s，偏移突变超过该值视为时钟跳变
+DEFAULT_MAX_LATENCY = 0.1       # s，输出延迟预算
+DEFAULT_HORIZON = 2.0           # s，匹配缓冲保留时长
+MONOTONIC_EPS = 1e-6            # s
+POLL_PERIOD = 0.01              # s，ROS中定时释放输出
+
+# 传感器 -> 与图像匹配的最大时间差（秒）
+DEFAULT_SLOP = {
+    'image': 0.0,
+    'imu': 0.01,
+    'uwb': 0.05,
+    'lidar': 0.05,
+}
+
+
+class ClockOffsetEstimator:
+    """单个传感器硬件时钟到本机时钟的偏移与漂移（下包络直线拟合）"""
+
+    def __init__(self, bucket=DEFAULT_BUCKET, window=DEFAULT_WINDOW, reset_threshold=RESET_THRESHOLD):
+        self.bucket = bucket
+        self.reset_threshold = reset_threshold
+        self.points = deque(maxlen=max(2, int(window / bucket)))
+        self.resets = 0
+        self.count = 0
+        self._reset(None)
+
+    def _reset(self, hw):
+        self.points.clear()
+        self.t0 = hw
+        self.bucket_start = hw
+        self.bucket_min = math.inf
+        self.bucket_hw = hw
+        self.intercept = None
+        self.skew = 0.0
+
+    def offset(self, hw):
+        """硬件时间 hw 处的偏移估计（本机时间 - 硬件时间）"""
+        if self.intercept is None:
+            return self.bucket_min
+        return self.intercept + self.skew * (hw - self.t0)
+
+    def update(self, hw, arrival):
+        self.count += 1
+        offset = arrival - hw
+        if self.t0 is None:
+            self._reset(hw)
+        elif offset < self.offset(hw) - self.reset_threshold or hw < self.bucket_start - self.reset_threshold:
+            # 偏移骤降或硬件时间倒退：时钟跳变
+            self.resets += 1
+            self._reset(hw)
+
+        if offset < self.bucket_min:
+            self.bucket_min = offset
+            self.bucket_hw = hw
+        if hw - self.bucket_start >= self.bucket:
+            self._close_bucket(hw)
+
+    def _close_bucket(self, hw):
+        if self.intercept is not None and self.bucket_min > self.offset(self.bucket_hw) + self.reset_threshold:
+            # 整个桶的最小偏移都大幅升高：时钟向后跳变（而不是个别消息延迟）
+            self.resets += 1
+            bucket_min, bucket_hw = self.bucket_min, self.bucket_hw
+            self._reset(bucket_hw)
+            self.bucket_min = bucket_min
+        self.points.append((self.bucket_hw - self.t0, self.bucket_min))
+        self.bucket_start = hw
+        self.bucket_min = math.inf
+        self._fit()
+
+    def _fit(self):
+        n = len(self.points)
+        if n == 1:
+            self.intercept = self.points[0][1]
+            self.skew = 0.0
+            return
+        mx = sum(x for x, _ in self.points) / n
+        my = sum(y for _, y in self.points) / n
+        sxx = sum((x - mx) ** 2 for x, _ in self.points)
+        skew = sum((x - mx) * (y - my) for x, y in self.points) / sxx if sxx > 0 else 0.0
+        intercept = my - skew * mx
+        # 下移到最低的桶最小值，使直线为下包络
+        intercept += min(y - (intercept + skew * x) for x, y in self.points)
+        self.intercept, self.skew = intercept, skew
+
+    def correct(self, hw, arrival):
+        """硬件时间 -> 本机时间（不晚于到达时间）"""
+        t = hw + self.offset(hw)
+        return t if t < arrival else arrival
+
+
+class SensorBuffer:
+    """按时间排序的消息缓冲，保留最近 horizon 秒；nearest 二分查找"""
+
+    def __init__(self, horizon=DEFAULT_HORIZON):
+        self.horizon = horizon
+        self.times = []
+        self.msgs = []
+        self.start = 0
+
+    def push(self, t, msg):
+        self.times.append(t)
+        self.msgs.append(msg)
+        cutoff = t - self.horizon
+        times = self.times
+        while times[self.start] < cutoff:
+            self.start += 1
+        # 前部积累到一半以上时整体删除，均摊O(1)
+        if self.start > 256 and 2 * self.start > len(times):
+            del self.times[:self.start]
+            del self.msgs[:self.start]
+            self.start = 0
+
+    def __len__(self):
+        return len(self.times) - self.start
+
+    def nearest(self, t):
+        """距离 t 最近的 (时间, 消息)；缓冲为空时返回 None"""
+        times = self.times
+        i = bisect.bisect_left(times, t, self.start)
+        if i == len(times):
+            if i == self.start:
+                return None
+            i -= 1
+        elif i > self.start and t - times[i - 1] <= times[i] - t:
+            i -= 1
+        return times[i], self.msgs[i]
+
+
+class SensorStats:
+    def __init__(self):
+        self.count = 0
+        self.unstamped = 0
+        self.clamped = 0
+        self.late = 0
+        self.matched = 0
+        self.missed = 0
+
+
+class SensorSynchronizer:
+    """
+    sensors: {名称: {'slop': 秒, 'clock': 共用时钟的传感器名, 'latency': 固定延迟秒}}
+    on_output(name, t, msg): 按校正时间顺序输出
+    on_set(t, {name: (t, msg) 或 None}): 以 pivot 为准的匹配组
+    """
+
+    def __init__(self, sensors, on_output, pivot='image', on_set=None,
+                 max_latency=DEFAULT_MAX_LATENCY, horizon=DEFAULT_HORIZON,
+                 bucket=DEFAULT_BUCKET, window=DEFAULT_WINDOW):
+        self.config = {}
+        for name, cfg in sensors.items():
+            cfg = dict(cfg or {})
+            cfg.setdefault('slop', DEFAULT_SLOP.get(name, 0.02))
+            cfg.setdefault('clock', name)
+            cfg.setdefault('latency', 0.0)
+            self.config[name] = cfg
+        self.clocks = {cfg['clock']: ClockOffsetEstimator(bucket, window) for cfg in self.config.values()}
+        self.buffers = {name: SensorBuffer(horizon) for name in self.config}
+        self.stats = {name: SensorStats() for name in self.config}
+        self.last = {name: -math.inf for name in self.config}
+        self.on_output = on_output
+        self.on_set = on_set
+        self.pivot = pivot if pivot in self.config else None
+        self.max_latency = max_latency
+        self.outputs = []
+        self.pending = deque()
+        self.counter = 0
+        self.released = -math.inf
+
+    def add(self, name, msg, hw, arrival):
+        """加入一条消息（hw: 硬件时间戳，<=0表示无效；arrival: 本机到达时间），返回校正后的时间"""
+        cfg = self.config[name]
+        stats = self.stats[name]
+        stats.count += 1
+        if hw > 0:
+            clock = self.clocks[cfg['clock']]
+            if cfg['clock'] == name:
+                clock.update(hw, arrival)
+            t = clock.correct(hw, arrival)
+        else:
+            stats.unstamped += 1
+            t = arrival
+        t -= cfg['latency']
+        if t <= self.last[name]:
+            stats.clamped += 1
+            t = self.last[name] + MONOTONIC_EPS
+        self.last[name] = t
+
+        self.buffers[name].push(t, msg)
+        heapq.heappush(self.outputs, (t, self.counter, name, msg))
+        self.counter += 1
+        if name == self.pivot:
+            self.pending.append(t)
+        return t
+
+    def poll(self, now, flush=False):
+        """释放校正时间早于 now - max_latency 的输出，并匹配到期的枢轴消息"""
+        deadline = math.inf if flush else now - self.max_latency
+        outputs = self.outputs
+        while outputs and outputs[0][0] <= deadline:
+            t, _, name, msg = heapq.heappop(outputs)
+            if t < self.released:
+                self.stats[name].late += 1
+            else:
+                self.released = t
+            self.on_output(name, t, msg)
+        pending = self.pending
+        while pending and pending[0] <= deadline:
+            self._match(pending.popleft())
+
+    def _match(self, tp):
+        members = {}
+        for name, buffer in self.buffers.items():
+            hit = buffer.nearest(tp)
+            stats = self.stats[name]
+            if hit is not None and abs(hit[0] - tp) <= self.config[name]['slop']:
+                members[name] = hit
+                stats.matched += 1
+            else:
+                members[name] = None
+                stats.missed += 1
+        if self.on_set is not None:
+            self.on_set(tp, members)
+
+    def summary(self):
+        result = {}
+        for name, cfg in self.config.items():
+            clock = self.clocks[cfg['clock']]
+            s = self.stats[name]
+            result[name] = {
+                'count': s.count,
+                'offset_s': clock.offset(clock.bucket_hw) if clock.t0 is not None else None,
+                'skew_ppm': clock.skew * 1e6,
+                'clock_resets': clock.resets,
+                'unstamped': s.unstamped,
+                'clamped': s.clamped,
+                'late': s.late,
+                'matched': s.matched,
+                'missed': s.missed,
+            }
+        return result
+
+
+class RosSensorSync:
+    """
+    rospy封装：回调中调用 add(name, msg)，按校正时间改写 header.stamp 后由对应的发布器发布
+    参数: ~sync_max_latency, ~sync_slop（{传感器: 秒}）, ~sync_latency（{传感器: 秒}）
+    clocks: {传感器: 共用时钟的传感器}，例如相机信息使用图像的时钟
+    """
+
+    def __init__(self, publishers, pivot='image', clocks=None, on_set=None):
+        import rospy
+
+        self.rospy = rospy
+        self.publishers = publishers
+        slop = rospy.get_param('~sync_slop', {})
+        latency = rospy.get_param('~sync_latency', {})
+        clocks = clocks or {}
+        sensors = {}
+        for name in publishers:
+            cfg = {'clock': clocks.get(name, name)}
+            if name in slop:
+                cfg['slop'] = float(slop[name])
+            if name in latency:
+                cfg['latency'] = float(latency[name])
+            sensors[name] = cfg
+        self.lock = threading.Lock()
+        self.sync = SensorSynchronizer(sensors, self._publish, pivot=pivot, on_set=on_set,
+                                       max_latency=rospy.get_param('~sync_max_latency', DEFAULT_MAX_LATENCY))
+        self.timer = rospy.Timer(rospy.Duration(POLL_PERIOD), self._poll)
+
+    def add(self, name, msg, arrival=None):
+        """
+        加入一条消息，返回校正后的时间（秒）；消息在延迟预算到期后发布
+        arrival: 回调收到原始消息的时刻（经过预处理等延迟后再加入时传入），默认为当前时间
+        """
+        stamp = msg.header.stamp
+        now = self.rospy.get_time()
+        if arrival is None:
+            arrival = now
+        with self.lock:
+            t = self.sync.add(name, msg, stamp.secs + stamp.nsecs * 1e-9, arrival)
+            self.sync.poll(now)
+        return t
+
+    def _poll(self, event):
+        with self.lock:
+            self.sync.poll(self.rospy.get_time())
+
+    def _publish(self, name, t, msg):
+        msg.header.stamp = self.rospy.Time.from_sec(t)
+        self.publishers[name].publish(msg)
+
+    def summary(self):
+        with self.lock:
+            return self.sync.summary()
@@ -1,47 +1,632 @@
 #!/usr/bin/env python3
 """
-Simple ROS1 to ROS2 topic forwarder without ros1_bridge
-Works by reading ROS1 topics and republishing to ROS2
+ROS1 -> ROS2 话题转发（不需要编译 ros1_bridge）
+
+ROS1端用 rospy.AnyMsg 订阅，拿到序列化字节（_buff）和连接头中的消息定义。对一一
+对应的消息类型（std_msgs / geometry_msgs / sensor_msgs / nav_msgs 等，ROS2中除
+Header 去掉 seq 外字段相同），按消息定义把ROS1序列化字节直接改写为ROS2的CDR字节:
+补对齐填充、字符串加结尾0、丢弃 Header.seq；连续的定长字段和基本类型数组（图像/点云
+的 data）整块复制，不反序列化为Python对象。ROS2端由 rclpy 直接发布字节。
+
+每个话题一个有界队列（满时丢弃最旧的消息）：订阅回调只入队，转发线程在最早入队的
+消息等待满 batch_period 秒、或某个队列积累 batch_size 条时成批取出、转码、发布，
+IMU这类小而高频的消息不再每条唤醒一次线程（没有消息时不唤醒）；大消息
+（>= immediate_bytes，图像/点云）入队后立即唤醒转发线程。
+每个话题统计接收/转发/丢弃/错误、队列最大深度、批大小和排队延迟。
+
+传输可替换：TopicForwarder 只依赖 publisher 工厂，LocalSink 在进程内收集输出；
+Ros1Source 在 rospy_standin.LocalGraph 中同样可用（发布 AnyMsg(buff, 连接头)）。
+话题发现使用 ROS master 的 get_published_topics，不再调用 docker exec rostopic list。
+
+用法（容器内先 source noetic 再 source foxy）:
+    python3 simple_topic_forwarder.py --topics /livox/imu /usb_cam/image_raw
+    python3 simple_topic_forwarder.py --list
+    python3 simple_topic_forwarder.py --bag recording.bag      # 离线转码吞吐测试（不需要ROS2）
 """
 
-import subprocess
+import argparse
+import re
+import struct
 import sys
+import threading
 import time
-import json
+from collections import deque
+
+from node_metrics import LatencyHistogram
+
+ENCAPSULATION = b'\x00\x01\x00\x00'     # CDR 小端
+U32 = struct.Struct('<I')
+ZEROS = bytes(8)
+
+# ROS1基本类型 -> (CDR对齐, 字节数)；time/duration 对应 builtin_interfaces 的 (int32, uint32)
+PRIMITIVES = {
+    'bool': (1, 1), 'int8': (1, 1), 'uint8': (1, 1), 'byte': (1, 1), 'char': (1, 1),
+    'int16': (2, 2), 'uint16': (2, 2),
+    'int32': (4, 4), 'uint32': (4, 4), 'float32': (4, 4),
+    'int64': (8, 8), 'uint64': (8, 8), 'float64': (8, 8),
+    'time': (4, 8), 'duration': (4, 8),
+}
+# ROS2中字段与ROS1一一对应的消息包（Header 去掉 seq 单独处理）
+ONE_TO_ONE_PACKAGES = ('std_msgs', 'geometry_msgs', 'sensor_msgs', 'nav_msgs', 'diagnostic_msgs', 'tf2_msgs')
+# 上述包中ROS2没有的类型
+NOT_ONE_TO_ONE = ('std_msgs/Time', 'std_msgs/Duration')
+INTERNAL_TOPICS = ('/rosout', '/rosout_agg')
+
+DEFAULT_BATCH_PERIOD = 0.01     # s，小消息最多额外等待的时间
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_QUEUE_SIZE = 100
+IMMEDIATE_BYTES = 65536
+DISCOVERY_PERIOD = 2.0          # s
+REPORT_PERIOD = 30.0            # s
+SUBSCRIBER_BUFF_SIZE = 1 << 24  # rospy默认64KB，图像/点云需要多次读取
+
+
+# ============ 类型映射与转码 ============
+
+def ros2_type_name(type_name):
+    """'sensor_msgs/Imu' -> 'sensor_msgs/msg/Imu'"""
+    pkg, name = type_name.split('/')
+    return f'{pkg}/msg/{name}'
+
+
+def is_one_to_one(type_name):
+    return type_name.split('/')[0] in ONE_TO_ONE_PACKAGES and type_name not in NOT_ONE_TO_ONE
+
+
+def parse_definition(type_name, text):
+    """
+    ROS1完整消息定义（连接头 message_definition，依赖类型以 'MSG: pkg/Type' 分段）
+    -> {类型: [(字段类型, 数组长度)]}，数组长度 None 表示非数组，-1 表示变长
+    """
+    specs = {}
+    for section in re.split(r'^=+\s*$', text, flags=re.M):
+        name = type_name
+        fields = []
+        for line in section.splitlines():
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith('MSG:'):
+                name = line[4:].strip()
+                continue
+            field_type, rest = line.split(None, 1)
+            if '=' in rest:
+                continue    # 常量
+            fields.append(field_type)
+        specs[name] = [_resolve_field(field_type, name) for field_type in fields]
+    return specs
+
+
+def _resolve_field(field_type, owner):
+    match = re.match(r'^([\w/]+)(\[(\d*)\])?$', field_type)
+    if match is None:
+        raise ValueError(f"无法解析字段类型: {field_type}")
+    base, array, length = match.groups()
+    if base == 'Header':
+        base = 'std_msgs/Header'
+    elif base not in PRIMITIVES and base != 'string' and '/' not in base:
+        base = owner.split('/')[0] + '/' + base
+    if array is None:
+        return base, None
+    return base, int(length) if length else -1
+
+
+def _compile(type_name, specs):
+    """类型 -> 转码操作列表"""
+    if type_name == 'std_msgs/Header':
+        # ROS1: seq, stamp, frame_id；ROS2: stamp, frame_id
+        return [('skip', 4), ('copy', 4, 8), ('string',)]
+    fields = specs[type_name]
+    if not fields:
+        # ROS2中空消息有一个占位的uint8字段
+        return [('empty',)]
+    ops = []
+    for base, length in fields:
+        if base in PRIMITIVES:
+            align, size = PRIMITIVES[base]
+            if length is None:
+                ops.append(('copy', align, size))
+            elif length >= 0:
+                ops.append(('copy', align, size * length))
+            else:
+                ops.append(('prim_seq', align, size))
+            continue
+        sub = [('string',)] if base == 'string' else _compile(base, specs)
+        if length is None:
+            ops.extend(sub)
+        elif length < 0:
+            ops.append(('seq', sub))
+        elif length * len(sub) <= 64:
+            ops.extend(sub * length)
+        else:
+            ops.append(('repeat', length, sub))
+    return _merge(ops)
+
+
+def _merge(ops):
+    """相邻的定长复制合并为一次：后一段的对齐不大于前一段且前一段长度是其倍数时，不需要中间填充"""
+    merged = []
+    for op in ops:
+        if op[0] == 'copy':
+            if op[2] == 0:
+                continue
+            if merged and merged[-1][0] == 'copy':
+                _, align, n = merged[-1]
+                if op[1] <= align and n % op[1] == 0:
+                    merged[-1] = ('copy', align, n + op[2])
+                    continue
+        merged.append(op)
+    return merged
+
+
+def _pad(out, align):
+    # 对齐相对于封装头之后的位置
+    pad = -(len(out) - 4) % align
+    if pad:
+        out += ZEROS[:pad]
+
+
+def _transcode(ops, src, i, out):
+    for op in ops:
+        kind = op[0]
+        if kind == 'copy':
+            _pad(out, op[1])
+            n = op[2]
+            out += src[i:i + n]
+            i += n
+        elif kind == 'string':
+            n = U32.unpack_from(src, i)[0]
+            _pad(out, 4)
+            out += U32.pack(n + 1)
+            out += src[i + 4:i + 4 + n]
+            out.append(0)
+            i += 4 + n
+        elif kind == 'prim_seq':
+            count = U32.unpack_from(src, i)[0]
+            i += 4
+            _pad(out, 4)
+            out += U32.pack(count)
+            n = count * op[2]
+            if n:
+                _pad(out, op[1])
+                out += src[i:i + n]
+                i += n
+        elif kind == 'seq':
+            count = U32.unpack_from(src, i)[0]
+            i += 4
+            _pad(out, 4)
+            out += U32.pack(count)
+            for _ in range(count):
+                i = _transcode(op[1], src, i, out)
+        elif kind == 'repeat':
+            for _ in range(op[1]):
+                i = _transcode(op[2], src, i, out)
+        elif kind == 'skip':
+            i += op[1]
+        else:   # empty
+            out.append(0)
+    return i
+
+
+class Transcoder:
+    """ROS1序列化字节 -> ROS2 CDR字节（按消息定义编译一次，之后每条消息只做切片复制）"""
+
+    def __init__(self, type_name, definition):
+        specs = parse_definition(type_name, definition)
+        unsupported = sorted(t for t in specs if not is_one_to_one(t))
+        if unsupported:
+            raise ValueError(f"ROS2中没有一一对应的类型: {', '.join(unsupported)}")
+        self.type_name = type_name
+        self.ros2_type = ros2_type_name(type_name)
+        self.ops = _compile(type_name, specs)
+
+    def __call__(self, buff):
+        out = bytearray(ENCAPSULATION)
+        end = _transcode(self.ops, memoryview(buff), 0, out)
+        if end != len(buff):
+            raise ValueError(f"{self.type_name}: 消息长度不符（解析 {end} 字节，实际 {len(buff)}）")
+        return bytes(out)
+
+
+# ============ 队列与转发 ============
+
+class ForwardedTopic:
+    def __init__(self, ros1_topic, ros2_topic, transcode, publish, queue_size):
+        self.ros1_topic = ros1_topic
+        self.ros2_topic = ros2_topic
+        self.type_name = transcode.type_name
+        self.transcode = transcode
+        self.publish = publish
+        self.queue = deque(maxlen=queue_size)
+        self.received = 0
+        self.forwarded = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.max_depth = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.queue_wait = LatencyHistogram()
+        self.process_time = LatencyHistogram()
+
+    def forward(self, batch, now):
+        start = now()
+        for buff, queued in batch:
+            self.queue_wait.record(start - queued)
+            try:
+                data = self.transcode(buff)
+                self.publish(data)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = e
+                continue
+            self.forwarded += 1
+            self.bytes_out += len(data)
+        self.batches += 1
+        self.max_batch = max(self.max_batch, len(batch))
+        self.process_time.record((now() - start) / len(batch))
+
+    def summary(self):
+        return {
+            'ros2_topic': self.ros2_topic,
+            'type': self.type_name,
+            'received': self.received,
+            'forwarded': self.forwarded,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'max_depth': self.max_depth,
+            'mean_batch': self.forwarded / self.batches if self.batches else 0.0,
+            'max_batch': self.max_batch,
+            'queue_wait_p50_ms': self.queue_wait.percentile(50) * 1e3,
+            'queue_wait_p99_ms': self.queue_wait.percentile(99) * 1e3,
+            'transcode_mean_us': self.process_time.mean * 1e6,
+            'mb_in': self.bytes_in / 1e6,
+            'mb_out': self.bytes_out / 1e6,
+        }
+
+
+class TopicForwarder:
+    """
+    make_publisher(ros2_topic, ros2_type) -> publish(cdr_bytes)
+    queue_sizes: {ros1话题: 队列长度}，其余话题使用 queue_size
+    push 可在任意线程调用；start() 后由转发线程成批发布，也可以直接调用 flush()
+    """
+
+    def __init__(self, make_publisher, batch_period=DEFAULT_BATCH_PERIOD, batch_size=DEFAULT_BATCH_SIZE,
+                 queue_size=DEFAULT_QUEUE_SIZE, queue_sizes=None, immediate_bytes=IMMEDIATE_BYTES,
+                 now=time.perf_counter):
+        self.make_publisher = make_publisher
+        self.batch_period = batch_period
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.queue_sizes = dict(queue_sizes or {})
+        self.immediate_bytes = immediate_bytes
+        self.now = now
+        self.topics = {}
+        self.unsupported = {}
+        self.cond = threading.Condition()
+        self.first_queued = None
+        self.urgent = False
+        self.running = False
+        self.thread = None
+
+    def add_topic(self, ros1_topic, type_name, definition, ros2_topic=None):
+        """注册话题（已注册时直接返回）；类型不是一一对应时记入 unsupported 并返回 None"""
+        with self.cond:
+            if ros1_topic in self.topics:
+                return self.topics[ros1_topic]
+            if ros1_topic in self.unsupported:
+                return None
+            try:
+                transcode = Transcoder(type_name, definition)
+            except ValueError as e:
+                self.unsupported[ros1_topic] = f'{type_name}: {e}'
+                return None
+            ros2_topic = ros2_topic or ros1_topic
+            publish = self.make_publisher(ros2_topic, transcode.ros2_type)
+            topic = self.topics[ros1_topic] = ForwardedTopic(
+                ros1_topic, ros2_topic, transcode, publish, self.queue_sizes.get(ros1_topic, self.queue_size))
+            return topic
+
+    def push(self, ros1_topic, buff):
+        """加入一条ROS1序列化消息（话题需已注册）；队列满时丢弃最旧的一条"""
+        topic = self.topics[ros1_topic]
+        queued = self.now()
+        with self.cond:
+            queue = topic.queue
+            if len(queue) == queue.maxlen:
+                topic.dropped += 1
+            queue.append((buff, queued))
+            topic.received += 1
+            topic.bytes_in += len(buff)
+            depth = len(queue)
+            if depth > topic.max_depth:
+                topic.max_depth = depth
+            if depth >= self.batch_size or len(buff) >= self.immediate_bytes:
+                self.urgent = True
+                self.cond.notify()
+            elif self.first_queued is None:
+                # 第一条待发消息：转发线程按它的入队时间计算唤醒时刻
+                self.first_queued = queued
+                self.cond.notify()
+
+    def flush(self):
+        """取出所有队列中的消息，转码并发布（在锁外进行，不阻塞订阅回调）-> 处理条数"""
+        with self.cond:
+            batches = [(topic, list(topic.queue)) for topic in self.topics.values() if topic.queue]
+            for topic, _ in batches:
+                topic.queue.clear()
+            self.first_queued = None
+            self.urgent = False
+        for topic, batch in batches:
+            topic.forward(batch, self.now)
+        return sum(len(batch) for _, batch in batches)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running and not self.urgent:
+                    if self.first_queued is None:
+                        self.cond.wait()
+                        continue
+                    delay = self.first_queued + self.batch_period - self.now()
+                    if delay <= 0:
+                        break
+                    self.cond.wait(delay)
+                if not self.running:
+                    return
+            self.flush()
 
-def forward_topic(ros1_topic, ros2_topic, msg_type):
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='topic_forwarder', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.flush()
+
+    def summary(self):
+        with self.cond:
+            return {name: topic.summary() for name, topic in self.topics.items()}
+
+    def format_report(self):
+        lines = ["📊 ROS1 -> ROS2 转发统计"]
+        lines.append(f"  {'topic':<28}{'recv':>9}{'fwd':>9}{'drop':>7}{'err':>5}{'depth':>7}{'batch':>7}"
+                     f"{'wait p99':>10}{'us/msg':>8}{'MB':>9}")
+        for name, s in self.summary().items():
+            lines.append(f"  {name:<28}{s['received']:>9}{s['forwarded']:>9}{s['dropped']:>7}{s['errors']:>5}"
+                         f"{s['max_depth']:>7}{s['mean_batch']:>7.1f}{s['queue_wait_p99_ms']:>10.2f}"
+                         f"{s['transcode_mean_us']:>8.1f}{s['mb_in']:>9.1f}")
+        for name, reason in self.unsupported.items():
+            lines.append(f"  ⚠️ 未转发 {name}: {reason}")
+        return lines
+
+
+# ============ 传输 ============
+
+class LocalSink:
+    """ROS2端的进程内替身：按话题收集发布的CDR字节（keep=False 时只计数）"""
+
+    def __init__(self, keep=True):
+        self.keep = keep
+        self.types = {}
+        self.messages = {}
+        self.counts = {}
+
+    def make_publisher(self, topic, type_name):
+        self.types[topic] = type_name
+        received = self.messages.setdefault(topic, [])
+        self.counts.setdefault(topic, 0)
+
+        def publish(data):
+            self.counts[topic] += 1
+            if self.keep:
+                received.append(data)
+        return publish
+
+
+class Ros2Sink:
+    """rclpy发布端：直接发布CDR字节；rclpy不支持发布字节时退回反序列化后发布"""
+
+    def __init__(self, node_name='ros1_to_ros2_forwarder', qos_depth=10):
+        import rclpy
+
+        self.rclpy = rclpy
+        rclpy.init()
+        self.node = rclpy.create_node(node_name)
+        self.qos_depth = qos_depth
+        self.raw = True
+
+    def make_publisher(self, topic, type_name):
+        from rclpy.serialization import deserialize_message
+        from rosidl_runtime_py.utilities import get_message
+
+        msg_class = get_message(type_name)
+        publisher = self.node.create_publisher(msg_class, topic, self.qos_depth)
+
+        def publish(data):
+            if self.raw:
+                try:
+                    publisher.publish(data)
+                    return
+                except TypeError:
+                    self.raw = False
+            publisher.publish(deserialize_message(data, msg_class))
+        return publish
+
+    def close(self):
+        self.node.destroy_node()
+        self.rclpy.shutdown()
+
+
+class Ros1Source:
     """
-    Forward a single topic from ROS1 to ROS2
+    ROS1订阅端：按 get_published_topics 发现话题并用 AnyMsg 订阅，
+    首条消息到达时按连接头中的类型和消息定义注册到 forwarder
+    topics: 只转发这些话题（None 为全部）；mapping: {ros1话题: ros2话题}
     """
-    print(f"Forwarding: {ros1_topic} -> {ros2_topic} ({msg_type})")
-    
-    # TODO: Implement actual forwarding
-    # This is a placeholder - real implementation would need rospy + rclpy
-    pass
+
+    def __init__(self, forwarder, topics=None, exclude=(), mapping=None, discovery_period=DISCOVERY_PERIOD):
+        import rospy
+
+        self.rospy = rospy
+        self.forwarder = forwarder
+        self.topics = set(topics) if topics else None
+        self.exclude = set(exclude) | set(INTERNAL_TOPICS)
+        self.mapping = dict(mapping or {})
+        self.subscribers = {}
+        self.discover()
+        self.timer = rospy.Timer(rospy.Duration(discovery_period), self._discover) if discovery_period > 0 else None
+
+    def wanted(self, topic):
+        return topic not in self.exclude and (self.topics is None or topic in self.topics)
+
+    def discover(self):
+        for topic, _ in self.rospy.get_published_topics():
+            if topic not in self.subscribers and self.wanted(topic):
+                self.subscribers[topic] = self.rospy.Subscriber(
+                    topic, self.rospy.AnyMsg, self._callback, callback_args=topic,
+                    queue_size=self.forwarder.queue_sizes.get(topic, self.forwarder.queue_size),
+                    buff_size=SUBSCRIBER_BUFF_SIZE, tcp_nodelay=True)
+                self.rospy.loginfo("Subscribed %s" % topic)
+
+    def _discover(self, event):
+        self.discover()
+
+    def _callback(self, msg, topic):
+        if topic not in self.forwarder.topics:
+            header = msg._connection_header
+            forwarded = self.forwarder.add_topic(topic, header['type'], header['message_definition'],
+                                                 self.mapping.get(topic))
+            if forwarded is None:
+                self.rospy.logwarn_throttle(60, "Not forwarding %s" % self.forwarder.unsupported[topic])
+                return
+            self.rospy.loginfo("Forwarding %s -> %s (%s)" % (topic, forwarded.ros2_topic, forwarded.type_name))
+        self.forwarder.push(topic, msg._buff)
+
+
+# ============ 命令行 ============
+
+def parse_pairs(items, convert=str):
+    """['a=b', ...] -> {a: convert(b)}"""
+    pairs = {}
+    for item in items:
+        key, sep, value = item.partition('=')
+        if not sep or not key or not value:
+            raise ValueError(f"格式应为 KEY=VALUE: {item}")
+        pairs[key] = convert(value)
+    return pairs
+
+
+def make_forwarder(make_publisher, args):
+    return TopicForwarder(make_publisher, batch_period=args.batch_period, batch_size=args.batch_size,
+                          queue_size=args.queue_size, queue_sizes=parse_pairs(args.queue_limit, int),
+                          immediate_bytes=args.immediate_bytes)
+
+
+def list_topics():
+    import rospy
+
+    topics = rospy.get_published_topics()
+    print(f"📋 ROS1话题 ({len(topics)} 个):")
+    for topic, type_name in sorted(topics):
+        mark = '✅' if is_one_to_one(type_name) else '⚠️ 无一一对应的ROS2类型'
+        print(f"  {topic:<40}{type_name:<36}{mark}")
+
+
+def run_bag(args):
+    """离线：从bag读取原始字节，经转发队列转码到 LocalSink，测吞吐"""
+    import rosbag
+
+    sink = LocalSink(keep=False)
+    forwarder = make_forwarder(sink.make_publisher, args)
+    mapping = parse_pairs(args.map)
+    start = time.time()
+    total = 0
+    with rosbag.Bag(args.bag) as bag:
+        for topic, (type_name, buff, _, _, pytype), _ in bag.read_messages(topics=args.topics or None, raw=True):
+            if topic not in forwarder.topics:
+                if forwarder.add_topic(topic, type_name, pytype._full_text, mapping.get(topic)) is None:
+                    continue
+            forwarder.push(topic, buff)
+            total += 1
+            if total % args.batch_size == 0:
+                forwarder.flush()
+    forwarder.flush()
+    elapsed = time.time() - start
+    mb = sum(s['mb_in'] for s in forwarder.summary().values())
+    for line in forwarder.format_report():
+        print(line)
+    print(f"\n⚡ {total} 条消息, {mb:.1f} MB, {elapsed:.2f}s "
+          f"({total / elapsed if elapsed > 0 else 0:.0f} msg/s, {mb / elapsed if elapsed > 0 else 0:.0f} MB/s)")
+
+
+def run_live(args):
+    import rospy
+
+    rospy.init_node('ros1_to_ros2_forwarder', anonymous=True, disable_signals=True)
+    sink = Ros2Sink(qos_depth=args.qos_depth)
+    forwarder = make_forwarder(sink.make_publisher, args)
+    forwarder.start()
+    Ros1Source(forwarder, args.topics, args.exclude, parse_pairs(args.map), args.discovery_period)
+
+    def report(event):
+        for line in forwarder.format_report():
+            rospy.loginfo(line)
+
+    if args.report_period > 0:
+        rospy.Timer(rospy.Duration(args.report_period), report)
+    print("🚀 转发中，Ctrl+C 停止")
+    try:
+        while not rospy.is_shutdown():
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        rospy.signal_shutdown('forwarder stopped')
+        forwarder.stop()
+        for line in forwarder.format_report():
+            print(line)
+        sink.close()
+
 
 def main():
-    print("ROS1 to ROS2 Topic Forwarder")
-    print("=" * 50)
-    print()
-    print("Note: This is a simple forwarder script.")
-    print("For full functionality, you should build ros1_bridge.")
-    print()
-    print("Checking ROS1 topics in Docker container...")
-    
-    # List ROS1 topics
+    parser = argparse.ArgumentParser(description='ROS1 -> ROS2 话题转发（原始字节转码，不需要ros1_bridge）')
+    parser.add_argument('--topics', nargs='*', default=None, help='只转发这些ROS1话题（默认全部）')
+    parser.add_argument('--exclude', nargs='*', default=[], help='不转发的话题')
+    parser.add_argument('--map', action='append', default=[], metavar='ROS1=ROS2', help='ROS2端话题重命名，可重复')
+    parser.add_argument('--batch-period', type=float, default=DEFAULT_BATCH_PERIOD, help='批量发布周期（秒）')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='队列积累该条数时立即发布')
+    parser.add_argument('--immediate-bytes', type=int, default=IMMEDIATE_BYTES, help='不小于该字节数的消息立即发布')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE, help='每个话题的队列长度')
+    parser.add_argument('--queue-limit', action='append', default=[], metavar='TOPIC=N',
+                        help='单个话题的队列长度，可重复')
+    parser.add_argument('--qos-depth', type=int, default=10, help='ROS2发布端QoS队列深度')
+    parser.add_argument('--discovery-period', type=float, default=DISCOVERY_PERIOD, help='话题发现周期（秒）')
+    parser.add_argument('--report-period', type=float, default=REPORT_PERIOD, help='统计输出周期（秒，0关闭）')
+    parser.add_argument('--list', action='store_true', help='列出ROS1话题及是否可转发')
+    parser.add_argument('--bag', default=None, help='离线转码测试：从bag读取原始消息')
+    args = parser.parse_args()
+
     try:
-        result = subprocess.run(
-            ["docker", "exec", "vir_slam_dev", "bash", "-c",
-             "source /opt/ros/noetic/setup.bash && rostopic list"],
-            capture_output=True, text=True, check=True
-        )
-        topics = result.stdout.strip().split('\n')
-        print(f"Found {len(topics)} ROS1 topics:")
-        for topic in topics:
-            print(f"  {topic}")
-    except subprocess.CalledProcessError as e:
-        print(f"Error: {e}")
+        if args.list:
+            list_topics()
+        elif args.bag:
+            run_bag(args)
+        else:
+            run_live(args)
+    except ValueError as e:
+        print(f"❌ {e}")
         sys.exit(1)
 
+
 if __name__ == "__main__":
     main()
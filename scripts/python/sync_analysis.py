@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+多传感器时间同步离线分析 - 整个bag的延迟、传感器间偏移、漂移和丢帧
+
+替代实时检查节点（check_timestamp_sync.sh / check_all_calibrations.sh /
+diagnose_slam_issues.sh 中只看最近100条或最后一条消息的平均值）：用 check_bag 的
+索引读取一次取出图像、IMU、激光、UWB每条消息的 header.stamp 和记录时间
+（rosbag record 收到的时刻），全部在numpy数组上计算:
+
+    延迟       记录时间 - header.stamp 的分布（均值/std/p50/p99/最值，负延迟条数）
+    漂移       每 --window 秒取最小延迟（传输延迟最小的消息，下包络），直线拟合
+               得到起点偏移和漂移率（ppm）；两传感器之差即相对时钟偏移/漂移
+    传感器间   对A的每个header时间，在B中二分查找最近的header时间，偏移 = B - A 的
+               分布，以及落在同步容差（sensor_sync.DEFAULT_SLOP）内的比例
+    丢帧       header间隔 > --gap-factor × 中位周期 的区间（起止时间、估计缺失帧数）
+
+用法:
+    python3 sync_analysis.py recording.bag
+    python3 sync_analysis.py recording.bag --topic image=/camera/color/image_raw --json sync.json --plot sync.png
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from check_bag import DEFAULT_GAP_FACTOR, read_bag_stamps, topic_timing
+from sensor_sync import DEFAULT_SLOP
+
+# 传感器 -> 候选话题（按顺序取bag中第一个存在的）
+SENSOR_TOPICS = {
+    'image': ['/usb_cam/image_raw', '/synced/image_raw', '/camera/color/image_raw'],
+    'imu': ['/livox/imu', '/synced/imu', '/mavros/imu/data_raw'],
+    'lidar': ['/livox/lidar', '/synced/lidar'],
+    'uwb': ['/uwb/pose', '/synced/uwb_range'],
+}
+DEFAULT_WINDOW = 10.0           # s，下包络取最小延迟的窗口
+MAX_LATENCY_OK = 0.1            # s，延迟中位数超过该值时提示
+MAX_SPANS = 10                  # 每个传感器输出的最长丢帧区间数
+
+
+def resolve_topics(connections, overrides=None):
+    """{传感器: 话题}：overrides 优先，否则取候选列表中bag里存在且带header的第一个话题"""
+    present = {info['topic'] for info in connections.values() if info['has_header']}
+    topics = {}
+    for name, candidates in SENSOR_TOPICS.items():
+        for topic in candidates:
+            if topic in present:
+                topics[name] = topic
+                break
+    topics.update(overrides or {})
+    return topics
+
+
+def load_sensor_stamps(filename, overrides=None):
+    """
+    -> {传感器: {'topic', 'header', 'receive'}}，两个数组为秒（float64），逐条对应，
+    按记录时间排序；同一话题的多个连接合并
+    """
+    connections, record, header = read_bag_stamps(filename)
+    topics = resolve_topics(connections, overrides)
+    sensors = {}
+    for name, topic in topics.items():
+        conns = [c for c, info in connections.items() if info['topic'] == topic and c in header]
+        if not conns:
+            print(f"⚠️ {name}: bag中没有带header的话题 {topic}")
+            continue
+        receive = np.concatenate([record[c] for c in conns])
+        stamps = np.concatenate([header[c] for c in conns])
+        order = np.argsort(receive, kind='stable')
+        sensors[name] = {
+            'topic': topic,
+            'header': stamps[order] * 1e-9,
+            'receive': receive[order] * 1e-9,
+        }
+    return sensors
+
+
+# ============ 单传感器 ============
+
+def distribution(values):
+    """一维数组的分布统计（毫秒）"""
+    if len(values) == 0:
+        return {'count': 0}
+    ms = values * 1e3
+    p1, p50, p99 = np.percentile(ms, [1, 50, 99])
+    return {
+        'count': int(len(values)),
+        'mean_ms': float(ms.mean()),
+        'std_ms': float(ms.std()),
+        'p1_ms': float(p1),
+        'p50_ms': float(p50),
+        'p99_ms': float(p99),
+        'min_ms': float(ms.min()),
+        'max_ms': float(ms.max()),
+    }
+
+
+def envelope_fit(t, latency, window=DEFAULT_WINDOW):
+    """
+    每个窗口的最小延迟（下包络）做直线拟合 -> (offset_s, drift_ppm, 窗口中心, 窗口最小值)
+    offset_s 为 t=0 处的值；窗口少于2个时漂移为0
+    """
+    if len(t) == 0:
+        return None, 0.0, np.empty(0), np.empty(0)
+    bins = np.floor(t / window).astype(np.int64)
+    order = np.argsort(bins, kind='stable')
+    bins = bins[order]
+    starts = np.flatnonzero(np.r_[True, np.diff(bins) != 0])
+    minima = np.minimum.reduceat(latency[order], starts)
+    centers = (bins[starts] + 0.5) * window
+    if len(centers) < 2:
+        return float(minima[0]), 0.0, centers, minima
+    skew, intercept = np.polyfit(centers, minima, 1)
+    # 下移到最低点，使直线为下包络
+    intercept += float(np.min(minima - (intercept + skew * centers)))
+    return float(intercept), float(skew) * 1e6, centers, minima
+
+
+def dropped_spans(header, gap_factor=DEFAULT_GAP_FACTOR, max_spans=MAX_SPANS):
+    """header间隔超过 gap_factor × 中位周期 的区间，按时长降序 -> (timing, spans)"""
+    stamps = np.sort(header)
+    timing = topic_timing(np.round(stamps * 1e9).astype(np.int64), gap_factor)
+    if timing.get('gaps', 0) == 0:
+        return timing, []
+    period = timing['period_ms'] * 1e-3
+    dt = np.diff(stamps)
+    index = np.flatnonzero(dt > gap_factor * period)
+    index = index[np.argsort(-dt[index], kind='stable')][:max_spans]
+    spans = [{
+        'start': float(stamps[i]),
+        'end': float(stamps[i + 1]),
+        'seconds': float(dt[i]),
+        'missing': int(max(round(dt[i] / period) - 1, 0)),
+    } for i in index]
+    return timing, spans
+
+
+def analyze_sensor(data, t0, gap_factor=DEFAULT_GAP_FACTOR, window=DEFAULT_WINDOW):
+    header, receive = data['header'], data['receive']
+    stamped = header > 0
+    latency = receive[stamped] - header[stamped]
+    offset, drift_ppm, centers, minima = envelope_fit(receive[stamped] - t0, latency, window)
+    timing, spans = dropped_spans(header[stamped], gap_factor)
+    return {
+        'topic': data['topic'],
+        'count': int(len(header)),
+        'unstamped': int((~stamped).sum()),
+        'rate_hz': timing.get('rate_hz', 0.0),
+        'period_ms': timing.get('period_ms', 0.0),
+        'latency': distribution(latency),
+        'negative_latency': int((latency < 0).sum()),
+        'backwards': timing.get('backwards', 0),
+        'duplicates': timing.get('duplicates', 0),
+        'offset_s': offset,
+        'drift_ppm': drift_ppm,
+        'envelope': {'t': centers.tolist(), 'min_latency': minima.tolist()},
+        'gaps': timing.get('gaps', 0),
+        'missing_estimate': timing.get('missing_estimate', 0),
+        'spans': spans,
+    }
+
+
+# ============ 传感器间 ============
+
+def nearest_offsets(ta, tb):
+    """对 ta 的每个时间，tb（已排序）中最近时间的差 tb - ta"""
+    if len(tb) == 1:
+        return tb[0] - ta
+    j = np.clip(np.searchsorted(tb, ta), 1, len(tb) - 1)
+    before, after = tb[j - 1], tb[j]
+    return np.where(ta - before <= after - ta, before, after) - ta
+
+
+def analyze_pair(a, b, data, results):
+    ta = data[a]['header']
+    tb = np.sort(data[b]['header'])
+    ta, tb = ta[ta > 0], tb[tb > 0]
+    tolerance = max(DEFAULT_SLOP.get(a, 0.02), DEFAULT_SLOP.get(b, 0.02))
+    result = {'tolerance_ms': tolerance * 1e3}
+    if len(ta) == 0 or len(tb) == 0:
+        result['offset'] = {'count': 0}
+        return result
+    offsets = nearest_offsets(ta, tb)
+    result['offset'] = distribution(offsets)
+    result['abs_p99_ms'] = float(np.percentile(np.abs(offsets), 99)) * 1e3
+    result['within_tolerance'] = float((np.abs(offsets) <= tolerance).mean())
+    ra, rb = results[a], results[b]
+    if ra['offset_s'] is not None and rb['offset_s'] is not None:
+        # 两者的下包络之差：相对时钟偏移（含两者最小传输延迟之差）
+        result['clock_offset_ms'] = (ra['offset_s'] - rb['offset_s']) * 1e3
+        result['relative_drift_ppm'] = ra['drift_ppm'] - rb['drift_ppm']
+    return result
+
+
+def analyze_sync(data, gap_factor=DEFAULT_GAP_FACTOR, window=DEFAULT_WINDOW):
+    """data: load_sensor_stamps 的结果 -> 报告字典"""
+    if not data:
+        return {'sensors': {}, 'pairs': {}}
+    t0 = min(float(d['receive'][0]) for d in data.values() if len(d['receive']))
+    sensors = {name: analyze_sensor(d, t0, gap_factor, window) for name, d in data.items()}
+    pairs = {f'{a}-{b}': analyze_pair(a, b, data, sensors)
+             for a, b in itertools.combinations(data, 2)}
+    return {'t0': t0, 'window_s': window, 'gap_factor': gap_factor, 'sensors': sensors, 'pairs': pairs}
+
+
+# ============ 输出 ============
+
+def print_report(report):
+    sensors = report['sensors']
+    if not sensors:
+        print("❌ bag中没有找到传感器话题")
+        return
+    print("📊 延迟（记录时间 - header.stamp）:")
+    print(f"  {'sensor':<8}{'topic':<24}{'count':>9}{'Hz':>8}{'p50 ms':>10}{'std ms':>9}{'p99 ms':>10}"
+          f"{'max ms':>10}{'neg':>6}{'drift ppm':>11}")
+    for name, s in sensors.items():
+        lat = s['latency']
+        if lat['count'] == 0:
+            print(f"  {name:<8}{s['topic']:<24}{s['count']:>9}  （没有有效的header.stamp）")
+            continue
+        print(f"  {name:<8}{s['topic']:<24}{s['count']:>9}{s['rate_hz']:>8.1f}{lat['p50_ms']:>10.2f}"
+              f"{lat['std_ms']:>9.2f}{lat['p99_ms']:>10.2f}{lat['max_ms']:>10.2f}{s['negative_latency']:>6}"
+              f"{s['drift_ppm']:>11.1f}")
+
+    if report['pairs']:
+        print("\n🔄 传感器间偏移（最近header时间 B - A）:")
+        print(f"  {'pair':<14}{'p50 ms':>10}{'|p99| ms':>10}{'max ms':>10}{'容差 ms':>9}{'within':>9}"
+              f"{'clock ms':>10}{'drift ppm':>11}")
+        for pair, p in report['pairs'].items():
+            off = p['offset']
+            if off['count'] == 0:
+                print(f"  {pair:<14}  （没有数据）")
+                continue
+            max_abs = max(abs(off['min_ms']), abs(off['max_ms']))
+            clock = f"{p['clock_offset_ms']:>10.2f}{p['relative_drift_ppm']:>11.1f}" if 'clock_offset_ms' in p else ''
+            print(f"  {pair:<14}{off['p50_ms']:>10.2f}{p['abs_p99_ms']:>10.2f}{max_abs:>10.2f}"
+                  f"{p['tolerance_ms']:>9.1f}{p['within_tolerance'] * 100:>8.1f}%{clock}")
+
+    print("\n💡 检查结果:")
+    ok = True
+    for name, s in sensors.items():
+        lat = s['latency']
+        if s['unstamped']:
+            ok = False
+            print(f"  ⚠️ {name}: {s['unstamped']} 条消息没有header.stamp")
+        if lat['count'] and abs(lat['p50_ms']) > 1e3:
+            ok = False
+            print(f"  ❌ {name}: header.stamp 与系统时间相差 {lat['p50_ms'] / 1e3:.1f}s，不是同一时间基准")
+        elif lat['count'] and lat['p50_ms'] > MAX_LATENCY_OK * 1e3:
+            ok = False
+            print(f"  ⚠️ {name}: 延迟中位数 {lat['p50_ms']:.1f}ms > {MAX_LATENCY_OK * 1e3:.0f}ms")
+        if s['negative_latency']:
+            ok = False
+            print(f"  ⚠️ {name}: {s['negative_latency']} 条消息的header.stamp晚于记录时间（时钟超前）")
+        if s['backwards']:
+            ok = False
+            print(f"  ❌ {name}: header.stamp 倒退 {s['backwards']} 次")
+        if s['gaps']:
+            ok = False
+            span = s['spans'][0]
+            print(f"  ⚠️ {name}: {s['gaps']} 处丢帧（约缺 {s['missing_estimate']} 帧），"
+                  f"最长 {span['seconds']:.2f}s @ {span['start'] - report['t0']:.1f}s")
+    for pair, p in report['pairs'].items():
+        if p['offset']['count'] and p['within_tolerance'] < 0.95:
+            ok = False
+            print(f"  ⚠️ {pair}: 只有 {p['within_tolerance'] * 100:.1f}% 在 {p['tolerance_ms']:.0f}ms 容差内")
+    if ok:
+        print("  ✅ 时间同步正常")
+
+
+def save_plot(report, data, filename):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    t0 = report['t0']
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    ax = axes[0]
+    for name, d in data.items():
+        s = report['sensors'][name]
+        stamped = d['header'] > 0
+        t = d['receive'][stamped] - t0
+        latency = (d['receive'][stamped] - d['header'][stamped]) * 1e3
+        step = max(1, len(t) // 20000)
+        points = ax.plot(t[::step], latency[::step], '.', markersize=1, alpha=0.3)[0]
+        env = s['envelope']
+        if s['offset_s'] is not None and env['t']:
+            x = np.array([env['t'][0], env['t'][-1]])
+            ax.plot(x, (s['offset_s'] + s['drift_ppm'] * 1e-6 * x) * 1e3, color=points.get_color(),
+                    label=f"{name} ({s['drift_ppm']:.1f} ppm)")
+        for span in s['spans']:
+            ax.axvspan(span['start'] - t0, span['end'] - t0, color=points.get_color(), alpha=0.15)
+    ax.set_xlabel('Time (s)')
+    ax.set_ylabel('Receive - header stamp (ms)')
+    ax.set_title('Latency and drift (shaded: dropped spans)')
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+
+    ax = axes[1]
+    for pair in report['pairs']:
+        a, b = pair.split('-')
+        ta = data[a]['header']
+        tb = np.sort(data[b]['header'])
+        ta, tb = ta[ta > 0], tb[tb > 0]
+        if len(ta) and len(tb):
+            ax.hist(nearest_offsets(ta, tb) * 1e3, bins=100, histtype='step', label=pair)
+    ax.set_xlabel('Nearest header stamp offset B - A (ms)')
+    ax.set_ylabel('Count')
+    ax.set_title('Pairwise offsets')
+    ax.set_yscale('log')
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(filename, dpi=150)
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多传感器时间同步离线分析（整个bag）')
+    parser.add_argument('bag', help='bag文件路径')
+    parser.add_argument('--topic', action='append', default=[], metavar='SENSOR=TOPIC',
+                        help=f"指定传感器话题，可重复；传感器: {', '.join(SENSOR_TOPICS)}")
+    parser.add_argument('--window', type=float, default=DEFAULT_WINDOW, help='漂移拟合的最小延迟窗口（秒）')
+    parser.add_argument('--gap-factor', type=float, default=DEFAULT_GAP_FACTOR,
+                        help='header间隔超过中位周期的倍数视为丢帧')
+    parser.add_argument('--json', default=None, help='报告另存为JSON')
+    parser.add_argument('--plot', default=None, help='保存延迟/偏移图')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.bag):
+        print(f"❌ 文件不存在: {args.bag}")
+        sys.exit(1)
+    overrides = {}
+    for item in args.topic:
+        name, sep, topic = item.partition('=')
+        if not sep or not topic:
+            print(f"❌ 无效的 --topic: {item}（格式 SENSOR=TOPIC）")
+            sys.exit(1)
+        overrides[name] = topic
+
+    start = time.time()
+    data = load_sensor_stamps(args.bag, overrides)
+    topics = ', '.join(f"{name}={d['topic']}" for name, d in data.items())
+    print(f"📂 读取 {sum(len(d['header']) for d in data.values())} 条时间戳 ({topics}), {time.time() - start:.2f}s")
+    start = time.time()
+    report = analyze_sync(data, args.gap_factor, args.window)
+    print(f"⚡ 分析用时 {time.time() - start:.2f}s\n")
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 {args.json}")
+    if args.plot and data:
+        save_plot(report, data, args.plot)
+        print(f"📊 图已保存: {args.plot}")
+
+
+if __name__ == "__main__":
+    main()
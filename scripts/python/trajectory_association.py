@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+轨迹时间戳关联 - 按时间戳将估计位姿与Ground Truth配对
+
+轨迹数组约定（与load_tum一致）:
+    (N, 4): [t, x, y, z]
+    (N, 8): [t, x, y, z, qx, qy, qz, qw]
+时间戳单位为秒，且按升序排列。
+
+关联结果只保存索引和插值权重，对齐前后的轨迹行序不变，
+因此同一个关联结果可以在对齐、误差计算和所有图表中重复使用。
+"""
+
+import numpy as np
+
+# 默认最大时间差（秒）
+DEFAULT_MAX_DT = 0.02
+# 线性插值时允许的最大GT采样间隔（秒）
+DEFAULT_MAX_GAP = 0.1
+
+
+class PoseAssociation:
+    """
+    时间戳关联结果
+    est_idx: 匹配上的估计位姿索引 (M,)
+    ref_lo, ref_hi: 参考轨迹上的左右索引 (M,)
+    weight: 插值权重 (M,)，参考位姿 = (1-w)*ref[lo] + w*ref[hi]
+    """
+
+    def __init__(self, est_idx, ref_lo, ref_hi, weight):
+        self.est_idx = est_idx
+        self.ref_lo = ref_lo
+        self.ref_hi = ref_hi
+        self.weight = weight
+
+    def __len__(self):
+        return len(self.est_idx)
+
+    def chunk(self, start, stop):
+        """取关联结果的一段，用于分块处理长轨迹"""
+        return PoseAssociation(self.est_idx[start:stop], self.ref_lo[start:stop],
+                               self.ref_hi[start:stop], self.weight[start:stop])
+
+    def timestamps(self, est):
+        """匹配位姿的时间戳（取估计轨迹的时间）"""
+        return est[self.est_idx, 0]
+
+    def est_positions(self, est):
+        return est[self.est_idx, 1:4]
+
+    def ref_positions(self, ref):
+        """参考轨迹位置（线性插值）"""
+        w = self.weight[:, None]
+        return (1.0 - w) * ref[self.ref_lo, 1:4] + w * ref[self.ref_hi, 1:4]
+
+    def est_quaternions(self, est):
+        return est[self.est_idx, 4:8]
+
+    def ref_quaternions(self, ref):
+        """参考轨迹姿态（slerp插值），需要8列轨迹"""
+        if ref.shape[1] < 8:
+            raise ValueError("参考轨迹不包含四元数列")
+        return slerp(ref[self.ref_lo, 4:8], ref[self.ref_hi, 4:8], self.weight)
+
+    def position_errors(self, ref, est):
+        """逐位姿位置误差 (M,)"""
+        return np.linalg.norm(self.ref_positions(ref) - self.est_positions(est), axis=1)
+
+
+def slerp(q0, q1, w):
+    """
+    批量四元数球面插值
+    q0, q1: (M, 4) [qx, qy, qz, qw]
+    w: (M,) 插值权重
+    """
+    q0 = q0 / np.linalg.norm(q0, axis=1, keepdims=True)
+    q1 = q1 / np.linalg.norm(q1, axis=1, keepdims=True)
+
+    # 取最短路径
+    dot = np.sum(q0 * q1, axis=1)
+    q1 = np.where((dot < 0)[:, None], -q1, q1)
+    dot = np.abs(dot)
+
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+
+    # 夹角很小时退化为线性插值，避免除零
+    small = sin_theta < 1e-6
+    safe_sin = np.where(small, 1.0, sin_theta)
+    a = np.where(small, 1.0 - w, np.sin((1.0 - w) * theta) / safe_sin)
+    b = np.where(small, w, np.sin(w * theta) / safe_sin)
+
+    q = a[:, None] * q0 + b[:, None] * q1
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def associate_poses(ref, est, max_dt=DEFAULT_MAX_DT, interpolation='nearest',
+                    max_gap=DEFAULT_MAX_GAP):
+    """
+    按时间戳关联两条轨迹（二分查找，一次向量化完成）
+    ref: 参考轨迹 (N, 4|8)，通常为GT
+    est: 估计轨迹 (M, 4|8)
+    interpolation:
+        'nearest' - 取时间最近的参考位姿，|dt| <= max_dt 才算匹配
+        'linear'  - 在相邻两个参考位姿之间插值（位置线性、姿态slerp），
+                    要求估计时间落在参考区间内且区间长度 <= max_gap
+    返回 PoseAssociation
+    """
+    empty = np.zeros(0, dtype=int)
+    if len(ref) == 0 or len(est) == 0:
+        return PoseAssociation(empty, empty, empty, np.zeros(0))
+
+    t_ref = ref[:, 0]
+    t_est = est[:, 0]
+    n = len(t_ref)
+
+    idx = np.searchsorted(t_ref, t_est, side='left')
+    lo = np.clip(idx - 1, 0, n - 1)
+    hi = np.clip(idx, 0, n - 1)
+
+    if interpolation == 'nearest':
+        dt_lo = np.abs(t_est - t_ref[lo])
+        dt_hi = np.abs(t_ref[hi] - t_est)
+        nearest = np.where(dt_hi < dt_lo, hi, lo)
+        valid = np.minimum(dt_lo, dt_hi) <= max_dt
+        est_idx = np.nonzero(valid)[0]
+        nearest = nearest[valid]
+        return PoseAssociation(est_idx, nearest, nearest, np.zeros(len(est_idx)))
+
+    if interpolation == 'linear':
+        t_lo = t_ref[lo]
+        t_hi = t_ref[hi]
+        valid = (t_lo <= t_est) & (t_est <= t_hi) & (t_hi - t_lo <= max_gap)
+        est_idx = np.nonzero(valid)[0]
+        lo = lo[valid]
+        hi = hi[valid]
+        span = t_hi[valid] - t_lo[valid]
+        weight = np.zeros(len(est_idx))
+        nonzero = span > 0
+        weight[nonzero] = (t_est[est_idx][nonzero] - t_lo[valid][nonzero]) / span[nonzero]
+        return PoseAssociation(est_idx, lo, hi, weight)
+
+    raise ValueError(f"未知的插值方式: {interpolation}")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+按行驶距离分段的漂移分析（KITTI风格）
+
+累计弧长索引每条轨迹只计算一次；对每个分段长度 L，从每个起点 i 找到第一个
+满足 dist[j] >= dist[i] + L 的终点 j（二分查找，向量化），
+以 L 归一化相对位姿误差，得到与轨迹总长度无关的漂移指标:
+    平移漂移 (%)  = |t_E| / L * 100
+    旋转漂移 (deg/m) = angle(R_E) / L
+"""
+
+import numpy as np
+
+from trajectory_rpe import distance_pairs, path_length, quat_to_rotmat, relative_errors
+
+# 默认分段长度（米）
+DEFAULT_SEGMENT_LENGTHS = (10.0, 20.0, 50.0, 100.0)
+
+
+def compute_segment_drift(gt, est, assoc, lengths=DEFAULT_SEGMENT_LENGTHS, step=1, dist=None):
+    """
+    分段漂移
+    gt, est: (N, 8) 轨迹；assoc: PoseAssociation
+    step: 起点间隔（关联位姿数），KITTI官方为10
+    dist: 关联位姿上GT的累计弧长，已有时传入避免重复计算
+    返回 (rows, overall)
+        rows: [{'length', 'n_segments', 'trans_drift_percent', 'rot_drift_deg_per_m'}, ...]
+        overall: 所有分段的平均 {'trans_drift_percent', 'rot_drift_deg_per_m', 'n_segments'}，无分段时为None
+    """
+    p_gt = assoc.ref_positions(gt)
+    p_est = assoc.est_positions(est)
+    if dist is None:
+        dist = path_length(p_gt)
+
+    if est.shape[1] >= 8 and gt.shape[1] >= 8:
+        R_gt = quat_to_rotmat(assoc.ref_quaternions(gt))
+        R_est = quat_to_rotmat(assoc.est_quaternions(est))
+    else:
+        # 只有位置时仍可计算平移漂移
+        R_gt = R_est = np.broadcast_to(np.eye(3), (len(p_gt), 3, 3))
+
+    rows = []
+    all_trans = []
+    all_rot = []
+    for length in lengths:
+        i, j = distance_pairs(dist, length)
+        if step > 1:
+            keep = i % step == 0
+            i, j = i[keep], j[keep]
+        if len(i) == 0:
+            continue
+        trans, rot = relative_errors(p_gt, R_gt, p_est, R_est, i, j)
+        trans_drift = trans / length * 100
+        rot_drift = np.degrees(rot) / length
+        rows.append({
+            'length': length,
+            'n_segments': len(i),
+            'trans_drift_percent': float(np.mean(trans_drift)),
+            'rot_drift_deg_per_m': float(np.mean(rot_drift)),
+        })
+        all_trans.append(trans_drift)
+        all_rot.append(rot_drift)
+
+    if not rows:
+        return rows, None
+    all_trans = np.concatenate(all_trans)
+    all_rot = np.concatenate(all_rot)
+    overall = {
+        'n_segments': len(all_trans),
+        'trans_drift_percent': float(np.mean(all_trans)),
+        'rot_drift_deg_per_m': float(np.mean(all_rot)),
+    }
+    return rows, overall
+
+
+def format_drift(rows, overall):
+    """分段漂移的文本表格"""
+    if overall is None:
+        return "    (轨迹长度不足最短分段)"
+    lines = [f"    {'length':>8}  {'segments':>9}  {'trans drift':>11}  {'rot drift':>12}"]
+    for r in rows:
+        lines.append(f"    {r['length']:>7.0f}m  {r['n_segments']:>9}  {r['trans_drift_percent']:>10.3f}%  "
+                     f"{r['rot_drift_deg_per_m']:>8.5f}°/m")
+    lines.append(f"    {'average':>8}  {overall['n_segments']:>9}  {overall['trans_drift_percent']:>10.3f}%  "
+                 f"{overall['rot_drift_deg_per_m']:>8.5f}°/m")
+    return '\n'.join(lines)
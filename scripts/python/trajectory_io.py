@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+轨迹批量加载 - TUM / VINS CSV 直接解析为连续的NumPy数组
+
+统一输出 (N, 8) float64: [t, x, y, z, qx, qy, qz, qw]，时间单位为秒，按时间升序。
+支持的格式:
+    tum  - "t x y z qx qy qz qw"，空格分隔，'#'开头为注释
+    vins - VINS-Mono结果CSV "t,x,y,z,qw,qx,qy,qz,vx,vy,vz,"，时间戳为纳秒
+
+首次解析后会在缓存目录写入二进制sidecar（.npy），键为源文件路径、解析格式、大小和mtime，
+再次加载同一文件时直接内存映射，无需重新解析。
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+# sidecar缓存目录，可用环境变量覆盖
+CACHE_DIR = os.environ.get(
+    'VIR_SLAM_TRAJ_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'vir_slam', 'trajectories'))
+
+# 大于该值的时间戳视为纳秒
+NS_TIMESTAMP_THRESHOLD = 1e12
+
+
+def detect_format(filename):
+    """根据扩展名判断轨迹格式"""
+    return 'vins' if filename.lower().endswith('.csv') else 'tum'
+
+
+def _sidecar_path(filename, fmt, cache_dir):
+    """
+    sidecar路径：源文件绝对路径和格式的哈希 + 格式 + 大小 + mtime
+    同一文件按不同格式解析（如强制tum/vins）结果不同，各自单独缓存
+    """
+    st = os.stat(filename)
+    key = hashlib.sha1(f"{os.path.abspath(filename)}|{fmt}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{key}_{fmt}_{st.st_size}_{st.st_mtime_ns}.npy"), key
+
+
+def _parse_columns(raw, comment=b'#'):
+    """将整段文本解析为二维数组，列数由第一行数据决定"""
+    if comment in raw:
+        raw = b'\n'.join(line for line in raw.splitlines()
+                         if line.strip() and not line.lstrip().startswith(comment))
+
+    lines = raw.lstrip().split(b'\n', 1)
+    if not lines[0].strip():
+        return np.zeros((0, 0))
+    n_cols = len(lines[0].split())
+
+    values = np.fromstring(raw.decode('ascii'), sep=' ')
+    if len(values) % n_cols != 0:
+        # 列数不一致（截断的最后一行等），逐行兜底，仅保留完整行
+        rows = [line.split() for line in raw.splitlines()]
+        values = np.array([[float(v) for v in r[:n_cols]] for r in rows if len(r) >= n_cols])
+        return values.reshape(-1, n_cols)
+    return values.reshape(-1, n_cols)
+
+
+def parse_rows(raw, fmt, source=''):
+    """
+    将一段完整行的文本解析为 (N, 8) 数组（时间已换算为秒，未排序）
+    供整文件解析和增量读取（follow模式）共用
+    """
+    if fmt == 'vins':
+        cols = _parse_columns(raw.replace(b',', b' '))
+        if cols.size == 0:
+            return np.zeros((0, 8))
+        if cols.shape[1] < 8:
+            raise ValueError(f"VINS CSV列数不足: {source}")
+        # t, x, y, z, qw, qx, qy, qz -> t, x, y, z, qx, qy, qz, qw
+        traj = np.empty((len(cols), 8))
+        traj[:, 0:4] = cols[:, 0:4]
+        traj[:, 4:7] = cols[:, 5:8]
+        traj[:, 7] = cols[:, 4]
+    elif fmt == 'tum':
+        cols = _parse_columns(raw)
+        if cols.size == 0:
+            return np.zeros((0, 8))
+        if cols.shape[1] < 8:
+            raise ValueError(f"TUM文件列数不足: {source}")
+        traj = np.ascontiguousarray(cols[:, :8])
+    else:
+        raise ValueError(f"未知的轨迹格式: {fmt}")
+
+    if len(traj) and traj[0, 0] > NS_TIMESTAMP_THRESHOLD:
+        traj[:, 0] *= 1e-9
+    return traj
+
+
+def parse_trajectory(filename, fmt=None):
+    """解析轨迹文件（不使用缓存），返回 (N, 8) 数组"""
+    fmt = fmt or detect_format(filename)
+    with open(filename, 'rb') as f:
+        raw = f.read()
+
+    traj = parse_rows(raw, fmt, filename)
+
+    if np.any(np.diff(traj[:, 0]) < 0):
+        traj = traj[np.argsort(traj[:, 0], kind='stable')]
+
+    return traj
+
+
+def load_trajectory(filename, fmt=None, use_cache=True, cache_dir=None):
+    """
+    加载轨迹，优先使用sidecar缓存
+    返回 (N, 8) 数组；命中缓存时为只读内存映射
+    """
+    if not use_cache:
+        return parse_trajectory(filename, fmt)
+
+    fmt = fmt or detect_format(filename)
+    cache_dir = cache_dir or CACHE_DIR
+    sidecar, key = _sidecar_path(filename, fmt, cache_dir)
+    if os.path.exists(sidecar):
+        try:
+            return np.load(sidecar, mmap_mode='r')
+        except (ValueError, OSError):
+            pass  # 损坏的缓存，重新解析
+
+    traj = parse_trajectory(filename, fmt)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # 删除同一源文件的过期缓存
+        for name in os.listdir(cache_dir):
+            if name.startswith(key + '_'):
+                os.remove(os.path.join(cache_dir, name))
+        tmp = f"{sidecar}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.save(f, traj)
+        os.replace(tmp, sidecar)
+    except OSError:
+        pass  # 缓存目录不可写时只影响下次加载速度
+
+    return traj
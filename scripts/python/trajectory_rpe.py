@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+相对位姿误差 (RPE) - 批量SE(3)位姿对，同时支持按帧数和按行驶距离的间隔
+
+对每个间隔 delta 构造所有位姿对 (i, j)，计算
+    E = (P_gt_i^-1 P_gt_j)^-1 (P_est_i^-1 P_est_j)
+的平移误差 |t_E| 和旋转误差 angle(R_E)。全部运算为批量矩阵运算，分块执行以限制内存。
+RPE只依赖相对运动，对齐前后结果相同。
+"""
+
+import numpy as np
+
+# 默认间隔
+DEFAULT_FRAME_DELTAS = (1, 10, 100)
+DEFAULT_DISTANCE_DELTAS = (1.0, 5.0, 10.0)  # 米
+
+# 每块处理的位姿对数
+RPE_CHUNK_SIZE = 262144
+
+
+def quat_to_rotmat(q):
+    """批量四元数转旋转矩阵 q: (N, 4) [qx, qy, qz, qw] -> (N, 3, 3)"""
+    q = q / np.linalg.norm(q, axis=1, keepdims=True)
+    x, y, z, w = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+    R = np.empty((len(q), 3, 3))
+    R[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    R[:, 0, 1] = 2 * (x * y - z * w)
+    R[:, 0, 2] = 2 * (x * z + y * w)
+    R[:, 1, 0] = 2 * (x * y + z * w)
+    R[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    R[:, 1, 2] = 2 * (y * z - x * w)
+    R[:, 2, 0] = 2 * (x * z - y * w)
+    R[:, 2, 1] = 2 * (y * z + x * w)
+    R[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    return R
+
+
+def path_length(positions):
+    """累计行驶距离 (N,)，第一个元素为0"""
+    dist = np.zeros(len(positions))
+    if len(positions) > 1:
+        np.cumsum(np.linalg.norm(np.diff(positions, axis=0), axis=1), out=dist[1:])
+    return dist
+
+
+def frame_pairs(n, delta):
+    """按帧数间隔的位姿对"""
+    i = np.arange(max(n - delta, 0))
+    return i, i + delta
+
+
+def distance_pairs(dist, delta):
+    """按行驶距离间隔的位姿对：j 为第一个满足 dist[j] >= dist[i] + delta 的位姿"""
+    j = np.searchsorted(dist, dist + delta, side='left')
+    valid = j < len(dist)
+    i = np.nonzero(valid)[0]
+    return i, j[valid]
+
+
+def relative_errors(p_gt, R_gt, p_est, R_est, i, j, chunk_size=RPE_CHUNK_SIZE):
+    """
+    位姿对 (i, j) 的平移误差 (K,) 和旋转误差 (K,，弧度)
+    p_*: (N, 3), R_*: (N, 3, 3)
+
+    记 D_k = R_gt_k R_est_k^T（每个位姿只算一次），则
+        trace(R_E) = sum(D_i * D_j)
+        |t_E| = |D_i (p_est_j - p_est_i) - (p_gt_j - p_gt_i)|
+    每个位姿对只需逐元素运算和一次矩阵-向量乘
+    """
+    D = np.matmul(R_gt, R_est.transpose(0, 2, 1))
+    trans = np.empty(len(i))
+    rot = np.empty(len(i))
+    for start in range(0, len(i), chunk_size):
+        a = i[start:start + chunk_size]
+        b = j[start:start + chunk_size]
+        Da = D[a]
+
+        Et = np.einsum('nij,nj->ni', Da, p_est[b] - p_est[a]) - (p_gt[b] - p_gt[a])
+        trace = np.einsum('nij,nij->n', Da, D[b])
+
+        sl = slice(start, start + len(a))
+        trans[sl] = np.linalg.norm(Et, axis=1)
+        rot[sl] = np.arccos(np.clip((trace - 1.0) / 2.0, -1.0, 1.0))
+    return trans, rot
+
+
+def _stats(trans, rot):
+    rot_deg = np.degrees(rot)
+    return {
+        'n_pairs': len(trans),
+        'trans_rmse': float(np.sqrt(np.mean(trans**2))),
+        'trans_mean': float(np.mean(trans)),
+        'trans_median': float(np.median(trans)),
+        'trans_max': float(np.max(trans)),
+        'rot_rmse_deg': float(np.sqrt(np.mean(rot_deg**2))),
+        'rot_mean_deg': float(np.mean(rot_deg)),
+        'rot_median_deg': float(np.median(rot_deg)),
+        'rot_max_deg': float(np.max(rot_deg)),
+    }
+
+
+def compute_rpe(gt, est, assoc, frame_deltas=DEFAULT_FRAME_DELTAS,
+                distance_deltas=DEFAULT_DISTANCE_DELTAS, dist=None):
+    """
+    计算多个间隔的RPE
+    gt, est: (N, 8) 轨迹，需要四元数列
+    assoc: trajectory_association.PoseAssociation
+    dist: 关联位姿上GT的累计弧长，已有时传入避免重复计算
+    返回 [{'unit': 'frames'|'m', 'delta': d, ...统计量}, ...]，没有位姿对的间隔不出现
+    距离间隔额外给出 drift_percent (平移误差/距离) 和 rot_drift_deg_per_m
+    """
+    if est.shape[1] < 8 or gt.shape[1] < 8:
+        raise ValueError("RPE需要包含四元数列的轨迹")
+
+    p_gt = assoc.ref_positions(gt)
+    R_gt = quat_to_rotmat(assoc.ref_quaternions(gt))
+    p_est = assoc.est_positions(est)
+    R_est = quat_to_rotmat(assoc.est_quaternions(est))
+    n = len(p_gt)
+
+    results = []
+    for delta in frame_deltas:
+        i, j = frame_pairs(n, delta)
+        if len(i) == 0:
+            continue
+        trans, rot = relative_errors(p_gt, R_gt, p_est, R_est, i, j)
+        row = {'unit': 'frames', 'delta': delta}
+        row.update(_stats(trans, rot))
+        results.append(row)
+
+    if dist is None:
+        dist = path_length(p_gt)
+    for delta in distance_deltas:
+        i, j = distance_pairs(dist, delta)
+        if len(i) == 0:
+            continue
+        trans, rot = relative_errors(p_gt, R_gt, p_est, R_est, i, j)
+        # 以实际行驶距离归一化
+        travelled = dist[j] - dist[i]
+        row = {'unit': 'm', 'delta': delta}
+        row.update(_stats(trans, rot))
+        row['drift_percent'] = float(np.mean(trans / travelled) * 100)
+        row['rot_drift_deg_per_m'] = float(np.mean(np.degrees(rot) / travelled))
+        results.append(row)
+
+    return results
+
+
+def format_rpe(results):
+    """RPE结果的文本表格"""
+    lines = [f"    {'delta':>10}  {'pairs':>9}  {'trans RMSE(m)':>13}  {'rot RMSE(deg)':>13}  {'drift':>8}"]
+    for r in results:
+        delta = f"{r['delta']}{'f' if r['unit'] == 'frames' else 'm'}"
+        drift = f"{r['drift_percent']:.2f}%" if 'drift_percent' in r else '-'
+        lines.append(f"    {delta:>10}  {r['n_pairs']:>9}  {r['trans_rmse']:>13.4f}  "
+                     f"{r['rot_rmse_deg']:>13.4f}  {drift:>8}")
+    return '\n'.join(lines)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Umeyama相似变换求解 - 基于充分统计量的流式累加器
+"""
+
+import numpy as np
+
+
+class UmeyamaAccumulator:
+    """
+    Umeyama充分统计量的流式累加器
+    只保存权重和、均值、交叉协方差和方差和，分块合并（Chan并行公式），
+    任意长度的轨迹都能以O(N)时间、O(1)额外内存参与对齐。
+    同样的统计量还能直接给出任意 (s, R, t) 下的残差平方和，
+    增量评估时不必回看历史点即可得到当前对齐下的ATE。
+    支持逐点权重（鲁棒对齐的IRLS使用），不给权重时等价于原始Umeyama
+    """
+
+    def __init__(self):
+        self.n = 0.0                 # 权重和（无权重时即点数）
+        self.mx = np.zeros(3)
+        self.my = np.zeros(3)
+        self.sxx = 0.0           # sum |x - mx|^2
+        self.syy = 0.0           # sum |y - my|^2
+        self.sxy = np.zeros((3, 3))  # sum (y - my)(x - mx)^T
+
+    def update(self, x, y, w=None):
+        """累加一块点对 x, y: (K, 3)，w: 可选权重 (K,)"""
+        if len(x) == 0:
+            return
+        if w is None:
+            k = float(len(x))
+            mx_b = x.mean(0)
+            my_b = y.mean(0)
+            xc = x - mx_b
+            yc = y - my_b
+            sxx_b = np.einsum('ij,ij->', xc, xc)
+            syy_b = np.einsum('ij,ij->', yc, yc)
+            sxy_b = yc.T @ xc
+        else:
+            k = float(np.sum(w))
+            if k <= 0:
+                return
+            mx_b = w @ x / k
+            my_b = w @ y / k
+            xc = x - mx_b
+            yc = y - my_b
+            sxx_b = np.einsum('i,ij,ij->', w, xc, xc)
+            syy_b = np.einsum('i,ij,ij->', w, yc, yc)
+            sxy_b = (yc * w[:, None]).T @ xc
+
+        n = self.n + k
+        dx = mx_b - self.mx
+        dy = my_b - self.my
+        f = self.n * k / n
+        self.sxx += sxx_b + f * dx.dot(dx)
+        self.syy += syy_b + f * dy.dot(dy)
+        self.sxy += sxy_b + f * np.outer(dy, dx)
+        self.mx += dx * k / n
+        self.my += dy * k / n
+        self.n = n
+
+    def solve(self, with_scale=False):
+        """由累积的统计量求解 (s, R, t)"""
+        m = 3
+        Sxy = self.sxy / self.n
+        sx = self.sxx / self.n
+
+        # SVD分解
+        U, D, Vt = np.linalg.svd(Sxy)
+
+        # 计算旋转矩阵（秩由奇异值判断，与matrix_rank的默认容差一致）
+        r = np.sum(D > D.max() * m * np.finfo(D.dtype).eps)
+        S = np.eye(m)
+        if r < m:
+            # 防止反射
+            if np.linalg.det(Sxy) < 0:
+                S[m-1, m-1] = -1
+        elif np.linalg.det(U) * np.linalg.det(Vt) < 0:
+            S[m-1, m-1] = -1
+
+        R = U @ S @ Vt
+
+        # 计算尺度
+        if with_scale:
+            s = np.trace(np.diag(D) @ S) / sx
+        else:
+            s = 1.0
+
+        # 计算平移
+        t = self.my - s * R @ self.mx
+
+        return s, R, t
+
+    def residual_rms(self, s, R, t):
+        """
+        累积点对在变换 (s, R, t) 下的加权残差RMS: sqrt(sum w|y - (s R x + t)|^2 / sum w)
+        """
+        if self.n <= 0:
+            return float('nan')
+        d = self.my - (s * R @ self.mx + t)
+        ss = (self.syy + s * s * self.sxx - 2 * s * np.sum(R * self.sxy)) / self.n + d.dot(d)
+        return float(np.sqrt(max(ss, 0.0)))
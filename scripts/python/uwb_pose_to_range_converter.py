@@ -3,46 +3,61 @@
 
 """
 UWB话题转换器 - 将/uwb/pose转换为VIR-SLAM需要的/uwb/corrected_range
+
+基站表由 ~anchor_file（YAML）或 ~anchors 参数给出（见 uwb_ranges.py），
+每个位姿一次算出到全部基站的距离：
+    /uwb/corrected_range  PointStamped，参考基站（~reference_anchor，默认第0个）的距离
+    /uwb/ranges           Float64MultiArray [stamp, r_0..r_{N-1}]，全部基站
 """
 
 import rospy
-import math
 from geometry_msgs.msg import PoseStamped, PointStamped
-from std_msgs.msg import Header
+from std_msgs.msg import Float64MultiArray
+
+from node_metrics import NodeMetrics
+from uwb_ranges import RANGES_TOPIC, RangeComputer, anchors_from_ros, ranges_message
 
 class UWBPoseToRangeConverter:
     def __init__(self):
         rospy.init_node('uwb_pose_to_range_converter', anonymous=True)
         
-        # 发布corrected_range话题 (VIR-SLAM需要的)
-        self.range_pub = rospy.Publisher('/uwb/corrected_range', PointStamped, queue_size=10)
+        input_topic = rospy.get_param('~input_topic', '/uwb/pose')
+        output_topic = rospy.get_param('~output_topic', '/uwb/corrected_range')
+        ranges_topic = rospy.get_param('~ranges_topic', RANGES_TOPIC)
         
-        # 订阅pose话题 (bag文件中的)
-        self.pose_sub = rospy.Subscriber('/uwb/pose', PoseStamped, self.pose_callback, queue_size=10)
+        # 基站表 (未配置时为原点单基站)，第 ~reference_anchor 个作为参考基站
+        self.anchor_ids, anchors = anchors_from_ros()
+        self.ranges = RangeComputer(anchors)
+        self.reference = rospy.get_param('~reference_anchor', 0)
         
-        # 基站位置 (从VIR-SLAM配置文件获取，假设第一个基站作为参考)
-        # 这里使用原点作为参考基站位置
-        self.anchor_pos = [0.0, 0.0, 0.0]  # [x, y, z]
+        # 发布corrected_range话题 (VIR-SLAM需要的) 和全部基站的距离
+        self.range_pub = rospy.Publisher(output_topic, PointStamped, queue_size=10)
+        self.ranges_pub = rospy.Publisher(ranges_topic, Float64MultiArray, queue_size=10)
+        
+        # 订阅pose话题 (bag文件中的)，回调统计发布在 /diagnostics
+        self.metrics = NodeMetrics('uwb_pose_to_range_converter')
+        self.pose_sub = rospy.Subscriber(input_topic, PoseStamped,
+                                         self.metrics.instrument(input_topic, self.pose_callback), queue_size=10)
         
         rospy.loginfo("🔄 UWB话题转换器启动")
-        rospy.loginfo("   输入: /uwb/pose (PoseStamped)")
-        rospy.loginfo("   输出: /uwb/corrected_range (PointStamped)")
-        rospy.loginfo(f"   参考基站位置: {self.anchor_pos}")
+        rospy.loginfo(f"   输入: {input_topic} (PoseStamped)")
+        rospy.loginfo(f"   输出: {output_topic} (PointStamped), {ranges_topic} (Float64MultiArray)")
+        rospy.loginfo(f"   基站: {len(self.anchor_ids)} 个，参考基站 {self.anchor_ids[self.reference]}: "
+                      f"{anchors[self.reference].tolist()}")
+        self.metrics.start_ros()
         
     def pose_callback(self, pose_msg):
-        """将位置转换为到参考基站的距离"""
+        """将位置转换为到各基站的距离"""
         try:
             # 提取位置
             x = pose_msg.pose.position.x
             y = pose_msg.pose.position.y
             z = pose_msg.pose.position.z
             
-            # 计算到参考基站的距离
-            dx = x - self.anchor_pos[0]
-            dy = y - self.anchor_pos[1] 
-            dz = z - self.anchor_pos[2]
-            
-            distance = math.sqrt(dx*dx + dy*dy + dz*dz)
+            # 一次计算到全部基站的距离
+            ranges = self.ranges.compute(x, y, z)
+            distance = float(ranges[self.reference])
+            stamp = pose_msg.header.stamp.to_sec()
             
             # 创建距离消息
             range_msg = PointStamped()
@@ -53,6 +68,7 @@ class UWBPoseToRangeConverter:
             
             # 发布距离数据
             self.range_pub.publish(range_msg)
+            self.ranges_pub.publish(ranges_message(stamp, ranges))
             
             rospy.loginfo_throttle(1.0, f"🔄 位置({x:.2f}, {y:.2f}, {z:.2f}) -> 距离: {distance:.2f}m")
             
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+UWB多基站距离 - 由标签位置一次算出到全部N个基站的距离
+
+基站表来自YAML配置:
+    anchors:
+      - {id: 0, position: [0.0, 0.0, 0.0]}
+      - {id: 1, position: [8.0, 0.0, 0.0]}
+      - {id: 2, position: [8.0, 6.0, 0.0]}
+      - {id: 3, position: [0.0, 6.0, 2.5]}
+或ROS参数 ~anchors（[[x, y, z], ...]）。未配置时为原点处的单个基站（原转换器的行为）。
+
+在线: RangeComputer 每个位姿一次向量化运算（预分配缓冲，无逐基站循环），
+      结果打包为一条 std_msgs/Float64MultiArray: [stamp, r_0, ..., r_{N-1}]
+离线: compute_ranges 对整个位姿数组 (M, 3) 分块计算 (M, N) 距离矩阵
+
+用法:
+    python3 uwb_ranges.py uwb_pose.txt --anchors uwb_anchors.yaml -o ranges.csv
+    python3 uwb_ranges.py recording.bag --topic /uwb/pose --anchors uwb_anchors.yaml -o ranges.csv
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+RANGES_TOPIC = '/uwb/ranges'
+DEFAULT_ANCHORS = [[0.0, 0.0, 0.0]]
+CHUNK = 65536
+
+
+def parse_anchors(config):
+    """
+    YAML内容 -> (ids, positions (N, 3))
+    支持 {anchors: [{id, position}, ...]}、{anchors: [[x, y, z], ...]} 或直接为列表
+    """
+    entries = config.get('anchors', config) if isinstance(config, dict) else config
+    ids, positions = [], []
+    for i, entry in enumerate(entries):
+        if isinstance(entry, dict):
+            ids.append(int(entry.get('id', i)))
+            positions.append(entry['position'])
+        else:
+            ids.append(i)
+            positions.append(entry)
+    positions = np.asarray(positions, dtype=float)
+    if positions.ndim != 2 or positions.shape[1] != 3 or len(positions) == 0:
+        raise ValueError("基站配置应为 N 个 [x, y, z]")
+    return ids, positions
+
+
+def load_anchors(filename=None):
+    """从YAML读取基站表；filename 为空时返回原点单基站"""
+    if not filename:
+        return parse_anchors(DEFAULT_ANCHORS)
+    import yaml
+
+    with open(filename) as f:
+        return parse_anchors(yaml.safe_load(f))
+
+
+def anchors_from_ros():
+    """ROS参数 ~anchor_file 或 ~anchors（需在 init_node 之后调用）"""
+    import rospy
+
+    anchor_file = rospy.get_param('~anchor_file', '')
+    if anchor_file:
+        return load_anchors(anchor_file)
+    return parse_anchors(rospy.get_param('~anchors', DEFAULT_ANCHORS))
+
+
+class RangeComputer:
+    """单个位姿到全部基站的距离，缓冲预分配，compute 返回的数组在下次调用时被覆盖"""
+
+    def __init__(self, anchors):
+        self.anchors = np.ascontiguousarray(anchors, dtype=float)
+        n = len(self.anchors)
+        self._pos = np.empty(3)
+        self._diff = np.empty((n, 3))
+        self.ranges = np.empty(n)
+
+    def compute(self, x, y, z):
+        pos = self._pos
+        pos[0] = x
+        pos[1] = y
+        pos[2] = z
+        np.subtract(self.anchors, pos, out=self._diff)
+        np.einsum('ij,ij->i', self._diff, self._diff, out=self.ranges)
+        return np.sqrt(self.ranges, out=self.ranges)
+
+
+def compute_ranges(positions, anchors, chunk=CHUNK):
+    """位姿数组 (M, 3) 到基站 (N, 3) 的距离矩阵 (M, N)，分块限制临时内存"""
+    positions = np.asarray(positions, dtype=float)
+    anchors = np.asarray(anchors, dtype=float)
+    out = np.empty((len(positions), len(anchors)))
+    for s in range(0, len(positions), chunk):
+        diff = positions[s:s + chunk, None, :] - anchors[None, :, :]
+        np.sqrt(np.einsum('mnk,mnk->mn', diff, diff), out=out[s:s + chunk])
+    return out
+
+
+def ranges_message(stamp, ranges):
+    """打包为 std_msgs/Float64MultiArray: [stamp(秒), r_0..r_{N-1}]"""
+    from std_msgs.msg import Float64MultiArray, MultiArrayDimension
+
+    msg = Float64MultiArray()
+    size = len(ranges) + 1
+    msg.layout.dim = [MultiArrayDimension(label='stamp_and_ranges', size=size, stride=size)]
+    msg.data = [stamp]
+    msg.data.extend(ranges.tolist())
+    return msg
+
+
+def load_positions(filename, topic='/uwb/pose'):
+    """位姿数据 -> (t, positions)：bag中的PoseStamped话题或轨迹文件（TUM/EuRoC/VINS）"""
+    if filename.endswith('.bag'):
+        import rosbag
+
+        with rosbag.Bag(filename) as bag:
+            n = bag.get_message_count(topic_filters=[topic])
+            data = np.empty((n, 4))
+            k = 0
+            for _, msg, _ in bag.read_messages(topics=[topic]):
+                p = msg.pose.position
+                data[k] = (msg.header.stamp.to_sec(), p.x, p.y, p.z)
+                k += 1
+        data = data[:k]
+        return data[:, 0], data[:, 1:4]
+
+    from trajectory_io import load_trajectory
+
+    traj = load_trajectory(filename)
+    return traj[:, 0], traj[:, 1:4]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='UWB多基站距离（离线批量）')
+    parser.add_argument('input', help='位姿: .bag 或 轨迹文件')
+    parser.add_argument('--topic', default='/uwb/pose', help='bag中的PoseStamped话题')
+    parser.add_argument('--anchors', default=None, help='基站YAML（默认原点单基站）')
+    parser.add_argument('-o', '--output', default='uwb_ranges.csv', help='输出CSV: t, r_0..r_{N-1}')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"❌ 文件不存在: {args.input}")
+        sys.exit(1)
+
+    ids, anchors = load_anchors(args.anchors)
+    t, positions = load_positions(args.input, args.topic)
+    start = time.time()
+    ranges = compute_ranges(positions, anchors)
+    elapsed = time.time() - start
+
+    header = 't,' + ','.join(f'r{i}' for i in ids)
+    np.savetxt(args.output, np.column_stack([t, ranges]), delimiter=',', fmt='%.9f', header=header, comments='')
+    print(f"✅ {len(t)} 个位姿 × {len(ids)} 个基站 ({elapsed:.3f}s): {args.output}")
+    if len(t):
+        for i, aid in enumerate(ids):
+            print(f"   基站 {aid}: 距离 {ranges[:, i].min():.2f} .. {ranges[:, i].max():.2f} m")
+
+
+if __name__ == "__main__":
+    main()
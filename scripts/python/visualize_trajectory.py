@@ -1,45 +1,54 @@
 #!/usr/bin/env python3
 """
 Visualize VIR-SLAM trajectory results
-Usage: python3 visualize_trajectory.py vins_result_no_loop.csv
+Usage: python3 visualize_trajectory.py vins_result_no_loop.csv [output.png]
+
+If an output file is given, or no display is available, the figure is
+rendered with the non-interactive Agg backend and saved instead of shown.
 """
 
+import os
 import sys
+
+import matplotlib
+HEADLESS = len(sys.argv) > 2 or not os.environ.get('DISPLAY')
+if HEADLESS:
+    matplotlib.use('Agg')
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 
+from evaluation_plots import lttb_indices
+from trajectory_io import load_trajectory
+
 def parse_vins_csv(filename):
-    """Parse VINS trajectory CSV file"""
-    timestamps = []
-    positions = []
-    
+    """Parse VINS trajectory CSV file (timestamps in seconds, positions (N, 3))"""
     try:
-        with open(filename, 'r') as f:
-            for line in f:
-                if line.strip():
-                    parts = line.strip().split(',')
-                    if len(parts) >= 4:
-                        # Format: timestamp, x, y, z, qx, qy, qz, qw
-                        timestamps.append(float(parts[0]))
-                        x, y, z = float(parts[1]), float(parts[2]), float(parts[3])
-                        positions.append([x, y, z])
+        traj = load_trajectory(filename, fmt='vins')
     except FileNotFoundError:
         print(f"Error: File '{filename}' not found!")
         sys.exit(1)
     
-    if not positions:
+    if len(traj) == 0:
         print("Warning: No trajectory data found in file!")
         return None, None
     
-    return np.array(timestamps), np.array(positions)
+    return traj[:, 0], traj[:, 1:4]
 
-def plot_trajectory(timestamps, positions):
-    """Plot 3D trajectory"""
+def plot_trajectory(timestamps, positions, output=None):
+    """Plot 3D trajectory; saves to output instead of showing when given"""
     if positions is None or len(positions) == 0:
         print("No data to plot!")
         return
     
+    # Statistics use the full trajectory, plots a shape-preserving subset
+    full_positions = positions
+    full_timestamps = timestamps
+    idx = lttb_indices(positions[:, 0], positions[:, 1])
+    positions = positions[idx]
+    if timestamps is not None:
+        timestamps = timestamps[idx]
+    
     fig = plt.figure(figsize=(15, 10))
     
     # 3D trajectory plot
@@ -100,6 +109,8 @@ def plot_trajectory(timestamps, positions):
     plt.tight_layout()
     
     # Print statistics
+    positions = full_positions
+    timestamps = full_timestamps
     total_distance = np.sum(np.linalg.norm(np.diff(positions, axis=0), axis=1))
     print(f"\n=== Trajectory Statistics ===")
     print(f"Total points: {len(positions)}")
@@ -111,16 +122,25 @@ def plot_trajectory(timestamps, positions):
         print(f"Duration: {duration:.3f} s")
         print(f"Average speed: {total_distance/duration:.3f} m/s")
     
-    plt.show()
+    if output:
+        plt.savefig(output, dpi=150, bbox_inches='tight')
+        print(f"Saved figure: {output}")
+        plt.close(fig)
+    else:
+        plt.show()
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python3 visualize_trajectory.py <trajectory_csv_file>")
+        print("Usage: python3 visualize_trajectory.py <trajectory_csv_file> [output.png]")
         print("Example: python3 visualize_trajectory.py vins_result_no_loop.csv")
         sys.exit(1)
     
     filename = sys.argv[1]
+    output = sys.argv[2] if len(sys.argv) > 2 else None
+    if output is None and HEADLESS:
+        output = os.path.splitext(filename)[0] + '.png'
+        print(f"No display available, figure will be saved to: {output}")
     print(f"Loading trajectory from: {filename}")
     
     timestamps, positions = parse_vins_csv(filename)
-    plot_trajectory(timestamps, positions)
+    plot_trajectory(timestamps, positions, output)
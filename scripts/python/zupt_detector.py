@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+零速检测 (ZUPT) - 固定长度环形缓冲上的滑动和，每帧O(1)、无分配
+
+每帧只维护窗口内的6个滑动和:
+    Σa (3轴), Σ|a|², Σ|ω|, Σ|ω|²
+各检测器的判据都只依赖这些和与样本数，因此同一份判据代码
+既用于实时节点的逐帧更新，也用于离线批处理的累加和差分（参数可以是标量或数组）。
+
+检测器:
+    variance  平均角速度模长 < 阈值 且 三轴加速度方差均值 < 阈值（原实现的判据）
+    shoe      SHOE / GLRT（Skog et al. 2010）:
+              T = 1/W Σ [ |a_k - g ā/|ā||² / σa² + |ω_k|² / σω² ] < γ
+              展开后 Σ|a_k - g u|² = Σ|a|² - 2g|Σa| + W g²，同样只需滑动和
+    are       角速度能量: 1/W Σ|ω|² < γ
+"""
+
+import math
+
+# 窗口
+DEFAULT_WINDOW = 20
+MIN_SAMPLES = 10
+
+# variance 检测器（与原实现一致）
+VARIANCE_GYRO_THRESH = 0.05      # rad/s
+VARIANCE_ACCEL_VAR_THRESH = 0.5  # m/s^2
+
+# shoe 检测器
+SHOE_SIGMA_ACC = 0.05            # m/s^2，加速度计噪声
+SHOE_SIGMA_GYRO = 0.01           # rad/s，陀螺噪声
+SHOE_THRESHOLD = 15.0            # 静止时 T 的期望约为 6（6个自由度）
+
+# are 检测器
+ARE_THRESHOLD = 0.05**2          # (rad/s)^2
+
+# 每经过 REFRESH_FACTOR * window 次更新，从缓冲区重新求和，抵消浮点累积误差
+REFRESH_FACTOR = 64
+
+DETECTORS = ('variance', 'shoe', 'are')
+
+
+def _sqrt(x):
+    # 标量和NumPy数组通用
+    return x ** 0.5
+
+
+class VarianceCriterion:
+    def __init__(self, gyro_thresh=VARIANCE_GYRO_THRESH, accel_var_thresh=VARIANCE_ACCEL_VAR_THRESH):
+        self.gyro_thresh = gyro_thresh
+        self.accel_var_thresh = accel_var_thresh
+
+    def __call__(self, n, sax, say, saz, saa, swn, sww):
+        # 三轴总体方差之和 = (Σ|a|² - |Σa|²/n) / n
+        acc_var = (saa - (sax * sax + say * say + saz * saz) / n) / (3.0 * n)
+        return (swn / n < self.gyro_thresh) & (acc_var < self.accel_var_thresh)
+
+
+class ShoeCriterion:
+    def __init__(self, gravity, sigma_acc=SHOE_SIGMA_ACC, sigma_gyro=SHOE_SIGMA_GYRO,
+                 threshold=SHOE_THRESHOLD):
+        self.gravity = gravity
+        self.inv_var_acc = 1.0 / sigma_acc**2
+        self.inv_var_gyro = 1.0 / sigma_gyro**2
+        self.threshold = threshold
+
+    def __call__(self, n, sax, say, saz, saa, swn, sww):
+        g = self.gravity
+        acc_term = saa - 2.0 * g * _sqrt(sax * sax + say * say + saz * saz) + n * g * g
+        T = (acc_term * self.inv_var_acc + sww * self.inv_var_gyro) / n
+        return T < self.threshold
+
+
+class AreCriterion:
+    def __init__(self, threshold=ARE_THRESHOLD):
+        self.threshold = threshold
+
+    def __call__(self, n, sax, say, saz, saa, swn, sww):
+        return sww / n < self.threshold
+
+
+def make_criterion(detector='variance', gravity=9.81, **params):
+    """
+    按名称创建判据
+    gravity: shoe检测器使用的重力模长（数据已去重力时为0）
+    params: 对应判据的阈值参数
+    """
+    if detector == 'variance':
+        return VarianceCriterion(**params)
+    if detector == 'shoe':
+        return ShoeCriterion(gravity, **params)
+    if detector == 'are':
+        return AreCriterion(**params)
+    raise ValueError(f"未知的ZUPT检测器: {detector}")
+
+
+class ZuptDetector:
+    """
+    逐帧零速检测
+    环形缓冲预分配为 window 行，每行保存该帧对各滑动和的贡献；
+    update 加入新帧、减去被挤出的帧，判据只看滑动和
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, detector='variance', min_samples=MIN_SAMPLES,
+                 gravity=9.81, **params):
+        self.window = int(window)
+        self.min_samples = min(int(min_samples), self.window)
+        self.criterion = make_criterion(detector, gravity, **params)
+        self.buffer = [[0.0] * 6 for _ in range(self.window)]
+        self.sums = [0.0] * 6
+        self.count = 0
+        self.head = 0
+        self.updates = 0
+        self.refresh_every = REFRESH_FACTOR * self.window
+
+    def update(self, ax, ay, az, gx, gy, gz):
+        """加入一帧（去bias后的加速度和角速度），返回是否静止"""
+        w2 = gx * gx + gy * gy + gz * gz
+        slot = self.buffer[self.head]
+        s = self.sums
+        if self.count == self.window:
+            s[0] -= slot[0]
+            s[1] -= slot[1]
+            s[2] -= slot[2]
+            s[3] -= slot[3]
+            s[4] -= slot[4]
+            s[5] -= slot[5]
+        else:
+            self.count += 1
+
+        slot[0] = ax
+        slot[1] = ay
+        slot[2] = az
+        slot[3] = ax * ax + ay * ay + az * az
+        slot[4] = math.sqrt(w2)
+        slot[5] = w2
+        s[0] += ax
+        s[1] += ay
+        s[2] += az
+        s[3] += slot[3]
+        s[4] += slot[4]
+        s[5] += w2
+
+        self.head += 1
+        if self.head == self.window:
+            self.head = 0
+        self.updates += 1
+        if self.updates % self.refresh_every == 0:
+            self._refresh()
+
+        if self.count < self.min_samples:
+            return False
+        return bool(self.criterion(self.count, *s))
+
+    def _refresh(self):
+        """从缓冲区重新求和"""
+        rows = self.buffer if self.count == self.window else [
+            self.buffer[(self.head - 1 - k) % self.window] for k in range(self.count)]
+        self.sums[:] = [math.fsum(r[i] for r in rows) for i in range(6)]
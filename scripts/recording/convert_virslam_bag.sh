@@ -0,0 +1,69 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+# VIR-SLAM离线bag转换脚本
+# 单次读取原始bag，直接写出转换后的bag（灰度+CLAHE、UWB距离、/synced/* 话题），
+# 替代 实时转换节点 + rosbag record 的流程，不受实时调度影响
+
+CONTAINER="vir_slam_dev"
+ROS_SETUP="source /opt/ros/noetic/setup.bash"
+CATKIN_SETUP="source /root/catkin_ws/devel/setup.bash"
+WORK_DIR="/tmp/bag_converter"
+
+# ====== 参数检查 ======
+if [ $# -lt 1 ]; then
+    echo "❌ 用法: $0 <bag文件路径> [输出bag路径] [bag_converter.py 的其它参数...]"
+    echo "   例如: $0 /home/jetson/vir_slam_output/bags/virslam_20260112_205424.bag"
+    echo "   UWB_ANCHOR_FILE=uwb_anchors.yaml 指定UWB基站表"
+    exit 1
+fi
+
+BAG_PATH="$1"
+OUTPUT_PATH="${2:-${BAG_PATH%.bag}_virslam.bag}"
+shift $(( $# >= 2 ? 2 : 1 ))
+
+# ====== 工具函数 ======
+die() { echo "❌ $*" 1>&2; exit 1; }
+
+docker_running() {
+  docker ps --format '{{.Names}}' | grep -qx "${CONTAINER}"
+}
+
+in_container() {
+  docker exec -i "${CONTAINER}" bash -lc "$*"
+}
+
+# ====== 检查 ======
+[ -f "${BAG_PATH}" ] || die "Bag文件不存在: ${BAG_PATH}"
+docker_running || die "容器 ${CONTAINER} 未运行。请先运行 ./start_container.sh"
+
+# ====== 部署转换脚本 ======
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+PY_DIR="${SCRIPT_DIR}/../python"
+
+in_container "rm -rf ${WORK_DIR} && mkdir -p ${WORK_DIR}"
+for f in bag_converter.py image_preprocess.py uwb_ranges.py sensor_sync.py node_metrics.py; do
+  docker cp "${PY_DIR}/${f}" "${CONTAINER}:${WORK_DIR}/${f}"
+done
+
+EXTRA_ARGS=("$@")
+if [ -n "${UWB_ANCHOR_FILE:-}" ]; then
+    docker cp "${UWB_ANCHOR_FILE}" "${CONTAINER}:${WORK_DIR}/uwb_anchors.yaml"
+    EXTRA_ARGS+=(--anchors "${WORK_DIR}/uwb_anchors.yaml")
+fi
+
+# ====== 转换 ======
+echo "📋 复制bag到容器..."
+docker cp "${BAG_PATH}" "${CONTAINER}:${WORK_DIR}/input.bag"
+
+echo "🚀 开始转换: ${BAG_PATH}"
+in_container "${ROS_SETUP}; ${CATKIN_SETUP}; cd ${WORK_DIR} && python3 bag_converter.py input.bag -o output.bag ${EXTRA_ARGS[*]:-}"
+
+echo "📋 复制结果到宿主机..."
+docker cp "${CONTAINER}:${WORK_DIR}/output.bag" "${OUTPUT_PATH}"
+in_container "rm -f ${WORK_DIR}/input.bag ${WORK_DIR}/output.bag"
+
+BAG_SIZE=$(du -h "${OUTPUT_PATH}" | cut -f1)
+echo ""
+echo "✅ 转换完成: ${OUTPUT_PATH} (${BAG_SIZE})"
+echo "ℹ️  处理: ${SCRIPT_DIR}/process_virslam_bag.sh ${OUTPUT_PATH}"
@@ -47,8 +47,11 @@ echo "🔧 启动数据转换节点..."
 
 sleep 3
 
-# 2. 创建时间同步节点
+# 2. 创建时间同步节点（回调统计 node_metrics.py、时钟偏移估计 sensor_sync.py 与节点放在同一目录）
 echo "⏰ 创建时间同步节点..."
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+docker cp "${SCRIPT_DIR}/../python/node_metrics.py" "${CONTAINER}:/tmp/node_metrics.py"
+docker cp "${SCRIPT_DIR}/../python/sensor_sync.py" "${CONTAINER}:/tmp/sensor_sync.py"
 in_container "cat > /tmp/enhanced_timestamp_sync_node.py << 'EOF'
 #!/usr/bin/env python3
 import rospy
@@ -57,6 +60,9 @@ from geometry_msgs.msg import PointStamped
 from std_msgs.msg import String
 import json
 
+from node_metrics import NodeMetrics
+from sensor_sync import RosSensorSync
+
 class EnhancedTimestampSyncNode:
     def __init__(self):
         rospy.init_node('enhanced_timestamp_sync_node')
@@ -68,47 +74,51 @@ class EnhancedTimestampSyncNode:
             'uwb': rospy.Publisher('/synced/uwb_range', PointStamped, queue_size=10),
             'imu': rospy.Publisher('/synced/imu', Imu, queue_size=50),
             'camera_info': rospy.Publisher('/synced/camera_info', CameraInfo, queue_size=10),
-            'timestamp_info': rospy.Publisher('/synced/timestamp_info', String, queue_size=10)
         }
+        self.info_pub = rospy.Publisher('/synced/timestamp_info', String, queue_size=10)
+        
+        # 按估计的硬件时钟偏移/漂移改写时间戳，并在延迟预算内按时间顺序发布（见 sensor_sync.py）
+        self.last_set = None
+        self.sync = RosSensorSync(self.publishers, pivot='image', clocks={'camera_info': 'image'},
+                                  on_set=self.on_set)
         
-        # 订阅转换后的话题
-        rospy.Subscriber('/livox/lidar', PointCloud2, self.sync_lidar)
-        rospy.Subscriber('/camera/color/image_raw', Image, self.sync_image)  # 转换后的灰度图
-        rospy.Subscriber('/uwb/corrected_range', PointStamped, self.sync_uwb)  # 转换后的距离数据
-        rospy.Subscriber('/livox/imu', Imu, self.sync_imu)
-        rospy.Subscriber('/usb_cam/camera_info', CameraInfo, self.sync_camera_info)
+        # 订阅转换后的话题（回调耗时/延迟/速率/丢包发布在 /diagnostics）
+        self.metrics = NodeMetrics('enhanced_timestamp_sync_node')
+        m = self.metrics.instrument
+        rospy.Subscriber('/livox/lidar', PointCloud2, m('/livox/lidar', self.sync_lidar))
+        rospy.Subscriber('/camera/color/image_raw', Image, m('/camera/color/image_raw', self.sync_image))  # 转换后的灰度图
+        rospy.Subscriber('/uwb/corrected_range', PointStamped, m('/uwb/corrected_range', self.sync_uwb))  # 转换后的距离数据
+        rospy.Subscriber('/livox/imu', Imu, m('/livox/imu', self.sync_imu))
+        rospy.Subscriber('/usb_cam/camera_info', CameraInfo, m('/usb_cam/camera_info', self.sync_camera_info))
         
         self.msg_count = 0
         self.start_time = rospy.Time.now()
+        self.metrics.start_ros()
         
         rospy.loginfo('⏰ 增强时间同步节点已启动 (支持数据转换)')
         
-    def get_sync_timestamp(self):
-        return rospy.Time.now()
+    def on_set(self, stamp, members):
+        # 以图像为准的匹配组：各传感器最近消息与图像的时间差（超出slop为None）
+        self.last_set = {name: None if hit is None else hit[0] - stamp for name, hit in members.items()}
         
     def sync_lidar(self, msg):
-        msg.header.stamp = self.get_sync_timestamp()
-        self.publishers['lidar'].publish(msg)
+        self.sync.add('lidar', msg)
         self.update_stats('LiDAR')
         
     def sync_image(self, msg):
-        msg.header.stamp = self.get_sync_timestamp()
-        self.publishers['image'].publish(msg)
+        self.sync.add('image', msg)
         self.update_stats('Image(灰度)')
         
     def sync_uwb(self, msg):
-        msg.header.stamp = self.get_sync_timestamp()
-        self.publishers['uwb'].publish(msg)
+        self.sync.add('uwb', msg)
         self.update_stats('UWB(距离)')
         
     def sync_imu(self, msg):
-        msg.header.stamp = self.get_sync_timestamp()
-        self.publishers['imu'].publish(msg)
+        self.sync.add('imu', msg)
         self.update_stats('IMU')
         
     def sync_camera_info(self, msg):
-        msg.header.stamp = self.get_sync_timestamp()
-        self.publishers['camera_info'].publish(msg)
+        self.sync.add('camera_info', msg)
         
     def update_stats(self, sensor_name):
         self.msg_count += 1
@@ -121,11 +131,13 @@ class EnhancedTimestampSyncNode:
                 'sensor': sensor_name,
                 'count': self.msg_count,
                 'rate': rate,
-                'timestamp': rospy.Time.now().to_sec()
+                'timestamp': rospy.Time.now().to_sec(),
+                'clocks': self.sync.summary(),
+                'last_set': self.last_set
             }
             info_msg = String()
             info_msg.data = json.dumps(info)
-            self.publishers['timestamp_info'].publish(info_msg)
+            self.info_pub.publish(info_msg)
             
             rospy.loginfo(f'{sensor_name} 同步 #{self.msg_count}, 总速率: {rate:.1f} msg/s')
 
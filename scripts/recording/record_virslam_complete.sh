@@ -95,102 +95,128 @@ if ! in_container "${ROS_SETUP}; pgrep roscore >/dev/null 2>&1"; then
     sleep 5
 fi
 
-# 3. 创建临时的完整转换和同步节点
+# 3. 创建临时的完整转换和同步节点（回调统计 node_metrics.py、UWB多基站距离 uwb_ranges.py、
+#    时钟偏移估计 sensor_sync.py、图像预处理 image_preprocess.py 与节点放在同一目录）
 echo "🔧 部署完整的数据处理节点..."
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+docker cp "${SCRIPT_DIR}/../python/node_metrics.py" "${CONTAINER}:/tmp/node_metrics.py"
+docker cp "${SCRIPT_DIR}/../python/uwb_ranges.py" "${CONTAINER}:/tmp/uwb_ranges.py"
+docker cp "${SCRIPT_DIR}/../python/sensor_sync.py" "${CONTAINER}:/tmp/sensor_sync.py"
+docker cp "${SCRIPT_DIR}/../python/image_preprocess.py" "${CONTAINER}:/tmp/image_preprocess.py"
+# 基站表（YAML，见 uwb_ranges.py）；未设置 UWB_ANCHOR_FILE 时为原点单基站
+UWB_PARAMS=""
+if [ -n "${UWB_ANCHOR_FILE:-}" ]; then
+    docker cp "${UWB_ANCHOR_FILE}" "${CONTAINER}:/tmp/uwb_anchors.yaml"
+    UWB_PARAMS="_anchor_file:=/tmp/uwb_anchors.yaml"
+fi
 in_container "cat > /tmp/complete_virslam_processor.py << 'EOF'
 #!/usr/bin/env python3
 import rospy
 import tf2_ros
 from sensor_msgs.msg import Image, Imu, PointCloud2, CameraInfo
 from geometry_msgs.msg import PoseStamped, PointStamped
-from cv_bridge import CvBridge
-import cv2
+from std_msgs.msg import Float64MultiArray
 import numpy as np
 import message_filters
 from threading import Lock
-import math
+
+from node_metrics import NodeMetrics
+from uwb_ranges import RangeComputer, anchors_from_ros, ranges_message
+from sensor_sync import RosSensorSync
+from image_preprocess import ImagePreprocessor, mono8_message
 
 class VIRSLAMProcessor:
     def __init__(self):
         rospy.init_node('virslam_complete_processor', anonymous=True)
-        self.bridge = CvBridge()
         
         # 发布器
         self.pub_image = rospy.Publisher('/synced/image_raw', Image, queue_size=10)
         self.pub_imu = rospy.Publisher('/synced/imu', Imu, queue_size=50)
         self.pub_lidar = rospy.Publisher('/synced/lidar', PointCloud2, queue_size=10)
         self.pub_uwb = rospy.Publisher('/synced/uwb_range', PointStamped, queue_size=10)
+        self.pub_uwb_ranges = rospy.Publisher('/synced/uwb_ranges', Float64MultiArray, queue_size=10)
         self.pub_camera_info = rospy.Publisher('/synced/camera_info', CameraInfo, queue_size=10)
         
-        # 订阅器
-        self.image_sub = rospy.Subscriber('/usb_cam/image_raw', Image, self.image_callback)
-        self.imu_sub = rospy.Subscriber('/livox/imu', Imu, self.imu_callback) 
-        self.lidar_sub = rospy.Subscriber('/livox/lidar', PointCloud2, self.lidar_callback)
-        self.uwb_sub = rospy.Subscriber('/uwb/pose', PoseStamped, self.uwb_callback)
-        self.camera_info_sub = rospy.Subscriber('/usb_cam/camera_info', CameraInfo, self.camera_info_callback)
+        # 时间戳取自传感器硬件时间，按估计的时钟偏移/漂移换算后在延迟预算内按时间顺序发布
+        self.sync = RosSensorSync({'image': self.pub_image, 'imu': self.pub_imu, 'lidar': self.pub_lidar,
+                                   'uwb': self.pub_uwb, 'camera_info': self.pub_camera_info},
+                                  pivot='image', clocks={'camera_info': 'image'})
+        
+        # 订阅器（回调耗时/延迟/速率/丢包发布在 /diagnostics）
+        self.metrics = NodeMetrics('virslam_complete_processor')
+        m = self.metrics.instrument
+        self.image_sub = rospy.Subscriber('/usb_cam/image_raw', Image, m('/usb_cam/image_raw', self.image_callback))
+        self.imu_sub = rospy.Subscriber('/livox/imu', Imu, m('/livox/imu', self.imu_callback))
+        self.lidar_sub = rospy.Subscriber('/livox/lidar', PointCloud2, m('/livox/lidar', self.lidar_callback))
+        self.uwb_sub = rospy.Subscriber('/uwb/pose', PoseStamped, m('/uwb/pose', self.uwb_callback))
+        self.camera_info_sub = rospy.Subscriber('/usb_cam/camera_info', CameraInfo,
+                                                m('/usb_cam/camera_info', self.camera_info_callback))
+        
+        # UWB基站表，第0个为 /synced/uwb_range 的参考基站
+        self.uwb_anchor_ids, anchors = anchors_from_ros()
+        self.uwb_ranges = RangeComputer(anchors)
         
         # 统计
+        # 图像灰度+CLAHE在线程池中处理，不阻塞订阅回调；积压时丢旧帧保留最新帧
+        # （~preprocess_max_age 加处理耗时应小于 ~sync_max_latency，否则图像会晚于同步输出）
+        self.preprocess = ImagePreprocessor(
+            self.publish_image,
+            workers=rospy.get_param('~preprocess_workers', 2),
+            max_pending=rospy.get_param('~preprocess_queue', 2),
+            max_age=rospy.get_param('~preprocess_max_age', 0.05),
+            stats=self.metrics.topic('/synced/image_raw (preprocess)'))
+        rospy.on_shutdown(self.preprocess.close)
+        
         self.stats = {'image': 0, 'imu': 0, 'lidar': 0, 'uwb': 0}
         self.timer = rospy.Timer(rospy.Duration(10), self.print_stats)
+        self.metrics.start_ros()
         
         rospy.loginfo(\"✅ VIR-SLAM完整处理器启动成功\")
 
     def image_callback(self, msg):
+        # 只入队，转换在预处理线程中进行（直接读取msg.data，不经cv_bridge）
+        self.preprocess.submit(msg, rospy.get_time())
+
+    def publish_image(self, msg, gray, arrival):
         try:
-            # RGB转灰度
-            if msg.encoding in ['rgb8', 'bgr8']:
-                cv_image = self.bridge.imgmsg_to_cv2(msg, 'bgr8')
-                gray_image = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
-                
-                # CLAHE增强
-                clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-                enhanced_image = clahe.apply(gray_image)
-                
-                # 发布
-                out_msg = self.bridge.cv2_to_imgmsg(enhanced_image, 'mono8')
-                out_msg.header = msg.header
-                out_msg.header.stamp = rospy.Time.now()
-                self.pub_image.publish(out_msg)
-                self.stats['image'] += 1
-            
+            out_msg = mono8_message(msg.header, gray, Image)
+            self.sync.add('image', out_msg, arrival)
+            self.stats['image'] += 1
         except Exception as e:
             rospy.logwarn(f\"图像处理错误: {e}\")
 
     def imu_callback(self, msg):
         try:
-            # 直接转发IMU数据，更新时间戳
-            out_msg = msg
-            out_msg.header.stamp = rospy.Time.now()
-            self.pub_imu.publish(out_msg)
+            # 直接转发IMU数据，时间戳换算到本机时钟
+            self.sync.add('imu', msg)
             self.stats['imu'] += 1
         except Exception as e:
             rospy.logwarn(f\"IMU处理错误: {e}\")
 
     def lidar_callback(self, msg):
         try:
-            # 直接转发点云数据，更新时间戳
-            out_msg = msg
-            out_msg.header.stamp = rospy.Time.now()
-            self.pub_lidar.publish(out_msg)
+            # 直接转发点云数据，时间戳换算到本机时钟
+            self.sync.add('lidar', msg)
             self.stats['lidar'] += 1
         except Exception as e:
             rospy.logwarn(f\"点云处理错误: {e}\")
 
     def uwb_callback(self, msg):
         try:
-            # 转换PoseStamped到PointStamped (距离)
+            # 转换PoseStamped到PointStamped (参考基站距离) + 全部基站距离
             pos = msg.pose.position
-            distance = math.sqrt(pos.x**2 + pos.y**2 + pos.z**2)
+            ranges = self.uwb_ranges.compute(pos.x, pos.y, pos.z)
             
             # 创建PointStamped消息
             point_msg = PointStamped()
-            point_msg.header.stamp = rospy.Time.now()
+            point_msg.header.stamp = msg.header.stamp
             point_msg.header.frame_id = msg.header.frame_id
-            point_msg.point.x = distance
+            point_msg.point.x = float(ranges[0])
             point_msg.point.y = 0.0
             point_msg.point.z = 0.0
             
-            self.pub_uwb.publish(point_msg)
+            stamp = self.sync.add('uwb', point_msg)
+            self.pub_uwb_ranges.publish(ranges_message(stamp, ranges))
             self.stats['uwb'] += 1
             
         except Exception as e:
@@ -198,15 +224,18 @@ class VIRSLAMProcessor:
 
     def camera_info_callback(self, msg):
         try:
-            # 转发相机信息
-            out_msg = msg
-            out_msg.header.stamp = rospy.Time.now()
-            self.pub_camera_info.publish(out_msg)
+            # 转发相机信息（与图像共用时钟）
+            self.sync.add('camera_info', msg)
         except Exception as e:
             rospy.logwarn(f\"相机信息处理错误: {e}\")
 
     def print_stats(self, event):
         rospy.loginfo(f\"📊 数据统计 - 图像:{self.stats['image']} IMU:{self.stats['imu']} 点云:{self.stats['lidar']} UWB:{self.stats['uwb']}\")
+        p = self.preprocess.summary()
+        rospy.loginfo(f\"   🖼️ 图像预处理: 丢帧 {p['dropped']}/{p['submitted']} 处理 {p['process_mean_ms']:.1f}ms 延迟 p99 {p['latency_p99_ms']:.1f}ms\")
+        for name, s in self.sync.summary().items():
+            if s['offset_s'] is not None:
+                rospy.loginfo(f\"   ⏱️ {name}: 偏移 {s['offset_s']:.4f}s 漂移 {s['skew_ppm']:.1f}ppm 迟到 {s['late']} 匹配 {s['matched']}/{s['matched'] + s['missed']}\")
 
 if __name__ == '__main__':
     try:
@@ -218,7 +247,7 @@ EOF"
 
 # 4. 启动完整处理器
 echo "🚀 启动完整数据处理器..."
-in_container "${ROS_SETUP}; ${CATKIN_SETUP}; nohup python3 /tmp/complete_virslam_processor.py > /tmp/virslam_processor.log 2>&1 &"
+in_container "${ROS_SETUP}; ${CATKIN_SETUP}; nohup python3 /tmp/complete_virslam_processor.py ${UWB_PARAMS} > /tmp/virslam_processor.log 2>&1 &"
 sleep 8
 
 # 5. 检查所有必需的同步话题
@@ -276,7 +305,7 @@ echo ""
 # 录制命令 - 包含UWB（如果可用）
 RECORD_TOPICS="${SYNCED_TOPICS[*]}"
 if in_container "${ROS_SETUP}; rostopic list | grep -q '/synced/uwb_range'"; then
-    RECORD_TOPICS="$RECORD_TOPICS /synced/uwb_range"
+    RECORD_TOPICS="$RECORD_TOPICS /synced/uwb_range /synced/uwb_ranges"
     echo "📡 包含UWB数据"
 fi
 
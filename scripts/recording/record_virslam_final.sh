@@ -117,47 +117,58 @@ if in_container "${ROS_SETUP}; timeout 3 rostopic list | grep -qx '/synced/uwb_r
 elif in_container "${ROS_SETUP}; timeout 3 rostopic list | grep -qx '/uwb/pose'"; then
     echo "  📡 检测到UWB原始数据，启动转换器..."
     
-    # 启动UWB转换为synced格式
+    # 启动UWB转换为synced格式（多基站距离计算在 uwb_ranges.py 中，与节点放在同一目录）
+    SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+    docker cp "${SCRIPT_DIR}/../python/uwb_ranges.py" "${CONTAINER}:/tmp/uwb_ranges.py"
+    # 基站表（YAML）；未设置 UWB_ANCHOR_FILE 时为原点单基站
+    UWB_PARAMS=""
+    if [ -n "${UWB_ANCHOR_FILE:-}" ]; then
+        docker cp "${UWB_ANCHOR_FILE}" "${CONTAINER}:/tmp/uwb_anchors.yaml"
+        UWB_PARAMS="_anchor_file:=/tmp/uwb_anchors.yaml"
+    fi
     in_container "cat > /tmp/uwb_to_synced.py << 'EOF'
 #!/usr/bin/env python3
 import rospy
 from geometry_msgs.msg import PoseStamped, PointStamped
-import math
+from std_msgs.msg import Float64MultiArray
+
+from uwb_ranges import RangeComputer, anchors_from_ros, ranges_message
 
 def uwb_callback(msg):
+    # 一次计算到全部基站的距离，/synced/uwb_range 为第0个（参考）基站
+    pos = msg.pose.position
+    ranges = computer.compute(pos.x, pos.y, pos.z)
+    stamp = msg.header.stamp.to_sec()
+    
     # 转换PoseStamped到PointStamped (距离)
     point_msg = PointStamped()
     point_msg.header = msg.header
     point_msg.header.frame_id = 'uwb_frame'
-    
-    # 计算距离 (从原点到位置的欧几里得距离)
-    distance = math.sqrt(
-        msg.pose.position.x**2 + 
-        msg.pose.position.y**2 + 
-        msg.pose.position.z**2
-    )
-    
-    point_msg.point.x = distance
+    point_msg.point.x = float(ranges[0])
     point_msg.point.y = 0.0
     point_msg.point.z = 0.0
     
     pub.publish(point_msg)
-    rospy.loginfo_throttle(5, f'UWB Range: {distance:.2f}m')
+    ranges_pub.publish(ranges_message(stamp, ranges))
+    rospy.loginfo_throttle(5, f'UWB Range: {ranges[0]:.2f}m ({len(ranges)} anchors)')
 
 if __name__ == '__main__':
     rospy.init_node('uwb_to_synced_converter')
+    anchor_ids, anchors = anchors_from_ros()
+    computer = RangeComputer(anchors)
     pub = rospy.Publisher('/synced/uwb_range', PointStamped, queue_size=10)
+    ranges_pub = rospy.Publisher('/synced/uwb_ranges', Float64MultiArray, queue_size=10)
     sub = rospy.Subscriber('/uwb/pose', PoseStamped, uwb_callback)
-    rospy.loginfo('UWB到synced转换器启动')
+    rospy.loginfo(f'UWB到synced转换器启动 ({len(anchor_ids)} 个基站)')
     rospy.spin()
 EOF"
     
-    in_container "${ROS_SETUP}; ${CATKIN_SETUP}; nohup python3 /tmp/uwb_to_synced.py > /tmp/uwb_synced_converter.log 2>&1 &"
+    in_container "${ROS_SETUP}; ${CATKIN_SETUP}; nohup python3 /tmp/uwb_to_synced.py ${UWB_PARAMS} > /tmp/uwb_synced_converter.log 2>&1 &"
     sleep 3
     
     if in_container "${ROS_SETUP}; timeout 3 rostopic list | grep -qx '/synced/uwb_range'"; then
         echo "  ✅ /synced/uwb_range (UWB转换成功)"
-        AVAILABLE_TOPICS="$AVAILABLE_TOPICS /synced/uwb_range"
+        AVAILABLE_TOPICS="$AVAILABLE_TOPICS /synced/uwb_range /synced/uwb_ranges"
     else
         echo "  ⚠️ UWB转换失败，继续录制其他数据"
     fi
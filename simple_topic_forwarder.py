@@ -1,47 +1,14 @@
 #!/usr/bin/env python3
 """
-Simple ROS1 to ROS2 topic forwarder without ros1_bridge
-Works by reading ROS1 topics and republishing to ROS2
+ROS1 -> ROS2 话题转发入口，实现见 scripts/python/simple_topic_forwarder.py
 """
 
-import subprocess
+import os
 import sys
-import time
-import json
 
-def forward_topic(ros1_topic, ros2_topic, msg_type):
-    """
-    Forward a single topic from ROS1 to ROS2
-    """
-    print(f"Forwarding: {ros1_topic} -> {ros2_topic} ({msg_type})")
-    
-    # TODO: Implement actual forwarding
-    # This is a placeholder - real implementation would need rospy + rclpy
-    pass
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts', 'python'))
 
-def main():
-    print("ROS1 to ROS2 Topic Forwarder")
-    print("=" * 50)
-    print()
-    print("Note: This is a simple forwarder script.")
-    print("For full functionality, you should build ros1_bridge.")
-    print()
-    print("Checking ROS1 topics in Docker container...")
-    
-    # List ROS1 topics
-    try:
-        result = subprocess.run(
-            ["docker", "exec", "vir_slam_dev", "bash", "-c",
-             "source /opt/ros/noetic/setup.bash && rostopic list"],
-            capture_output=True, text=True, check=True
-        )
-        topics = result.stdout.strip().split('\n')
-        print(f"Found {len(topics)} ROS1 topics:")
-        for topic in topics:
-            print(f"  {topic}")
-    except subprocess.CalledProcessError as e:
-        print(f"Error: {e}")
-        sys.exit(1)
+from simple_topic_forwarder import main  # noqa: E402
 
 if __name__ == "__main__":
     main()